@@ -1,41 +1,22 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import os
-from pyomo.environ import *
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 
-from improvedmodel import build_model
-from improvedmodel import analyze_results
-from improvedmodel import generate_all_visualizations
+from improvedmodel import load_and_validate_data
+from heuristic import heuristic_sites, solve_heuristic
+from background import format_progress, start_solve
+from cache import SOLUTION_STORE, solution_key
+from incremental import IncrementalSolver
+from jobqueue import JobQueue, WorkerPool, submit_solve
+from solver import available_backends
+from tracing import Tracer, span, trace_table
 
 # =====================================================
 # 1. LOGIQUE DU MODÈLE (VOTRE CODE PYOMO)
 # =====================================================
 
 
-def load_and_validate_data(path="Data/"):
-    data = {
-        'demand': pd.read_csv(path+"demand_pct.csv"),
-        'capD': pd.read_csv(path+"capacity_depots.csv"),
-        'capW': pd.read_csv(path+"capacity_warehouses.csv"),
-        'fixD': pd.read_csv(path+"fixed_cost_depots.csv"),
-        'fixW': pd.read_csv(path+"fixed_cost_warehouses.csv"),
-        'hold': pd.read_csv(path+"holding_costs.csv"),
-        'cFD': pd.read_csv(path+"transport_factory_depot.csv"),
-        'cDW': pd.read_csv(path+"transport_depot_warehouse.csv"),
-        'cWC': pd.read_csv(path+"transport_warehouse_client.csv"),
-        'ssD': pd.read_csv(path+"safety_stock_depots.csv"),
-        'ssW': pd.read_csv(path+"safety_stock_warehouses.csv"),
-        'iD': pd.read_csv(path+"initial_stock_depots.csv"),
-        'iW': pd.read_csv(path+"initial_stock_warehouses.csv")
-    }
-    return data
-
-
-
 # def analyze_results_dict(m, results):
 #     total_cost = value(m.OBJ)
 #     depots_ouverts = [d for d in m.D if value(m.yD[d]) > 0.5]
@@ -64,6 +45,30 @@ files_config = {
     "Stock Initial Entrepôts": "Data/initial_stock_warehouses.csv"
 }
 
+backends = available_backends() or ["glpk"]
+backend = st.sidebar.selectbox(
+    "Solveur", backends, help="glpk: fichier LP + glpsol · glpk_capi: GLPK en mémoire · appsi_highs: HiGHS persistant · benders: décomposition sites / flux")
+
+
+
+@st.cache_resource
+def job_pool():
+    """Processus de calcul partagés par toutes les sessions, si
+    SUPPLY_CHAIN_WORKERS > 0; sinon chaque session résout dans son thread"""
+    n_workers = int(os.environ.get("SUPPLY_CHAIN_WORKERS", "0"))
+    if n_workers <= 0:
+        return None
+    time_limit = float(os.environ.get("SUPPLY_CHAIN_TIME_LIMIT", "600"))
+    return WorkerPool(JobQueue(default_time_limit=time_limit),
+                      n_workers=n_workers).start()
+
+
+pool = job_pool()
+if pool is not None:
+    st.sidebar.caption(f"File de calcul partagée : {pool.n_workers} worker(s)")
+    if "owner" not in st.session_state:
+        st.session_state["owner"] = os.urandom(4).hex()
+
 tab1, tab2 = st.tabs(["📊 Données d'Entrée", "🚀 Optimisation"])
 
 with tab1:
@@ -80,35 +85,172 @@ with tab1:
             else:
                 st.error(f"Fichier {filename} non trouvé.")
 
+
+def show_preview(preview):
+    st.caption("⚡ Aperçu heuristique (solution réalisable, non optimale)")
+    p1, p2, p3 = st.columns(3)
+    p1.metric("Coût Estimé", f"{preview['total_cost']:,.0f} MAD")
+    p2.metric("Dépôts", f"{len(preview['depots_ouverts'])} Ouverts")
+    p3.metric("Entrepôts", f"{len(preview['entrepots_ouverts'])} Ouverts")
+
+
+def show_trace(trace):
+    """Panneau des temps par étape: temps réel et CPU, mémoire, taille du
+    modèle (trace écrite dans results/trace.json)"""
+    table = trace_table(trace)
+    steps = table[table['profondeur'] == 0]
+    st.bar_chart(steps.set_index('étape')[['temps (s)', 'cpu (s)']])
+    st.dataframe(table.drop(columns=['id', 'parent', 'profondeur']),
+                 hide_index=True, use_container_width=True)
+
+
+def show_results(analysis, timings, trace=None):
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Coût Total", f"{analysis['total_cost']:,.0f} MAD")
+    c2.metric(
+        "Dépôts", f"{len(analysis['depots_ouverts'])} Ouverts")
+    c3.metric(
+        "Entrepôts", f"{len(analysis['entrepots_ouverts'])} Ouverts")
+
+    d1, d2 = st.columns(2)
+    with d1:
+        st.image("results/cost_breakdown.png")
+        st.image("results/flux_evolution.png")
+    with d2:
+        st.image("results/stock_evolution.png")
+        st.image("results/capacity_utilization.png")
+
+    with st.expander("⏱️ Temps de résolution"):
+        st.table(pd.DataFrame(
+            {"Étape": list(timings), "Secondes": list(timings.values())}))
+
+    if trace is not None:
+        with st.expander("🔬 Trace des étapes"):
+            show_trace(trace)
+
+
+@st.fragment(run_every=1)
+def job_panel():
+    """Suivi de la résolution en cours, rafraîchi chaque seconde sans
+    relancer toute la page"""
+    job = st.session_state.get("job")
+    if job is None:
+        return
+    if job.done:
+        st.rerun()
+    if getattr(job, 'position', None) is not None:
+        st.info(f"🕒 En file d'attente (position {job.position})")
+        if st.button("⛔ Annuler", disabled=job.request is not None):
+            job.cancel()
+        return
+    info = job.latest or {}
+    st.info(f"⏳ Calcul en cours avec {job.backend} — "
+            f"{format_progress(job.latest, job.elapsed)}")
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Temps écoulé", f"{job.elapsed:,.0f} s")
+    m2.metric("Meilleure solution", "—" if info.get('incumbent') is None
+              else f"{info['incumbent']:,.0f} MAD")
+    m3.metric("Meilleure borne", "—" if info.get('bound') is None
+              else f"{info['bound']:,.0f} MAD")
+    m4.metric("Écart", "—" if info.get('gap') is None
+              else f"{info['gap']:.2%}")
+    b1, b2 = st.columns(2)
+    if b1.button("✋ Accepter la solution courante",
+                 disabled=info.get('incumbent') is None):
+        job.accept()
+    if b2.button("⛔ Annuler", disabled=job.request is not None):
+        job.cancel()
+    if not job.interruptible:
+        st.caption(f"{job.backend} ne transmet pas sa progression: "
+                   "l'annulation prend effet à la fin de la résolution")
+
+
 with tab2:
+    job = st.session_state.get("job")
     if st.button("▶️ LANCER L'OPTIMISATION"):
-        with st.spinner("Calcul en cours avec GLPK..."):
-            try:
+        if job is not None and not job.done:
+            st.warning("Une résolution est déjà en cours")
+        else:
+            tracer = Tracer()
+            with tracer, span("lecture"):
                 data = load_and_validate_data()
-                model = build_model(data)
-                # solver = SolverFactory("glpk")
-                solver = SolverFactory("glpk")
-                results = solver.solve(model)
-
-                analysis = analyze_results(model, results)
-
-                st.balloons()
-                st.success("Optimisation Réussie !")
-
-                c1, c2, c3 = st.columns(3)
-                c1.metric("Coût Total", f"{analysis['total_cost']:,.0f} MAD")
-                c2.metric(
-                    "Dépôts", f"{len(analysis['depots_ouverts'])} Ouverts")
-                c3.metric(
-                    "Entrepôts", f"{len(analysis['entrepots_ouverts'])} Ouverts")
-                
-                d1, d2 = st.columns(2)
-                with d1:
-                    st.image("results/cost_breakdown.png")
-                    st.image("results/flux_evolution.png")
-                with d2:
-                    st.image("results/stock_evolution.png")
-                    st.image("results/capacity_utilization.png")
-
-            except Exception as e:
-                st.error(f"Erreur : {e}")
+            # Même données et mêmes réglages: solution relue sur disque
+            key = solution_key(data, backend=backend,
+                               start="heuristique" if backend != "glpk" else None)
+            cached = SOLUTION_STORE.get(key)
+            st.session_state["preview"] = None
+            st.session_state["outcome"] = None
+            if cached is not None:
+                st.session_state["outcome"] = ('cache', cached)
+            else:
+                # Aperçu heuristique affiché immédiatement, puis résolution
+                # exacte en arrière-plan
+                with tracer, span("aperçu heuristique"):
+                    preview = solve_heuristic(data)
+                st.session_state["preview"] = preview
+                session = None
+                if backend == "glpk_capi" and pool is None:
+                    # Modèle et problème GLPK conservés entre les reruns:
+                    # seules les valeurs modifiées sont mises à jour
+                    if "incremental" not in st.session_state:
+                        st.session_state["incremental"] = IncrementalSolver()
+                    session = st.session_state["incremental"]
+                # Les sites de l'aperçu servent de solution initiale
+                start = (heuristic_sites(preview, data)
+                         if backend != "glpk" else None)
+                if pool is not None:
+                    job = submit_solve(pool.queue, data, backend,
+                                       owner=st.session_state["owner"],
+                                       start=start)
+                else:
+                    job = start_solve(data, backend, start=start,
+                                      session=session)
+                st.session_state["job"] = job
+                st.session_state["job_key"] = key
+                st.session_state["tracer"] = tracer
+
+    if st.session_state.get("preview"):
+        show_preview(st.session_state["preview"])
+
+    if job is not None and not job.done:
+        job_panel()
+    elif job is not None:
+        # Résolution terminée: résultat enregistré puis affiché
+        st.session_state["job"] = None
+        if job.state == 'terminé':
+            result = job.result
+            # Trace de la session (lecture, aperçu) complétée par celle du
+            # job (construction, résolution, analyse)
+            tracer = st.session_state.pop("tracer", None)
+            if tracer is not None and 'trace' in result:
+                tracer.extend(result['trace'])
+                result['trace'] = tracer.to_dict(backend=job.backend)
+                tracer.save("results/trace.json", backend=job.backend)
+            if result['termination'] == 'optimal':
+                SOLUTION_STORE.put(st.session_state["job_key"],
+                                   result['analysis'], result['solution'],
+                                   result['timings'], backend=job.backend)
+            st.session_state["outcome"] = ('job', result)
+            st.balloons()
+        elif job.state == 'annulé':
+            st.warning("Résolution annulée")
+        elif job.state in ('erreur', 'expiré'):
+            st.error(f"Erreur : {job.error}")
+        else:
+            st.error("Aucune solution trouvée "
+                     f"({job.result['termination']})")
+
+    outcome = st.session_state.get("outcome")
+    if outcome is not None:
+        origin, result = outcome
+        if origin == 'cache':
+            st.info("♻️ Résultat repris du cache (calculé le "
+                    f"{datetime.fromtimestamp(result['created']):%Y-%m-%d %H:%M:%S}"
+                    ") — aucune résolution relancée")
+        elif result['termination'] == 'feasible':
+            st.warning("Solution courante acceptée : réalisable, optimalité "
+                       "non prouvée")
+        else:
+            st.success("Optimisation Réussie !")
+        show_results(result['analysis'], result['timings'],
+                     result.get('trace'))
@@ -0,0 +1,217 @@
+import functools
+import threading
+import time
+
+from tracing import Tracer, span
+
+# =====================================================
+# 1. Résolution en arrière-plan
+# =====================================================
+
+RUNNING = ('en attente', 'construction', 'résolution', 'analyse')
+MONITORED = ('glpk_capi', 'benders')
+
+
+class SolveJob:
+    """Résolution lancée dans un thread: l'appelant (session Streamlit)
+    reste libre et lit `progress` pendant le calcul.
+
+    `progress` reçoit l'état transmis par le solveur (solution entière,
+    meilleure borne, écart, nœuds, temps écoulé). `accept()` arrête la
+    résolution en gardant la meilleure solution trouvée, `cancel()`
+    l'arrête sans résultat. Seuls glpk_capi (et la session incrémentale)
+    et benders peuvent être interrompus; pour les autres backends, une
+    annulation n'est prise en compte qu'à la fin de la résolution.
+
+    À la fin, `result` contient l'analyse, les tableaux de la solution, les
+    temps, la condition d'arrêt et la trace des étapes (`trace`, voir
+    tracing.py), ou `error` l'exception levée.
+    """
+
+    def __init__(self, data, backend, time_limit=None, mip_gap=None,
+                 start=None, session=None):
+        self.data = data
+        self.backend = backend
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.start = start
+        self.session = session
+        self.state = 'en attente'
+        self.progress = []
+        self.result = None
+        self.error = None
+        self.request = None
+        self.created = time.time()
+        self.finished = None
+        self.tracer = Tracer()
+        self._t0 = None
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"solve-{backend}")
+
+    # ------------------------------------------------------------------
+    def run(self):
+        """Démarre le thread et retourne le job"""
+        self._t0 = time.perf_counter()
+        self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return self.state not in RUNNING
+
+    @property
+    def elapsed(self):
+        if self._t0 is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self._t0
+
+    @property
+    def latest(self):
+        """Dernier état transmis par le solveur (ou None)"""
+        return self.progress[-1] if self.progress else None
+
+    @property
+    def interruptible(self):
+        return self.backend in MONITORED
+
+    def accept(self):
+        """Arrête la résolution et garde la meilleure solution trouvée"""
+        self.request = 'accepter'
+
+    def cancel(self):
+        """Arrête la résolution et abandonne le résultat"""
+        self.request = 'annuler'
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return self.done
+
+    # ------------------------------------------------------------------
+    def _monitor(self, info):
+        self.progress.append(info)
+        return self.request is not None
+
+    def _solve(self):
+        from cache import MODEL_CACHE
+        from improvedmodel import build_model
+        from matrixmodel import build_model_matrix
+        from solver import MATRIX_BACKENDS, solve_model
+
+        if self.session is not None:
+            self.state = 'résolution'
+            with span("résolution incrémentale") as s:
+                model, results, timings = self.session.solve(
+                    self.data, time_limit=self.time_limit,
+                    mip_gap=self.mip_gap, monitor=self._monitor)
+                s.model = model
+            return self._analyze(model, results, timings)
+
+        builder = (build_model_matrix if self.backend in MATRIX_BACKENDS
+                   else build_model)
+        self.state = 'construction'
+        with MODEL_CACHE.checkout(self.data, traced(builder)) as model:
+            self.state = 'résolution'
+            results, timings = solve_model(
+                model, backend=self.backend, time_limit=self.time_limit,
+                mip_gap=self.mip_gap, start=self.start,
+                monitor=self._monitor)
+            return self._analyze(model, results, timings)
+
+    def _analyze(self, model, results, timings):
+        from improvedmodel import analyze_results
+        from solution import extract_solution
+
+        termination = str(results.solver.termination_condition)
+        if self.request == 'annuler':
+            return 'annulé'
+        self.state = 'analyse'
+        with span("analyse"):
+            analysis = analyze_results(model, results)
+        if analysis is None:
+            self.result = {'termination': termination, 'timings': timings}
+            return 'sans solution'
+        with span("extraction"):
+            solution = extract_solution(model)
+        self.result = {'analysis': analysis, 'solution': solution,
+                       'timings': timings, 'termination': termination}
+        return 'terminé'
+
+    def _run(self):
+        try:
+            with self.tracer:
+                self.state = self._solve()
+            if self.result is not None:
+                self.result['trace'] = self.tracer.to_dict(backend=self.backend)
+        except Exception as e:
+            self.error = e
+            self.state = 'erreur'
+        finally:
+            self.finished = time.perf_counter()
+
+
+def traced(builder):
+    """`builder` dont l'appel est un span "construction" de la trace active
+    (les modèles repris du cache ne sont pas reconstruits, donc pas mesurés)"""
+    @functools.wraps(builder)
+    def build(data, **kwargs):
+        with span("construction") as s:
+            m = s.model = builder(data, **kwargs)
+        return m
+    return build
+
+
+def start_solve(data, backend, **options):
+    """Lance une résolution en arrière-plan et retourne son SolveJob"""
+    return SolveJob(data, backend, **options).run()
+
+# =====================================================
+# 2. Suivi depuis la console
+# =====================================================
+
+
+def format_progress(info, elapsed=None):
+    """Ligne lisible d'un état de résolution (`elapsed`: temps écoulé du
+    job, par défaut celui transmis par le solveur)"""
+    if elapsed is None:
+        elapsed = info.get('elapsed', 0.0) if info else 0.0
+    if info is None:
+        return f"construction · {elapsed:.1f} s"
+    parts = [info.get('phase', ''), f"{elapsed:.1f} s"]
+    if info.get('incumbent') is not None:
+        parts.append(f"solution {info['incumbent']:,.2f}")
+    if info.get('bound') is not None:
+        parts.append(f"borne {info['bound']:,.2f}")
+    if info.get('gap') is not None:
+        parts.append(f"écart {info['gap']:.2%}")
+    if info.get('nodes'):
+        parts.append(f"{info['nodes']} nœuds")
+    return " · ".join(parts)
+
+
+def follow(job, every=1.0, accept_after=None):
+    """Affiche la progression d'un job jusqu'à sa fin; `accept_after`
+    (secondes) accepte la solution courante passé ce délai"""
+    while not job.wait(every):
+        print(f"   🔎 {format_progress(job.latest, job.elapsed)}")
+        if accept_after is not None and job.elapsed > accept_after \
+                and job.latest and job.latest.get('incumbent') is not None:
+            print("   ✓ Solution courante acceptée")
+            job.accept()
+            accept_after = None
+    print(f"\n✓ Job {job.state} en {job.elapsed:.1f} s")
+    return job
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+
+    data = load_and_validate_data(path="Data/")
+    # Réseau complet sur 6 mois: la résolution exacte est longue, la
+    # solution courante est acceptée au bout de 20 s
+    job = start_solve(subset_instance(data, n_months=6), "glpk_capi")
+    follow(job, accept_after=20)
+    if job.result and 'analysis' in job.result:
+        print(f"   Coût: {job.result['analysis']['total_cost']:,.2f} MAD "
+              f"({job.result['termination']})")
@@ -0,0 +1,296 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from tracing import rss_mb
+
+# =====================================================
+# 1. Mesure du temps et de la mémoire d'une étape
+# =====================================================
+
+STAGES = ("lecture", "construction", "résolution", "analyse", "graphiques")
+
+# Grilles de tailles: paramètres de generator.generate_instance
+GRIDS = {
+    'petite': [
+        {'n_clients': 20, 'n_periods': 3},
+        {'n_clients': 50, 'n_periods': 3},
+        {'n_clients': 100, 'n_periods': 6},
+    ],
+    'moyenne': [
+        {'n_clients': 100, 'n_periods': 6},
+        {'n_clients': 200, 'n_periods': 12},
+        {'n_clients': 500, 'n_periods': 12, 'n_warehouses': 40},
+        {'n_clients': 1000, 'n_periods': 12, 'n_warehouses': 50},
+    ],
+}
+
+
+class PeakMemory:
+    """Pic de mémoire résidente pendant un bloc `with`, échantillonné par un
+    thread toutes les `interval` secondes (la mémoire allouée par GLPK est
+    comptée, contrairement à tracemalloc)"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        self.start = self.peak = rss_mb()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+        return False
+
+
+# Lettres des paramètres dans le nom des instances
+SIZE_LETTERS = {'n_products': 'P', 'n_clients': 'C', 'n_warehouses': 'W',
+                'n_depots': 'D', 'n_factories': 'F', 'n_periods': 'T',
+                'density': 'd'}
+
+
+def instance_name(size):
+    """Nom court d'une taille de grille, ex. 'C200-T12-W40'"""
+    return "-".join(f"{SIZE_LETTERS[k]}{size[k]:g}" for k in SIZE_LETTERS
+                    if k in size)
+
+# =====================================================
+# 2. Exécution d'un point de la grille
+# =====================================================
+
+
+def run_point(size, workdir, backend="glpk_capi", time_limit=60, seed=0):
+    """Génère l'instance `size` et mesure chaque étape du pipeline
+    (lecture, construction, résolution, analyse, graphiques): temps, pic de
+    mémoire résidente et accroissement par rapport au début de l'étape.
+    La sortie console du pipeline est supprimée."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from pyomo.opt import TerminationCondition
+
+    from generator import generate_instance
+    from improvedmodel import (analyze_results, build_model,
+                               generate_all_visualizations,
+                               load_and_validate_data)
+    from matrixmodel import build_model_matrix
+    from solver import MATRIX_BACKENDS, solve_model
+
+    name = instance_name(size)
+    data_path = os.path.join(workdir, name)
+    generate_instance(data_path, seed=seed, **size)
+    builder = build_model_matrix if backend in MATRIX_BACKENDS else build_model
+    condition = {}
+
+    def solve(m):
+        results, _ = solve_model(m, backend=backend, tee=False,
+                                 time_limit=time_limit)
+        tc = results.solver.termination_condition
+        condition['value'] = str(tc)
+        # Solution arrêtée par la limite: acceptée (feasible), comme dans
+        # l'application, pour mesurer aussi l'analyse et les graphiques
+        if tc == TerminationCondition.maxTimeLimit:
+            results.solver.termination_condition = TerminationCondition.feasible
+        return results
+
+    steps = {
+        "lecture": lambda s: load_and_validate_data(data_path, cache=False),
+        "construction": lambda s: builder(s["lecture"]),
+        "résolution": lambda s: solve(s["construction"]),
+        "analyse": lambda s: analyze_results(s["construction"],
+                                             s["résolution"]),
+        "graphiques": lambda s: generate_all_visualizations(
+            s["construction"], s["analyse"], os.path.join(data_path, "plots")),
+    }
+    state, rows = {}, []
+    for stage in STAGES:
+        if stage == "graphiques" and state.get("analyse") is None:
+            break
+        with contextlib.redirect_stdout(io.StringIO()), \
+                PeakMemory() as mem:
+            t0 = time.perf_counter()
+            state[stage] = steps[stage](state)
+            elapsed = time.perf_counter() - t0
+        rows.append({'instance': name, 'étape': stage, 'temps (s)': elapsed,
+                     'mémoire pic (Mo)': mem.peak,
+                     'mémoire ajoutée (Mo)': mem.peak - mem.start})
+
+    m = state["construction"]
+    info = {'variables': m.nvariables(), 'contraintes': m.nconstraints(),
+            'condition': condition.get('value')}
+    for row in rows:
+        row.update(size, **info)
+    return rows
+
+
+def run_benchmark(grid="petite", backend="glpk_capi", time_limit=60,
+                  workdir=None, seed=0):
+    """Exécute chaque point de la grille dans un processus neuf (mémoire
+    mesurée sans les allocations des points précédents) et retourne le
+    tableau (instance, étape) des mesures"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing as mp
+    import tempfile
+
+    sizes = GRIDS[grid] if isinstance(grid, str) else grid
+    rows = []
+    with contextlib.ExitStack() as stack:
+        if workdir is None:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+        for size in sizes:
+            with ProcessPoolExecutor(
+                    max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+                point = pool.submit(run_point, size, workdir, backend,
+                                    time_limit, seed).result()
+            total = sum(r['temps (s)'] for r in point)
+            print(f"✓ {point[0]['instance']}: {total:.1f} s "
+                  f"({point[0]['variables']} variables, "
+                  f"{point[0]['condition']})")
+            rows.extend(point)
+    return pd.DataFrame(rows)
+
+# =====================================================
+# 3. Sauvegarde, référence et régressions
+# =====================================================
+
+
+def save_results(table, output="benchmarks/", **meta):
+    """Écrit results.json (mesures et contexte d'exécution) et results.csv
+    dans `output`; retourne le chemin du JSON"""
+    os.makedirs(output, exist_ok=True)
+    payload = {
+        'date': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(), 'platform': platform.platform(),
+        'cpus': os.cpu_count(), **meta,
+        'results': table.to_dict(orient="records"),
+    }
+    path = os.path.join(output, "results.json")
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=1, ensure_ascii=False, default=str)
+    table.to_csv(os.path.join(output, "results.csv"), index=False)
+    return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return pd.DataFrame(json.load(f)['results'])
+
+
+def check_regressions(table, baseline, tolerance=0.25, min_time=0.1,
+                      min_memory=20.0):
+    """Mesures plus de `tolerance` (relative) au-dessus de la référence,
+    pour les (instance, étape) présentes dans les deux tableaux. Les écarts
+    inférieurs à `min_time` secondes ou `min_memory` Mo sont ignorés (bruit
+    de mesure). Les temps de résolution arrêtés par la limite ne sont pas
+    comparés."""
+    keys = ['instance', 'étape']
+    merged = table.merge(baseline, on=keys, suffixes=("", " réf"))
+    flags = []
+    for metric, floor in (('temps (s)', min_time),
+                          ('mémoire ajoutée (Mo)', min_memory)):
+        ref = merged[f"{metric} réf"]
+        diff = merged[metric] - ref
+        bad = (diff > tolerance * ref) & (diff > floor)
+        if metric == 'temps (s)':
+            bad &= ~((merged['étape'] == "résolution")
+                     & (merged['condition'] != "optimal"))
+        flags.append(merged.loc[bad, keys].assign(
+            mesure=metric, valeur=merged.loc[bad, metric],
+            référence=ref[bad], ratio=merged.loc[bad, metric] / ref[bad]))
+    return pd.concat(flags, ignore_index=True)
+
+
+def print_benchmark(table):
+    print("\n⏱️  TEMPS PAR ÉTAPE (s)")
+    times = table.pivot(index='instance', columns='étape',
+                        values='temps (s)')
+    order = list(dict.fromkeys(table['instance']))
+    print(times.reindex(index=order, columns=[s for s in STAGES
+                                              if s in times])
+          .to_string(float_format=lambda x: f"{x:,.3f}"))
+    print("\n📊 MÉMOIRE AJOUTÉE PAR ÉTAPE (Mo)")
+    memory = table.pivot(index='instance', columns='étape',
+                         values='mémoire ajoutée (Mo)')
+    print(memory.reindex(index=order, columns=[s for s in STAGES
+                                               if s in memory])
+          .to_string(float_format=lambda x: f"{x:,.1f}"))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="benchmark.py",
+        description="Banc d'essai du pipeline sur des instances synthétiques: "
+                    "temps et mémoire par étape, comparaison à une référence.")
+    parser.add_argument("-g", "--grid", choices=sorted(GRIDS),
+                        default="petite", help="grille de tailles")
+    parser.add_argument("-b", "--backend", default="glpk_capi",
+                        help="solveur (défaut: glpk_capi)")
+    parser.add_argument("-t", "--time-limit", type=float, default=60,
+                        help="limite de temps de chaque résolution (s)")
+    parser.add_argument("-o", "--output", default="benchmarks/",
+                        help="dossier des résultats (défaut: benchmarks/)")
+    parser.add_argument("--baseline", default="benchmarks/baseline.json",
+                        help="référence pour la détection des régressions")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="enregistrer ces mesures comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="hausse relative tolérée (défaut: 0.25)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(argv=None):
+    """Point d'entrée; code de sortie 1 en cas de régression"""
+    import shutil
+
+    args = build_parser().parse_args(argv)
+    table = run_benchmark(args.grid, args.backend, args.time_limit,
+                          seed=args.seed)
+    print_benchmark(table)
+    path = save_results(table, args.output, grid=args.grid,
+                        backend=args.backend, time_limit=args.time_limit,
+                        seed=args.seed)
+    print(f"\n✓ Résultats: {path}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        shutil.copy(path, args.baseline)
+        print(f"✓ Référence enregistrée: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"⚠️  Pas de référence ({args.baseline}): lancer avec "
+              f"--save-baseline pour en créer une")
+        return 0
+    regressions = check_regressions(table, load_results(args.baseline),
+                                    tolerance=args.tolerance)
+    if regressions.empty:
+        print("✓ Aucune régression par rapport à la référence")
+        return 0
+    print(f"\n⚠️  {len(regressions)} RÉGRESSION(S) (> "
+          f"{100 * args.tolerance:.0f} % au-dessus de la référence)")
+    print(regressions.to_string(index=False,
+                                float_format=lambda x: f"{x:,.2f}"))
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+import time
+
+import numpy as np
+
+import glpk_capi
+
+# =====================================================
+# 1. Sous-problème: flux et stocks à sites fixés
+# =====================================================
+
+
+def subproblem_matrices(mat):
+    """Forme matricielle du sous-problème: les variables d'ouverture restent
+    des colonnes (fixées à chaque itération) mais deviennent continues et
+    sans coût fixe, qui est porté par le maître"""
+    sites = _site_cols(mat)
+    sub = dict(mat)
+    sub['c'] = mat['c'].copy()
+    sub['c'][sites] = 0.0
+    sub['integer'] = np.zeros(mat['n_vars'], dtype=bool)
+    return sub
+
+
+def elastic_matrices(sub):
+    """Sous-problème de réalisabilité (phase 1): une colonne d'écart par
+    borne finie de chaque ligne, de coût 1, et aucun autre coût.
+
+    Son optimum est nul si et seulement si le sous-problème est réalisable.
+    """
+    n, m_rows = sub['n_vars'], sub['n_cons']
+    up = np.flatnonzero(np.isfinite(sub['row_lb']))   # écart +s
+    down = np.flatnonzero(np.isfinite(sub['row_ub']))  # écart -s
+    n_slack = len(up) + len(down)
+    el = dict(sub)
+    el['n_vars'] = n + n_slack
+    el['c'] = np.concatenate([np.zeros(n), np.ones(n_slack)])
+    el['col_lb'] = np.concatenate([sub['col_lb'], np.zeros(n_slack)])
+    el['col_ub'] = np.concatenate([sub['col_ub'], np.full(n_slack, np.inf)])
+    el['integer'] = np.zeros(n + n_slack, dtype=bool)
+    el['A_row'] = np.concatenate([sub['A_row'], up, down])
+    el['A_col'] = np.concatenate([sub['A_col'], n + np.arange(n_slack)])
+    el['A_val'] = np.concatenate([sub['A_val'], np.ones(len(up)),
+                                  -np.ones(len(down))])
+    return el
+
+
+def _site_cols(mat):
+    return np.concatenate([mat['var_index']['yD'], mat['var_index']['yW']])
+
+
+class Subproblem:
+    """LP de flux et de stocks pour une configuration de sites donnée.
+
+    Le problème GLPK est conservé d'une itération à l'autre: seules les
+    bornes des colonnes yD/yW changent et le simplexe repart de la base
+    précédente.
+
+    Les flux entrepôt->client sont en plus bornés par q3 <= dem·yW (inégalité
+    valide du MILP, redondante quand y est entier). Sans elle, un entrepôt
+    fermé n'apparaît dans la coupe qu'à travers capW·yW (grand M) et les
+    coupes obtenues sont très faibles.
+    """
+
+    def __init__(self, mat):
+        self.cols = _site_cols(mat)
+        self.nD = len(mat['var_index']['yD'])
+        self.q3 = mat['var_index']['q3']
+        self.nW = len(mat['var_index']['yW'])
+        self.lane_w, lane_c = mat['params']['lanes']['LWC']
+        self.q3_ub = mat['params']['dem'][:, lane_c, :]
+        self.lp = glpk_capi.GLPKProblem(subproblem_matrices(mat))
+        self.lp.method = glpk_capi.GLP_DUALP
+        self.elastic = None
+        self.mat = mat
+
+    def _fix(self, prob, y):
+        prob.set_col_bounds(self.cols, y, y)
+        yW = y[self.nD:][self.lane_w]
+        prob.set_col_bounds(self.q3.ravel(), np.zeros(self.q3.size),
+                            (self.q3_ub * yW[None, :, None]).ravel())
+        prob.solve()
+        return prob.lib.glp_get_status(prob.prob)
+
+    def _gradient(self, prob):
+        """Sous-gradient de la valeur du sous-problème par rapport à y:
+        coûts réduits des colonnes y (lignes CAPD/CAPW) plus la contribution
+        des bornes q3 <= dem·yW"""
+        d = prob.col_duals()
+        grad = d[self.cols]
+        bound = np.minimum(d[self.q3], 0) * self.q3_ub
+        grad[self.nD:] += np.bincount(self.lane_w, bound.sum(axis=(0, 2)),
+                                      minlength=self.nW)
+        return grad
+
+    def evaluate(self, y):
+        """Résout le sous-problème pour y.
+
+        Retourne (réalisable, valeur, sous-gradient, x): la coupe associée
+        est `valeur + sous-gradient·(y' - y)`, à majorer par θ si le
+        sous-problème est réalisable, par 0 sinon (coupe de réalisabilité).
+        """
+        status = self._fix(self.lp, y)
+        if status == glpk_capi.GLP_OPT:
+            return (True, self.lp.objective(), self._gradient(self.lp),
+                    self.lp.col_values())
+
+        if self.elastic is None:
+            self.elastic = glpk_capi.GLPKProblem(
+                elastic_matrices(self.lp.mat))
+            self.elastic.method = glpk_capi.GLP_DUALP
+        self._fix(self.elastic, y)
+        return (False, self.elastic.objective(),
+                self._gradient(self.elastic), None)
+
+    def close(self):
+        self.lp.close()
+        if self.elastic is not None:
+            self.elastic.close()
+
+# =====================================================
+# 2. Problème maître: ouvertures de sites et coupes
+# =====================================================
+
+
+def capacity_cover(mat):
+    """Inégalités valides initiales du maître (lignes `a·y >= rhs`).
+
+    - chaque période, la capacité des entrepôts ouverts couvre la demande de
+      la période (les clients ne sont livrés que depuis les entrepôts);
+    - en cumulé, pour chaque produit et tous produits confondus, les
+      livraisons des entrepôts ouverts sont bornées par leur stock initial
+      au-dessus du stock de sécurité plus ce que les dépôts ouverts peuvent
+      leur expédier;
+    - dès qu'il y a une demande, au moins un entrepôt est ouvert.
+    """
+    prm = mat['params']
+    nD, nW = len(prm['capD']), len(prm['capW'])
+    demand_pt = prm['dem'].sum(axis=1)
+    spare_W = np.maximum(prm['IW0'] - prm['ssW'], 0)
+
+    rows = []
+    for t, dt in enumerate(demand_pt.sum(axis=0)):
+        rows.append((np.concatenate([np.zeros(nD), prm['capW']]), dt))
+    cumulative = np.cumsum(np.vstack([demand_pt, demand_pt.sum(axis=0)]),
+                           axis=1)
+    spare_W = np.append(spare_W, spare_W.sum())
+    for p, t in np.ndindex(*cumulative.shape):
+        rows.append((np.concatenate([(t + 1) * prm['capD'],
+                                     np.full(nW, spare_W[p])]),
+                     cumulative[p, t]))
+    if prm['dem'].sum() > 0:
+        rows.append((np.concatenate([np.zeros(nD), np.ones(nW)]), 1.0))
+    return rows
+
+
+class Master:
+    """Problème maître min Σ F·y + Σ w·θ sous les coupes accumulées.
+
+    Un seul θ par défaut; avec `weights` (probabilités des scénarios), un θ
+    par scénario (coupes multiples de la méthode L-shaped). Les coupes sont
+    conservées sous forme de lignes `a·y + b·θ >= rhs`; le problème GLPK
+    (quelques dizaines de binaires) est reconstruit à chaque itération.
+    """
+
+    def __init__(self, mat, weights=None):
+        self.cols = _site_cols(mat)
+        self.fixed = mat['c'][self.cols]
+        self.n_y = len(self.cols)
+        self.weights = np.ones(1) if weights is None else np.asarray(weights)
+        self.cuts = []
+        for a, rhs in capacity_cover(mat):
+            self.add_cover(a, rhs)
+
+    def add_cover(self, a, rhs):
+        """Inégalité valide a·y >= rhs sur les seuls sites"""
+        self.cuts.append((a, np.zeros(len(self.weights)), rhs))
+
+    def add_cut(self, feasible, value, grad, y, k=0):
+        """θk >= v + g·(y' - y) (optimalité) ou 0 >= v + g·(y' - y)
+        (réalisabilité), écrit sous la forme -g·y' + b·θ >= v - g·y"""
+        grad = np.where(np.abs(grad) > 1e-9 * np.abs(grad).max(initial=1.0),
+                        grad, 0.0)
+        b = np.zeros(len(self.weights))
+        b[k] = 1.0 if feasible else 0.0
+        self.cuts.append((-grad, b, value - grad @ y))
+
+    def matrices(self, relax=False):
+        n = self.n_y + len(self.weights)
+        A = np.array([np.concatenate([a, b]) for a, b, _ in self.cuts])
+        r, j = np.nonzero(A)
+        integer = np.zeros(n, dtype=bool)
+        integer[:self.n_y] = not relax
+        return {
+            'n_vars': n, 'n_cons': len(self.cuts),
+            'c': np.concatenate([self.fixed, self.weights]),
+            'col_lb': np.zeros(n),
+            'col_ub': np.concatenate([np.ones(self.n_y),
+                                      np.full(len(self.weights), np.inf)]),
+            'integer': integer,
+            'A_row': r, 'A_col': j, 'A_val': A[r, j],
+            'row_lb': np.array([rhs for _, _, rhs in self.cuts]),
+            'row_ub': np.full(len(self.cuts), np.inf),
+        }
+
+    def solve(self, relax=False):
+        """Retourne (borne inférieure, y) ou None si le maître est infaisable.
+        Avec `relax`, les y sont continus (relaxation linéaire du maître)."""
+        prob = glpk_capi.GLPKProblem(self.matrices(relax))
+        status = prob.solve()
+        if status != glpk_capi.GLP_OPT:
+            prob.close()
+            return None
+        x = prob.col_values()
+        bound = prob.objective()
+        prob.close()
+        y = x[:self.n_y]
+        return bound, (y if relax else y.round())
+
+# =====================================================
+# 3. Algorithme de Benders
+# =====================================================
+
+
+def _add_cuts(master, sub, feasible, value, grad, y):
+    """Coupe du sous-problème; avec un θ par scénario, une coupe par
+    scénario (`sub.scenario_cuts`, voir stochastic.ScenarioSubproblems)"""
+    if len(master.weights) == 1:
+        master.add_cut(feasible, value, grad, y)
+        return
+    for k, cut in enumerate(sub.scenario_cuts):
+        master.add_cut(*cut, y, k)
+
+
+def _with_sites(x, cols, y):
+    """Solution du sous-problème complétée par les sites du maître"""
+    if x is None:
+        return None
+    x = x.copy()
+    x[cols] = y
+    return x
+
+
+def solve_benders(mat, tol=1e-6, max_iter=1000, time_limit=None, tee=False,
+                  relax_tol=1e-4, start=None, monitor=None, sub=None,
+                  cuts=()):
+    """Décomposition de Benders sur la forme matricielle `mat`.
+
+    Le maître choisit les sites (yD, yW) et minore le coût de flux et de
+    stockage par θ; le sous-problème LP évalue la configuration et renvoie
+    une coupe d'optimalité (coûts réduits des colonnes y fixées) ou de
+    réalisabilité (phase 1 élastique). CAPD/CAPW lient tous les produits et
+    les stocks lient les périodes: le sous-problème n'est donc pas séparable
+    par produit ou par période et reste un LP unique.
+
+    Les premières itérations résolvent le maître en continu jusqu'à ce que
+    sa relaxation soit résolue à `relax_tol` près: les coupes obtenues aux
+    points fractionnaires sont valides et beaucoup plus informatives que
+    celles des configurations entières successives. Pendant cette phase, le
+    sous-problème est évalué entre la solution du maître et un point
+    intérieur (tous les sites ouverts au départ), ce qui stabilise les
+    coupes (méthode « in-out »).
+
+    `start` (valeurs de yD puis yW) est évalué avant la première itération
+    et fournit la première borne supérieure.
+
+    `monitor(info)` reçoit les bornes après chaque itération; s'il retourne
+    True, la décomposition s'arrête (statut 'stopped') avec la meilleure
+    solution trouvée.
+
+    `sub` remplace le sous-problème (objet avec `evaluate(y)` et `close()`,
+    qui peut renvoyer x=None) et `cuts` ajoute des inégalités valides
+    `a·y >= rhs` au maître. Si `sub` a des probabilités `p` (par exemple
+    stochastic.ScenarioSubproblems), le maître a un θ par scénario et
+    reçoit à chaque itération les coupes `sub.scenario_cuts` de tous les
+    scénarios.
+
+    Retourne un dictionnaire: statut, objectif, bornes, sites `y`, vecteur
+    solution `x` (ordre des colonnes de `mat`), historique et temps par
+    étape.
+    """
+    t_start = time.perf_counter()
+    master = Master(mat, getattr(sub, 'p', None))
+    for a, rhs in cuts:
+        master.add_cover(a, rhs)
+    sub = sub or Subproblem(mat)
+    lower, upper = -np.inf, np.inf
+    best_x = best_y = None
+    history = []
+    t_master = t_sub = 0.0
+    status = 'iterations'
+    relax = True
+    core = np.ones(master.n_y)
+    relax_upper = np.inf
+
+    if start is not None:
+        t0 = time.perf_counter()
+        feasible, val, grad, x = sub.evaluate(start)
+        _add_cuts(master, sub, feasible, val, grad, start)
+        if feasible:
+            upper = master.fixed @ start + val
+            best_x, best_y = _with_sites(x, master.cols, start), start
+        t_sub += time.perf_counter() - t0
+
+    for it in range(1, max_iter + 1):
+        t0 = time.perf_counter()
+        res = master.solve(relax)
+        t1 = time.perf_counter()
+        t_master += t1 - t0
+        if res is None:
+            status = 'infeasible'
+            break
+        bound, y = res
+        lower = max(lower, bound)
+        phase = 'continu' if relax else 'entier'
+        if relax:
+            y = 0.5 * (y + core)
+
+        feasible, val, grad, x = sub.evaluate(y)
+        t_sub += time.perf_counter() - t1
+        _add_cuts(master, sub, feasible, val, grad, y)
+        cost = master.fixed @ y + val
+        if relax:
+            if feasible:
+                core = y
+                relax_upper = min(relax_upper, cost)
+            # Relaxation résolue: passage au maître en nombres entiers
+            relax = relax_upper - bound > relax_tol * abs(relax_upper)
+        elif feasible and cost < upper:
+            upper = cost
+            best_x, best_y = _with_sites(x, master.cols, y), y.copy()
+
+        gap = (upper - lower) / max(abs(upper), 1.0)
+        history.append({'iteration': it, 'borne inf': lower,
+                        'borne sup': upper, 'ecart': gap,
+                        'maître': phase,
+                        'coupe': 'optimalité' if feasible else 'réalisabilité',
+                        'sites ouverts': float(y.sum())})
+        if tee:
+            print(f"   it {it:>3}  inf {lower:>14.2f}  sup {upper:>14.2f}  "
+                  f"écart {gap:>9.2e}  ({history[-1]['coupe']})")
+        if gap <= tol:
+            status = 'optimal'
+            break
+        if monitor is not None and monitor({
+                'phase': f"benders ({phase})",
+                'incumbent': upper if np.isfinite(upper) else None,
+                'bound': lower, 'gap': gap if np.isfinite(gap) else None,
+                'nodes': it, 'elapsed': time.perf_counter() - t_start}):
+            status = 'stopped'
+            break
+        if time_limit and time.perf_counter() - t_start > time_limit:
+            status = 'maxTimeLimit'
+            break
+
+    sub.close()
+    return {
+        'status': status, 'objective': upper, 'lower_bound': lower,
+        'y': best_y, 'x': best_x, 'iterations': len(history),
+        'history': history,
+        'timings': {'maître': t_master, 'sous-problème': t_sub},
+    }
+
+# =====================================================
+# 4. Comparaison avec la résolution monolithique
+# =====================================================
+
+
+def compare_benders(data, sizes=((8, 2), (20, 3)), time_limit=600):
+    """Compare GLPK monolithique (glpk_capi) et Benders sur des instances
+    réduites (clients, périodes)"""
+    import pandas as pd
+    from matrixmodel import build_model_matrix, subset_instance
+    from solver import solve_model
+    from pyomo.environ import value
+
+    rows = []
+    for n_clients, n_months in sizes:
+        small = subset_instance(data, n_clients=n_clients, n_months=n_months)
+        row = {'clients': n_clients, 'périodes': n_months}
+        for backend in ("glpk_capi", "benders"):
+            m = build_model_matrix(small)
+            results, timings = solve_model(m, backend=backend,
+                                           time_limit=time_limit)
+            row[f'{backend} (s)'] = timings['total']
+            row[f'{backend} objectif'] = value(m.OBJ)
+        row['itérations'] = len(m.benders_history)
+        rows.append(row)
+
+    table = pd.DataFrame(rows)
+    print("\n⏱️  BENDERS vs MONOLITHIQUE")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    compare_benders(load_and_validate_data(path="Data/"))
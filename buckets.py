@@ -0,0 +1,170 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import glpk_capi
+from matrixmodel import compile_matrices
+from params import period_order
+
+# =====================================================
+# 1. Définition des seaux de périodes
+# =====================================================
+
+
+def period_buckets(data, size=3):
+    """Seaux de `size` périodes consécutives (dans l'ordre de
+    params.period_order): dictionnaire période -> numéro de seau (1, 2, ...),
+    le dernier seau pouvant être plus court. Avec des mois et size=3, les
+    seaux sont des trimestres."""
+    return {t: k // size + 1 for k, t in enumerate(period_order(data))}
+
+
+def aggregate_data(data, buckets):
+    """Données agrégées par seau: demande sommée sur les périodes de chaque
+    seau, la colonne `month` portant le numéro du seau"""
+    demand = data['demand']
+    aggregated = (demand.assign(month=demand['month'].map(buckets))
+                  .groupby(['product', 'client', 'month'], as_index=False,
+                           sort=False)['demand'].sum())
+    return dict(data, demand=aggregated)
+
+
+def bucket_matrices(data, buckets):
+    """Forme matricielle du modèle agrégé.
+
+    Un seau de n périodes expédie au plus n fois la capacité d'une période
+    (CAPD, CAPW) et un stock y reste n fois plus longtemps (coûts de
+    stockage multipliés par n). Les stocks de sécurité et les stocks
+    initiaux sont inchangés.
+    """
+    mat = compile_matrices(aggregate_data(data, buckets))
+    lengths = pd.Series(buckets).value_counts()
+    n = lengths.reindex(mat['sets']['T']).to_numpy(float)
+
+    ix, rx = mat['var_index'], mat['con_index']
+    for name in ('ID', 'IW'):
+        mat['c'][ix[name]] *= n
+    for row, col in (('CAPD', 'yD'), ('CAPW', 'yW')):
+        sel = np.isin(mat['A_row'], rx[row]) & np.isin(mat['A_col'], ix[col])
+        # Lignes CAPD/CAPW numérotées par (site, période)
+        t = (mat['A_row'][sel] - rx[row][0, 0]) % rx[row].shape[1]
+        mat['A_val'][sel] *= n[t]
+    return mat
+
+# =====================================================
+# 2. Résolution agrégée puis désagrégée
+# =====================================================
+
+
+def solve_aggregated(data, size=3, time_limit=None, mip_gap=None):
+    """Choisit les sites sur le modèle agrégé par seaux de `size` périodes
+    (MILP beaucoup plus petit), puis résout le LP de toutes les périodes à
+    sites fixés.
+
+    Retourne un dictionnaire: statut, coût du modèle détaillé à ces sites,
+    coût du modèle agrégé, sites `y`, tailles et temps par étape.
+    """
+    t0 = time.perf_counter()
+    buckets = period_buckets(data, size)
+    coarse = bucket_matrices(data, buckets)
+    n_sites = len(coarse['var_index']['yD']) + len(coarse['var_index']['yW'])
+    prob = glpk_capi.GLPKProblem(coarse)
+    code = prob.solve(time_limit=time_limit, mip_gap=mip_gap)
+    t1 = time.perf_counter()
+    if code not in (glpk_capi.GLP_OPT, glpk_capi.GLP_FEAS):
+        prob.close()
+        return {'status': 'infeasible', 'objective': np.inf, 'y': None,
+                'n_buckets': len(set(buckets.values())),
+                'n_vars': (coarse['n_vars'], None),
+                'timings': {'agrégé': t1 - t0, 'total': t1 - t0}}
+    y = prob.col_values()[:n_sites].round()
+    coarse_cost = prob.objective()
+    prob.close()
+
+    fine = compile_matrices(data)
+    cols = np.arange(n_sites)
+    fine['col_lb'][cols] = y
+    fine['col_ub'][cols] = y
+    fine['integer'][:] = False
+    prob = glpk_capi.GLPKProblem(fine)
+    code = prob.solve()
+    objective = prob.objective() if code == glpk_capi.GLP_OPT else np.inf
+    prob.close()
+    t2 = time.perf_counter()
+    return {
+        'status': 'optimal' if code == glpk_capi.GLP_OPT else 'infeasible',
+        'objective': objective, 'coarse_objective': coarse_cost, 'y': y,
+        'n_buckets': len(set(buckets.values())),
+        'n_vars': (coarse['n_vars'], fine['n_vars']),
+        'timings': {'agrégé': t1 - t0, 'désagrégé': t2 - t1,
+                    'total': t2 - t0},
+    }
+
+# =====================================================
+# 3. Comparaison avec le modèle complet
+# =====================================================
+
+
+def compare_aggregation(data, sizes=(2, 3, 6), time_limit=600):
+    """Temps gagné et perte d'optimalité de l'agrégation par seaux de chaque
+    taille, par rapport au MILP de toutes les périodes (limité à
+    `time_limit`; la perte est alors mesurée contre sa meilleure solution)"""
+    from stochastic import open_sites
+
+    t0 = time.perf_counter()
+    mat = compile_matrices(data)
+    prob = glpk_capi.GLPKProblem(mat)
+    code = prob.solve(time_limit=time_limit)
+    n_sites = len(mat['var_index']['yD']) + len(mat['var_index']['yW'])
+    found = code in (glpk_capi.GLP_OPT, glpk_capi.GLP_FEAS)
+    full, y_full = np.inf, None
+    if found:
+        full = prob.objective()
+        y_full = prob.col_values()[:n_sites].round()
+    prob.close()
+    t_full = time.perf_counter() - t0
+
+    def sites(y):
+        if y is None:
+            return "—"
+        depots, warehouses = open_sites(mat, y)
+        return f"D{depots} W{warehouses}"
+
+    def loss(objective):
+        # Perte non mesurable sans solution du modèle complet
+        return 100 * (objective - full) / full if found else np.nan
+
+    status = {glpk_capi.GLP_OPT: 'optimal', glpk_capi.GLP_FEAS: 'limite'}
+    rows = [{'seaux': f"{len(mat['sets']['T'])} x 1",
+             'statut': status.get(code, 'sans solution'),
+             'variables MILP': mat['n_vars'], 'temps (s)': t_full,
+             'coût': full, 'perte (%)': loss(full),
+             'sites': sites(y_full)}]
+    for size in sizes:
+        r = solve_aggregated(data, size, time_limit=time_limit)
+        rows.append({'seaux': f"{r['n_buckets']} x {size}",
+                     'statut': r['status'], 'variables MILP': r['n_vars'][0],
+                     'temps (s)': r['timings']['total'],
+                     'coût': r['objective'],
+                     'perte (%)': loss(r['objective']),
+                     'sites': sites(r['y'])})
+
+    table = pd.DataFrame(rows)
+    table['gain'] = t_full / table['temps (s)']
+    print(f"\n⏱️  AGRÉGATION DES PÉRIODES ({len(mat['sets']['T'])} périodes)")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+
+    data = load_and_validate_data(path="Data/")
+    # 6 mois: seaux de 2 et 3 mois (trimestres) et un seul seau
+    compare_aggregation(subset_instance(data, n_clients=20, n_months=6),
+                        sizes=(2, 3, 6), time_limit=300)
+    # 12 mois: trimestres, semestres et l'année
+    compare_aggregation(subset_instance(data, n_clients=20, n_months=12),
+                        sizes=(3, 6, 12), time_limit=300)
@@ -0,0 +1,302 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+from pyomo.environ import Var
+
+# =====================================================
+# 1. Empreinte des données
+# =====================================================
+
+
+def data_fingerprint(data):
+    """Empreinte du contenu du dictionnaire de tables (noms, colonnes, types
+    et valeurs), indépendante de l'identité des objets"""
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(data):
+        df = data[name]
+        h.update(name.encode())
+        h.update(repr(list(zip(df.columns, map(str, df.dtypes)))).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy()
+                 .tobytes())
+    return h.hexdigest()
+
+
+def fixings_key(fixings):
+    """Forme hachable (et stable) d'ouvertures de sites fixées"""
+    if not fixings:
+        return None
+    return tuple((name, tuple(sorted(sites.items())))
+                 for name, sites in sorted(fixings.items()))
+
+# =====================================================
+# 2. Cache des modèles construits (LRU, borné)
+# =====================================================
+
+# Mémoire d'un modèle Pyomo par variable, mesurée avec tracemalloc sur le
+# réseau complet et sur l'instance 20 clients x 3 mois: ~380-470 octets pour
+# build_model, ~750-830 pour build_model_matrix (qui garde sa forme
+# matricielle)
+BYTES_PER_VARIABLE = {'matrix': 850, 'pyomo': 500}
+
+
+def model_bytes(m):
+    """Estimation de la mémoire occupée par un modèle construit"""
+    kind = 'matrix' if hasattr(m, 'matrix_form') else 'pyomo'
+    return BYTES_PER_VARIABLE[kind] * m.nvariables()
+
+
+class ModelCache:
+    """Modèles Pyomo construits, indexés par (constructeur, empreinte des
+    données, sites fixés), avec éviction du moins récemment utilisé au-delà
+    de `max_models` modèles ou `max_bytes` octets estimés.
+
+    Un modèle est prêté en exclusivité par `checkout` et rendu au cache à la
+    sortie du bloc: deux sessions Streamlit ne résolvent jamais le même
+    objet en même temps (la seconde construit son propre modèle).
+    """
+
+    def __init__(self, max_models=4, max_bytes=512 * 2**20):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._models)
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def _take(self, key):
+        with self._lock:
+            entry = self._models.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def _give(self, key, m):
+        size = model_bytes(m)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._models[key] = (m, size)
+            self._models.move_to_end(key)
+            while (len(self._models) > self.max_models
+                   or self.nbytes > self.max_bytes):
+                self._models.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    @contextmanager
+    def checkout(self, data, builder, fixings=None):
+        """Prête le modèle de `data` construit par `builder`
+        (build_model ou build_model_matrix), construit s'il est absent.
+
+        Les valeurs des variables d'un modèle réutilisé sont effacées; ses
+        bornes et contraintes sont celles de la construction (les backends
+        libèrent les variables qu'ils fixent).
+        """
+        key = (builder.__name__, data_fingerprint(data), fixings_key(fixings))
+        m = self._take(key)
+        if m is None:
+            m = (builder(data, fixings=fixings) if fixings
+                 else builder(data))
+        else:
+            reset_values(m)
+            print(f"\n✓ Modèle réutilisé depuis le cache ({builder.__name__})")
+        try:
+            yield m
+        finally:
+            self._give(key, m)
+
+
+def reset_values(m):
+    """Efface la solution chargée dans un modèle"""
+    for v in m.component_data_objects(Var, descend_into=True):
+        v.set_value(None, skip_validation=True)
+    if hasattr(m, 'matrix_solution'):
+        del m.matrix_solution
+
+
+# Cache partagé par le processus (toutes les sessions Streamlit)
+MODEL_CACHE = ModelCache()
+
+# =====================================================
+# 3. Solutions persistantes sur disque
+# =====================================================
+
+
+def solution_key(data, **settings):
+    """Clé d'une résolution: empreinte des données et réglages du solveur
+    (backend, limite de temps, écart, solution initiale...)"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(data_fingerprint(data).encode())
+    h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class SolutionStore:
+    """Solutions (analyse, tableaux des variables, temps) conservées sur
+    disque, un fichier pickle par clé, pour survivre aux redémarrages de
+    l'application.
+
+    Au-delà de `max_bytes` octets, les entrées les moins récemment lues
+    (date de modification, mise à jour à chaque lecture) sont supprimées.
+    Les fichiers sont écrits sous un nom temporaire puis renommés: une
+    lecture concurrente ne voit jamais de fichier partiel.
+    """
+
+    def __init__(self, path=".cache/solutions", max_bytes=256 * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".pkl")
+
+    def _entries(self):
+        if not os.path.isdir(self.path):
+            return []
+        files = [os.path.join(self.path, f) for f in os.listdir(self.path)
+                 if f.endswith(".pkl")]
+        return sorted((os.stat(f).st_mtime_ns, os.path.getsize(f), f)
+                      for f in files if os.path.exists(f))
+
+    def __len__(self):
+        return len(self._entries())
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def get(self, key):
+        """Entrée enregistrée pour `key`, ou None"""
+        filename = self._file(key)
+        try:
+            with open(filename, 'rb') as f:
+                entry = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(filename)
+        return entry
+
+    def put(self, key, analysis, solution=None, timings=None, **info):
+        """Enregistre une solution puis applique la limite de taille"""
+        os.makedirs(self.path, exist_ok=True)
+        entry = {'analysis': analysis, 'solution': solution,
+                 'timings': timings or {}, 'created': time.time(), **info}
+        tmp = self._file(key) + f".{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._file(key))
+        self.evict()
+        return entry
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, filename in self._entries():
+            os.remove(filename)
+
+
+# Solutions partagées par les sessions et conservées entre les redémarrages
+SOLUTION_STORE = SolutionStore()
+
+# =====================================================
+# 4. Comparaison: construction à froid contre cache
+# =====================================================
+
+
+def compare_model_cache(data):
+    """Temps d'une construction à froid, d'une construction avec empreinte
+    et d'une reprise depuis le cache, pour les deux constructeurs"""
+    from improvedmodel import build_model
+    from matrixmodel import build_model_matrix
+
+    cache = ModelCache()
+    rows = []
+    for builder in (build_model, build_model_matrix):
+        timings = {}
+        for label in ('froid', 'cache'):
+            t0 = time.perf_counter()
+            with cache.checkout(data, builder) as m:
+                timings[label] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        data_fingerprint(data)
+        rows.append({'constructeur': builder.__name__, **timings,
+                     'empreinte': time.perf_counter() - t0,
+                     'mémoire estimée (Mo)': model_bytes(m) / 2**20})
+
+    table = pd.DataFrame(rows)
+    table['gain'] = table['froid'] / table['cache']
+    print("\n⏱️  CACHE DES MODÈLES (s)")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.3f}"))
+    return table
+
+
+def compare_solution_cache(data, backend="glpk_capi", time_limit=None):
+    """Temps d'une requête résolue puis de la même requête servie par le
+    stockage de solutions (nouvel objet SolutionStore: relecture disque)"""
+    import tempfile
+    from improvedmodel import build_model
+    from matrixmodel import build_model_matrix
+    from solution import extract_solution, solution_kpis
+    from solver import MATRIX_BACKENDS, solve_model
+
+    builder = build_model_matrix if backend in MATRIX_BACKENDS else build_model
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ('résolution', 'cache disque'):
+            store = SolutionStore(tmp)
+            t0 = time.perf_counter()
+            key = solution_key(data, backend=backend, time_limit=time_limit)
+            entry = store.get(key)
+            if entry is None:
+                m = builder(data)
+                _, timings = solve_model(m, backend=backend,
+                                         time_limit=time_limit)
+                sol = extract_solution(m)
+                kpis = solution_kpis(sol)
+                kpis.pop('detail')
+                entry = store.put(key, kpis, sol, timings)
+            rows.append({'requête': label,
+                         'temps (s)': time.perf_counter() - t0,
+                         'coût': entry['analysis']['total_cost'],
+                         'taille (Ko)': store.nbytes / 1024})
+
+    table = pd.DataFrame(rows)
+    print(f"\n⏱️  CACHE DES SOLUTIONS ({backend})")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.3f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+
+    data = load_and_validate_data(path="Data/")
+    compare_model_cache(data)
+    compare_solution_cache(subset_instance(data, n_clients=20, n_months=3))
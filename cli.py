@@ -0,0 +1,175 @@
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+import pandas as pd
+
+from solution import EXTENSIONS
+from solver import BACKENDS
+
+# =====================================================
+# 1. Arguments
+# =====================================================
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="improvedmodel.py",
+        description="Optimisation du réseau logistique: lecture, "
+                    "construction, résolution, analyse et export, pour un ou "
+                    "plusieurs dossiers de données.")
+    parser.add_argument(
+        "data", nargs="*", default=["Data/"],
+        help="dossiers de données (13 CSV chacun; défaut: Data/)")
+    parser.add_argument(
+        "-o", "--output", default="results/",
+        help="dossier de sortie; avec plusieurs dossiers de données, un "
+             "sous-dossier par instance (défaut: results/)")
+    parser.add_argument("-b", "--backend", choices=BACKENDS, default="glpk",
+                        help="solveur (défaut: glpk)")
+    parser.add_argument("-t", "--time-limit", type=float, default=None,
+                        help="limite de temps de résolution (s)")
+    parser.add_argument("-g", "--mip-gap", type=float, default=None,
+                        help="écart relatif d'arrêt du MILP (ex. 0.01)")
+    parser.add_argument("-f", "--format", choices=sorted(EXTENSIONS),
+                        default="parquet", help="format des tables exportées")
+    parser.add_argument("--partition-by", choices=("month", "product", "none"),
+                        default="month", help="partitionnement des tables")
+    parser.add_argument("--start", default=None,
+                        help="dossier d'une exécution précédente "
+                             "(sites_*.csv) utilisé comme solution initiale; "
+                             "pour un lot, dossier de sortie du lot précédent "
+                             "(un sous-dossier par instance)")
+    parser.add_argument("--reduce", action="store_true",
+                        help="presolve des données avant construction")
+    parser.add_argument("--no-plots", dest="plots", action="store_false",
+                        help="ne pas générer les graphiques")
+    parser.add_argument("--no-export", dest="export", action="store_false",
+                        help="ne pas exporter sites, flux et stocks")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="instances résolues en parallèle (processus)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="sans journal du solveur")
+    parser.add_argument("--trace", action="store_true",
+                        help="mesurer chaque étape (temps, CPU, mémoire, "
+                             "taille du modèle) dans trace.json")
+    return parser
+
+
+def output_dirs(paths, output):
+    """Dossier de sortie de chaque instance: `output` pour une seule,
+    `output/<nom du dossier>` sinon (suffixé en cas de doublon)"""
+    if len(paths) == 1:
+        return [output]
+    dirs, seen = [], {}
+    for path in paths:
+        name = os.path.basename(os.path.normpath(path)) or "data"
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name}_{seen[name]}"
+        dirs.append(os.path.join(output, name))
+    return dirs
+
+
+def start_dirs(paths, start):
+    """Solution initiale de chaque instance: `start` pour toutes s'il
+    contient sites_depots.csv, sinon le sous-dossier de `start` que le lot
+    précédent (même dossiers de données) a écrit pour l'instance"""
+    if start is None:
+        return [None] * len(paths)
+    if os.path.exists(os.path.join(start, "sites_depots.csv")):
+        return [start] * len(paths)
+    return output_dirs(paths, start)
+
+# =====================================================
+# 2. Exécution d'une instance et d'un lot
+# =====================================================
+
+
+def run_instance(data_path, output_path, log=False, **options):
+    """Exécute main() sur un dossier de données et retourne une ligne de
+    synthèse. Avec `log`, la sortie console est écrite dans
+    output_path/run.log (exécutions parallèles)."""
+    from improvedmodel import main
+
+    os.makedirs(output_path, exist_ok=True)
+    row = {'données': data_path, 'sortie': output_path}
+    t0 = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if log:
+            f = stack.enter_context(
+                open(os.path.join(output_path, "run.log"), 'w'))
+            stack.enter_context(contextlib.redirect_stdout(f))
+            stack.enter_context(contextlib.redirect_stderr(f))
+        try:
+            _, results, analysis = main(data_path=data_path,
+                                        output_path=output_path, **options)
+            row['condition'] = str(results.solver.termination_condition)
+            row['statut'] = 'ok' if analysis is not None else 'sans solution'
+            if analysis is not None:
+                row['coût'] = analysis['total_cost']
+                row['dépôts'] = len(analysis['depots_ouverts'])
+                row['entrepôts'] = len(analysis['entrepots_ouverts'])
+        except Exception as e:
+            row['statut'] = 'erreur'
+            row['erreur'] = f"{type(e).__name__}: {e}"
+    row['temps (s)'] = time.perf_counter() - t0
+    return row
+
+
+def run_batch(paths, output="results/", jobs=1, start=None, **options):
+    """Exécute toutes les instances, `jobs` à la fois dans des processus
+    séparés; écrit et retourne le tableau de synthèse. `start`: voir
+    start_dirs"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    import multiprocessing as mp
+
+    dirs = output_dirs(paths, output)
+    starts = start_dirs(paths, start)
+    t0 = time.perf_counter()
+    if jobs <= 1:
+        rows = [run_instance(path, out, start=first, **options)
+                for path, out, first in zip(paths, dirs, starts)]
+    else:
+        rows = []
+        with ProcessPoolExecutor(max_workers=jobs,
+                                 mp_context=mp.get_context("spawn")) as pool:
+            futures = [pool.submit(run_instance, path, out, log=True,
+                                   start=first, **options)
+                       for path, out, first in zip(paths, dirs, starts)]
+            for future in as_completed(futures):
+                row = future.result()
+                mark = "✓" if row['statut'] == 'ok' else "⚠️ "
+                print(f"{mark} {row['données']}: {row['statut']} en "
+                      f"{row['temps (s)']:.1f} s (journal: {row['sortie']}/run.log)")
+                rows.append(row)
+        rows.sort(key=lambda r: paths.index(r['données']))
+    total = time.perf_counter() - t0
+
+    table = pd.DataFrame(rows)
+    os.makedirs(output, exist_ok=True)
+    table.to_csv(os.path.join(output, "summary.csv"), index=False)
+    print(f"\n⏱️  LOT: {len(paths)} instance(s) en {total:.1f} s "
+          f"({jobs} processus)")
+    print(table.drop(columns=['sortie']).to_string(
+        index=False, float_format=lambda x: f"{x:,.2f}"))
+    return table
+
+
+def cli(argv=None):
+    """Point d'entrée en ligne de commande; code de sortie 0 si toutes les
+    instances ont une solution"""
+    args = build_parser().parse_args(argv)
+    table = run_batch(
+        args.data, output=args.output, jobs=args.jobs, backend=args.backend,
+        time_limit=args.time_limit, mip_gap=args.mip_gap, fmt=args.format,
+        partition_by=None if args.partition_by == "none" else args.partition_by,
+        start=args.start, reduce=args.reduce, plots=args.plots,
+        export=args.export, tee=not args.quiet, trace=args.trace)
+    return 0 if (table['statut'] == 'ok').all() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,294 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import glpk_capi
+from matrixmodel import compile_matrices
+from params import model_sets
+
+# =====================================================
+# 1. Regroupement des clients (k-means sur les coûts entrepôt -> client)
+# =====================================================
+
+
+def cost_vectors(data):
+    """Vecteur des coûts entrepôt -> client de chaque client (lignes dans
+    l'ordre de model_sets). Une liaison absente prend le double du coût
+    maximal de son entrepôt."""
+    S = model_sets(data)
+    X = (data['cWC'].pivot(index='client', columns='warehouse', values='cost')
+         .reindex(index=S['C'], columns=S['W']))
+    return S['C'], X.fillna(2 * X.max()).to_numpy(float)
+
+
+def kmeans(X, k, n_iter=100, seed=0):
+    """k-means (initialisation k-means++, itérations de Lloyd) en NumPy.
+    Retourne (étiquettes 0..k-1, centres, inertie)."""
+    rng = np.random.default_rng(seed)
+    n = len(X)
+    k = min(k, n)
+    centers = [X[rng.integers(n)]]
+    d2 = ((X - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        i = rng.choice(n, p=d2 / d2.sum()) if d2.sum() > 0 else rng.integers(n)
+        centers.append(X[i])
+        d2 = np.minimum(d2, ((X - X[i]) ** 2).sum(axis=1))
+    centers = np.array(centers)
+
+    labels = None
+    for _ in range(n_iter):
+        dist = ((X[:, None, :] - centers[None]) ** 2).sum(axis=2)
+        new = dist.argmin(axis=1)
+        if labels is not None and (new == labels).all():
+            break
+        labels = new
+        for j in range(k):
+            members = labels == j
+            if members.any():
+                centers[j] = X[members].mean(axis=0)
+            else:
+                # Groupe vide: repris par le client le plus éloigné
+                far = dist[np.arange(n), labels].argmax()
+                centers[j] = X[far]
+                labels[far] = j
+    inertia = float(((X - centers[labels]) ** 2).sum())
+    return labels, centers, inertia
+
+
+def cluster_data(data, clients, labels):
+    """Données agrégées: un client fictif par groupe (numéros 1..k), demande
+    sommée sur les membres et coût de chaque entrepôt vers le groupe égal au
+    coût minimal de ses membres. Toute solution du modèle détaillé donne une
+    solution du modèle agrégé de coût inférieur ou égal: son optimum est une
+    borne inférieure."""
+    group = pd.Series(labels + 1, index=clients)
+    demand = data['demand']
+    demand = (demand.assign(client=demand['client'].map(group))
+              .groupby(['product', 'client', 'month'], as_index=False,
+                       sort=False)['demand'].sum())
+    cWC = data['cWC']
+    cWC = (cWC[cWC['client'].isin(group.index)]
+           .assign(client=lambda df: df['client'].map(group))
+           .groupby(['warehouse', 'client'], as_index=False)['cost'].min())
+    return dict(data, demand=demand, cWC=cWC)
+
+# =====================================================
+# 2. Désagrégation: problème de transport par produit et période
+# =====================================================
+
+
+def disaggregate(data, mat, x):
+    """Répartit les expéditions des entrepôts de la solution agrégée `x`
+    (forme `mat`) entre les clients réels: pour chaque produit et période,
+    problème de transport de coût minimal entre les entrepôts qui expédient
+    et les clients, sur les liaisons de cWC. Les flux q1, q2 et les stocks de
+    la solution agrégée restent valides.
+
+    Retourne (coût de transport entrepôt -> client, table des flux), ou
+    (inf, None) si une demande ne peut pas être servie.
+    """
+    S = model_sets(data)
+    W = mat['sets']['W']
+    wc_w = mat['params']['lanes']['LWC'][0]
+    q3 = x[mat['var_index']['q3']]
+    supply = np.zeros((len(mat['sets']['P']), len(W), len(mat['sets']['T'])))
+    np.add.at(supply, (slice(None), wc_w, slice(None)), q3)
+
+    dem = (data['demand'].pivot_table(index=['product', 'month'],
+                                      columns='client', values='demand',
+                                      aggfunc='sum', fill_value=0.0)
+           .reindex(columns=S['C'], fill_value=0.0))
+    lanes = data['cWC']
+    w_pos = pd.Index(W).get_indexer(lanes['warehouse'])
+    c_pos = pd.Index(S['C']).get_indexer(lanes['client'])
+    keep = (w_pos >= 0) & (c_pos >= 0)
+    w_pos, c_pos = w_pos[keep], c_pos[keep]
+    cost = lanes['cost'].to_numpy(float)[keep]
+
+    total, flows = 0.0, []
+    for i, p in enumerate(mat['sets']['P']):
+        for t, month in enumerate(mat['sets']['T']):
+            d = dem.loc[(p, month)].to_numpy(float)
+            if d.sum() <= 0:
+                continue
+            s = supply[i, :, t]
+            sel = s[w_pos] > 1e-9
+            n, nC = int(sel.sum()), len(S['C'])
+            if n == 0:
+                return np.inf, None
+            rows = np.concatenate([c_pos[sel], nC + w_pos[sel]])
+            prob = glpk_capi.GLPKProblem({
+                'n_vars': n, 'n_cons': nC + len(W), 'c': cost[sel],
+                'col_lb': np.zeros(n), 'col_ub': np.full(n, np.inf),
+                'integer': np.zeros(n, dtype=bool),
+                'A_row': rows, 'A_col': np.tile(np.arange(n), 2),
+                'A_val': np.ones(2 * n),
+                # Demande exacte, expéditions bornées par celles de la
+                # solution agrégée (égales aux arrondis près)
+                'row_lb': np.concatenate([d, np.full(len(W), -np.inf)]),
+                'row_ub': np.concatenate([d, s + 1e-6]),
+            })
+            code = prob.solve()
+            if code != glpk_capi.GLP_OPT:
+                prob.close()
+                return np.inf, None
+            total += prob.objective()
+            q = prob.col_values()
+            prob.close()
+            nz = q > 1e-9
+            flows.append(pd.DataFrame({
+                'product': p, 'warehouse': np.asarray(W)[w_pos[sel][nz]],
+                'client': np.asarray(S['C'])[c_pos[sel][nz]],
+                'month': month, 'flow': q[nz]}))
+    return total, pd.concat(flows, ignore_index=True)
+
+
+def fixed_sites(data, y):
+    """Repli de la désagrégation: LP détaillé (tous les clients) à sites
+    `y` fixés. Un groupe peut être servi par un entrepôt qu'un seul de ses
+    membres atteint: chaque client avec demande sans liaison vers un
+    entrepôt ouvert ouvre d'abord l'entrepôt de sa liaison la moins chère.
+
+    Retourne (coût, table des flux entrepôt -> client), ou (inf, None) si
+    ces sites ne peuvent pas servir la demande.
+    """
+    fine = compile_matrices(data)
+    S = fine['sets']
+    y = np.asarray(y, dtype=float).copy()
+    nD = len(S['D'])
+    opened = pd.Index(S['W'])[y[nD:] > 0.5]
+    lanes = data['cWC']
+    served = lanes.loc[lanes['warehouse'].isin(opened), 'client']
+    demanded = data['demand'].loc[data['demand']['demand'] > 0, 'client']
+    missing = lanes[lanes['client'].isin(demanded)
+                    & ~lanes['client'].isin(served)]
+    if len(missing):
+        cheapest = missing.loc[missing.groupby('client')['cost'].idxmin()]
+        y[nD + pd.Index(S['W']).get_indexer(cheapest['warehouse'])] = 1.0
+
+    cols = np.arange(len(y))
+    fine['col_lb'][cols] = y
+    fine['col_ub'][cols] = y
+    fine['integer'][:] = False
+    prob = glpk_capi.GLPKProblem(fine)
+    code = prob.solve()
+    if code != glpk_capi.GLP_OPT:
+        prob.close()
+        return np.inf, None
+    total = prob.objective()
+    q3 = prob.col_values()[fine['var_index']['q3']]
+    prob.close()
+
+    wc_w, wc_c = fine['params']['lanes']['LWC']
+    p, lane, t = np.nonzero(q3 > 1e-9)
+    flows = pd.DataFrame({
+        'product': np.asarray(S['P'])[p],
+        'warehouse': np.asarray(S['W'])[wc_w[lane]],
+        'client': np.asarray(S['C'])[wc_c[lane]],
+        'month': np.asarray(S['T'])[t], 'flow': q3[p, lane, t]})
+    return total, flows
+
+# =====================================================
+# 3. Résolution agrégée et comparaison
+# =====================================================
+
+
+def solve_clustered(data, k=10, seed=0, time_limit=None, mip_gap=None):
+    """Regroupe les clients en `k` groupes, résout le MILP agrégé puis
+    désagrège les livraisons.
+
+    Le coût de la solution désagrégée est une borne supérieure de l'optimum
+    détaillé, l'optimum agrégé une borne inférieure (si le MILP agrégé est
+    résolu à l'optimum): leur écart relatif borne l'erreur d'agrégation.
+    Si le transport ne peut pas servir les clients réels (liaisons
+    entrepôt -> client creuses), la borne supérieure est le LP détaillé aux
+    sites agrégés (fixed_sites); `disaggregation` indique la méthode.
+    """
+    t0 = time.perf_counter()
+    clients, X = cost_vectors(data)
+    labels, _, inertia = kmeans(X, k, seed=seed)
+    mat = compile_matrices(cluster_data(data, clients, labels))
+    t1 = time.perf_counter()
+
+    prob = glpk_capi.GLPKProblem(mat)
+    code = prob.solve(time_limit=time_limit, mip_gap=mip_gap)
+    t2 = time.perf_counter()
+    if code not in (glpk_capi.GLP_OPT, glpk_capi.GLP_FEAS):
+        prob.close()
+        return {'status': 'infeasible', 'objective': np.inf,
+                'lower_bound': np.nan, 'bound': np.nan, 'y': None,
+                'k': int(labels.max()) + 1, 'n_vars': mat['n_vars'],
+                'timings': {'regroupement': t1 - t0, 'agrégé': t2 - t1,
+                            'total': t2 - t0}}
+    x = prob.col_values()
+    aggregated = prob.objective()
+    prob.close()
+    n_sites = len(mat['var_index']['yD']) + len(mat['var_index']['yW'])
+
+    transport, flows = disaggregate(data, mat, x)
+    q3 = mat['var_index']['q3']
+    upper = (aggregated - float(mat['c'][q3].ravel() @ x[q3].ravel())
+             + transport)
+    method = 'transport'
+    if not np.isfinite(upper):
+        upper, flows = fixed_sites(data, x[:n_sites].round())
+        method = 'sites fixés'
+    t3 = time.perf_counter()
+    lower = aggregated if code == glpk_capi.GLP_OPT else np.nan
+    return {
+        'status': 'optimal' if np.isfinite(upper) else 'infeasible',
+        'objective': upper, 'lower_bound': lower,
+        'bound': (upper - lower) / upper, 'y': x[:n_sites].round(),
+        'flows': flows, 'disaggregation': method,
+        'k': int(labels.max()) + 1, 'inertia': inertia,
+        'n_vars': mat['n_vars'],
+        'timings': {'regroupement': t1 - t0, 'agrégé': t2 - t1,
+                    'désagrégation': t3 - t2, 'total': t3 - t0},
+    }
+
+
+def compare_clustering(data, ks=(5, 10, 20, 50), time_limit=600):
+    """Temps, coût et borne d'erreur selon le nombre de groupes, par rapport
+    au MILP détaillé (limité à `time_limit`)"""
+    t0 = time.perf_counter()
+    mat = compile_matrices(data)
+    prob = glpk_capi.GLPKProblem(mat)
+    code = prob.solve(time_limit=time_limit)
+    found = code in (glpk_capi.GLP_OPT, glpk_capi.GLP_FEAS)
+    full = prob.objective() if found else np.inf
+    prob.close()
+    t_full = time.perf_counter() - t0
+
+    def gap(objective):
+        # Écart non mesurable sans solution du modèle détaillé
+        return 100 * (objective - full) / full if found else np.nan
+
+    status = {glpk_capi.GLP_OPT: 'optimal', glpk_capi.GLP_FEAS: 'limite'}
+    rows = [{'groupes': len(mat['sets']['C']), 'variables': mat['n_vars'],
+             'statut': status.get(code, 'sans solution'),
+             'temps (s)': t_full, 'coût': full, 'borne inf': np.nan,
+             'borne erreur (%)': np.nan, 'écart réel (%)': gap(full)}]
+    for k in ks:
+        r = solve_clustered(data, k, time_limit=time_limit)
+        rows.append({'groupes': r['k'], 'variables': r['n_vars'],
+                     'statut': r['status'],
+                     'temps (s)': r['timings']['total'],
+                     'coût': r['objective'], 'borne inf': r['lower_bound'],
+                     'borne erreur (%)': 100 * r['bound'],
+                     'écart réel (%)': gap(r['objective'])})
+
+    table = pd.DataFrame(rows)
+    table['gain'] = t_full / table['temps (s)']
+    print(f"\n⏱️  REGROUPEMENT DES CLIENTS ({len(mat['sets']['C'])} clients, "
+          f"{len(mat['sets']['T'])} périodes)")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+
+    data = subset_instance(load_and_validate_data(path="Data/"), n_months=3)
+    compare_clustering(data, ks=(2, 5, 10, 20, 50), time_limit=600)
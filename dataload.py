@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# =====================================================
+# 1. Fichiers d'entrée et types des colonnes
+# =====================================================
+
+FILES = {
+    'demand': "demand_pct.csv",
+    'capD': "capacity_depots.csv",
+    'capW': "capacity_warehouses.csv",
+    'fixD': "fixed_cost_depots.csv",
+    'fixW': "fixed_cost_warehouses.csv",
+    'hold': "holding_costs.csv",
+    'cFD': "transport_factory_depot.csv",
+    'cDW': "transport_depot_warehouse.csv",
+    'cWC': "transport_warehouse_client.csv",
+    'ssD': "safety_stock_depots.csv",
+    'ssW': "safety_stock_warehouses.csv",
+    'iD': "initial_stock_depots.csv",
+    'iW': "initial_stock_warehouses.csv",
+}
+
+# Identifiants entiers, valeurs en flottants: les types ne dépendent plus de
+# l'inférence de pandas (une capacité décimale ajoutée dans l'éditeur ne
+# change pas le type de la colonne entre deux exécutions)
+ID_COLUMNS = ('product', 'client', 'factory', 'depot', 'warehouse')
+
+# Périodes: numéros entiers, ou libellés triés comme du texte (formats ISO
+# du type 2024-03, 2024-W05, 2024-Q1; voir params.period_order)
+PERIOD_COLUMNS = ('month',)
+
+
+def column_dtypes(columns):
+    return {c: np.int64 if c in ID_COLUMNS
+            else str if c in PERIOD_COLUMNS else np.float64
+            for c in columns}
+
+
+def read_csv_typed(filename):
+    """Lit un CSV avec des types explicites (en-tête lu d'abord). Une
+    colonne de périodes ne contenant que des entiers est convertie en
+    int64, sinon elle garde ses libellés."""
+    columns = pd.read_csv(filename, nrows=0).columns
+    df = pd.read_csv(filename, dtype=column_dtypes(columns))
+    for c in PERIOD_COLUMNS:
+        if c in df and df[c].str.fullmatch(r"[+-]?\d+").all():
+            df[c] = df[c].astype(np.int64)
+    return df
+
+# =====================================================
+# 2. Cache binaire (.npz) indexé par le contenu des fichiers
+# =====================================================
+
+CACHE_DIR = ".cache"
+MANIFEST = "manifest.json"
+
+
+def file_hash(filename, chunk=1 << 20):
+    """Empreinte BLAKE2 du contenu d'un fichier"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_manifest(cache):
+    try:
+        with open(os.path.join(cache, MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_npz(df, filename):
+    # Libellés (périodes) en chaînes de longueur fixe: relus sans pickle
+    np.savez(filename, **{c: df[c].to_numpy(str if df[c].dtype == object
+                                             else None)
+                          for c in df.columns},
+             __columns__=np.array(df.columns, dtype=str))
+
+
+def _read_npz(filename):
+    with np.load(filename) as z:
+        return pd.DataFrame({str(c): z[c] for c in z['__columns__']})
+
+
+def _signature(filename):
+    st = os.stat(filename)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def load_tables(path="Data/", cache=True):
+    """Charge les 13 tables d'entrée.
+
+    Chaque CSV n'est relu que si son contenu a changé depuis le dernier
+    chargement: sinon sa forme binaire (path/.cache/<nom>.npz, types déjà
+    appliqués) est utilisée. Taille et date de modification évitent de
+    recalculer l'empreinte d'un fichier inchangé; un fichier simplement
+    touché est re-haché mais pas reparsé. Une entrée illisible est
+    supprimée et remplacée par le CSV.
+
+    Retourne (données, statistiques {table: 'cache' | 'csv'}).
+    """
+    cache_dir = os.path.join(path, CACHE_DIR)
+    manifest = _read_manifest(cache_dir) if cache else {}
+    data, source = {}, {}
+    for name, csv in FILES.items():
+        filename = os.path.join(path, csv)
+        signature = _signature(filename)
+        entry = manifest.get(name, {})
+        binary = os.path.join(cache_dir, name + ".npz")
+        valid = entry.get('file') == csv and os.path.exists(binary)
+        digest = None
+        if valid and entry['signature'] != signature:
+            digest = file_hash(filename)
+            valid = entry['hash'] == digest
+        if valid:
+            try:
+                data[name] = _read_npz(binary)
+                source[name] = 'cache'
+            except (OSError, ValueError, KeyError, EOFError,
+                    zipfile.BadZipFile) as e:
+                # Entrée corrompue (écriture interrompue...): supprimée,
+                # le CSV est relu et remis en cache
+                print(f"⚠️  Cache illisible pour {csv}, CSV relu: {e}")
+                try:
+                    os.remove(binary)
+                except OSError:
+                    pass
+                valid = False
+        if not valid:
+            data[name] = read_csv_typed(filename)
+            source[name] = 'csv'
+            if not cache:
+                continue
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                _write_npz(data[name], binary)
+            except OSError as e:
+                print(f"⚠️  Cache non écrit pour {csv}: {e}")
+                continue
+        manifest[name] = {'file': csv, 'signature': signature,
+                          'hash': digest or (entry['hash'] if valid
+                                             else file_hash(filename))}
+
+    if cache:
+        try:
+            with open(os.path.join(cache_dir, MANIFEST), 'w') as f:
+                json.dump(manifest, f, indent=1)
+        except OSError:
+            pass
+    return data, source
+
+
+def clear_cache(path="Data/"):
+    import shutil
+    shutil.rmtree(os.path.join(path, CACHE_DIR), ignore_errors=True)
+
+# =====================================================
+# 3. Comparaison: lecture CSV, cache froid, cache chaud
+# =====================================================
+
+
+def _scaled_copy(path, target, repeat):
+    """Copie des données dont l'historique de demande est répété `repeat`
+    fois sur des mois successifs"""
+    import shutil
+
+    os.makedirs(target, exist_ok=True)
+    for csv in FILES.values():
+        shutil.copy(os.path.join(path, csv), os.path.join(target, csv))
+    demand = read_csv_typed(os.path.join(path, FILES['demand']))
+    n_months = demand['month'].max()
+    history = pd.concat(
+        [demand.assign(month=demand['month'] + k * n_months)
+         for k in range(repeat)], ignore_index=True)
+    history.to_csv(os.path.join(target, FILES['demand']), index=False)
+    return len(history)
+
+
+def _append_blank_line(filename):
+    """Modifie le contenu d'un fichier sans changer les données lues"""
+    with open(filename, 'a') as f:
+        f.write("\n")
+
+
+def compare_loading(path="Data/", repeats=(1, 100, 300)):
+    """Temps de chargement: CSV sans cache, premier chargement (CSV + écriture
+    du cache), chargement suivant (cache), et après modification d'un seul
+    petit fichier"""
+    import tempfile
+
+    rows = []
+    for repeat in repeats:
+        with tempfile.TemporaryDirectory() as tmp:
+            n_rows = _scaled_copy(path, tmp, repeat)
+            timings = {}
+            for label, action in (
+                    ('csv', lambda: load_tables(tmp, cache=False)),
+                    ('froid', lambda: load_tables(tmp)),
+                    ('chaud', lambda: load_tables(tmp)),
+                    ('1 fichier modifié', lambda: (
+                        _append_blank_line(os.path.join(tmp, FILES['capD'])),
+                        load_tables(tmp))[1])):
+                t0 = time.perf_counter()
+                action()
+                timings[label] = time.perf_counter() - t0
+            rows.append({'lignes demande': n_rows, **timings})
+
+    table = pd.DataFrame(rows)
+    table['gain chaud'] = table['csv'] / table['chaud']
+    print("\n⏱️  CHARGEMENT DES DONNÉES (s)")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.4f}"))
+    return table
+
+
+if __name__ == "__main__":
+    compare_loading("Data/")
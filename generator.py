@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataload import FILES
+
+# =====================================================
+# 1. Instances synthétiques
+# =====================================================
+
+
+def _lanes(origins, destinations, xy_o, xy_d, rng, base=2, scale=12,
+           density=1.0):
+    """Liaisons origine -> destination avec un coût entier croissant avec la
+    distance. Avec `density` < 1, chaque destination ne garde que la
+    fraction la plus proche de ses origines (au moins une)."""
+    dist = np.linalg.norm(xy_o[:, None] - xy_d[None], axis=2)
+    cost = np.round(base + scale * dist * rng.uniform(0.9, 1.1, dist.shape))
+    keep = np.ones(dist.shape, dtype=bool)
+    if density < 1:
+        n_keep = max(1, int(round(density * len(origins))))
+        rank = dist.argsort(axis=0).argsort(axis=0)
+        keep = rank < n_keep
+    o, d = np.nonzero(keep)
+    return origins[o], destinations[d], cost[o, d]
+
+
+def generate_instance(path, n_products=3, n_clients=200, n_warehouses=20,
+                      n_depots=3, n_factories=2, n_periods=12, density=1.0,
+                      seed=0):
+    """Écrit dans `path` les 13 CSV d'une instance synthétique valide.
+
+    Usines, dépôts, entrepôts et clients sont placés au hasard dans le carré
+    unité; les coûts de transport croissent avec la distance. La demande
+    suit une saisonnalité annuelle bruitée. Les capacités sont
+    dimensionnées sur la demande de la période la plus chargée (entrepôts
+    environ 2,7 fois, dépôts environ 4,5 fois, comme Data/), les coûts fixes
+    sur les capacités, et les stocks initiaux dépassent les stocks de
+    sécurité. `density` < 1 ne garde, pour chaque client, que les entrepôts
+    les plus proches (voir matrixmodel.sparse_lanes).
+
+    Retourne le nombre de lignes de demande.
+    """
+    rng = np.random.default_rng(seed)
+    P, C, T = (np.arange(1, n + 1) for n in (n_products, n_clients, n_periods))
+    F, D, W = (np.arange(1, n + 1) for n in (n_factories, n_depots,
+                                             n_warehouses))
+    xy = {k: rng.random((len(s), 2)) for k, s in zip('FDWC', (F, D, W, C))}
+
+    season = 1 + 0.2 * np.sin(2 * np.pi * (T - 1) / 12)
+    base = rng.uniform(5, 15, (n_products, n_clients))
+    dem = np.round(base[:, :, None] * season[None, None, :]
+                   * rng.normal(1, 0.1, (n_products, n_clients, n_periods))
+                   .clip(0.5), 1)
+    p, c, t = np.meshgrid(P, C, T, indexing='ij')
+    peak = dem.sum(axis=(0, 1)).max()
+
+    capW = np.round(np.maximum(1200, 2.7 * peak / n_warehouses)
+                    * rng.uniform(0.85, 1.15, len(W)))
+    capD = np.round(np.maximum(13500, 4.5 * peak / n_depots)
+                    * rng.uniform(0.85, 1.15, len(D)))
+    hold_D = rng.integers(2, 6, len(P))
+    ssD, ssW = rng.integers(50, 101, len(P)), rng.integers(50, 101, len(P))
+
+    tables = {
+        'demand': pd.DataFrame({'product': p.ravel(), 'client': c.ravel(),
+                                'month': t.ravel(), 'demand': dem.ravel()}),
+        'capD': pd.DataFrame({'depot': D, 'capacity': capD}),
+        'capW': pd.DataFrame({'warehouse': W, 'capacity': capW}),
+        'fixD': pd.DataFrame({'depot': D, 'fixed_cost': np.round(
+            20 * capD * rng.uniform(0.8, 1.2, len(D)), -3)}),
+        'fixW': pd.DataFrame({'warehouse': W, 'fixed_cost': np.round(
+            30 * capW * rng.uniform(0.8, 1.2, len(W)), -3)}),
+        'hold': pd.DataFrame({'product': P, 'holding_depot': hold_D,
+                              'holding_warehouse': hold_D + 2}),
+        'ssD': pd.DataFrame({'product': P, 'safety_stock': ssD}),
+        'ssW': pd.DataFrame({'product': P, 'safety_stock': ssW}),
+        'iD': pd.DataFrame({'product': P, 'initial_stock':
+                            ssD + rng.integers(50, 151, len(P))}),
+        'iW': pd.DataFrame({'product': P, 'initial_stock':
+                            ssW + rng.integers(20, 81, len(P))}),
+    }
+    sets = {'F': F, 'D': D, 'W': W, 'C': C}
+    for name, (o, d), keys, scale, dens in (
+            ('cFD', 'FD', ['factory', 'depot'], 15, 1.0),
+            ('cDW', 'DW', ['depot', 'warehouse'], 10, 1.0),
+            ('cWC', 'WC', ['warehouse', 'client'], 12, density)):
+        a, b, cost = _lanes(sets[o], sets[d], xy[o], xy[d], rng,
+                            scale=scale, density=dens)
+        tables[name] = pd.DataFrame({keys[0]: a, keys[1]: b, 'cost': cost})
+
+    os.makedirs(path, exist_ok=True)
+    for name, csv in FILES.items():
+        tables[name].to_csv(os.path.join(path, csv), index=False)
+    return len(tables['demand'])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import compile_matrices
+
+    parser = argparse.ArgumentParser(
+        description="Écrit les 13 CSV d'une instance synthétique.")
+    parser.add_argument("path", help="dossier de sortie")
+    for name, default in (("products", 3), ("clients", 200),
+                          ("warehouses", 20), ("depots", 3), ("factories", 2),
+                          ("periods", 12), ("seed", 0)):
+        parser.add_argument(f"--{name}", type=int, default=default)
+    parser.add_argument("--density", type=float, default=1.0,
+                        help="part des entrepôts reliés à chaque client")
+    args = parser.parse_args()
+
+    n = generate_instance(
+        args.path, n_products=args.products, n_clients=args.clients,
+        n_warehouses=args.warehouses, n_depots=args.depots,
+        n_factories=args.factories, n_periods=args.periods,
+        density=args.density, seed=args.seed)
+    print(f"✓ Instance synthétique écrite dans {args.path} ({n} demandes)")
+    mat = compile_matrices(load_and_validate_data(args.path, cache=False))
+    print(f"   {mat['n_vars']} variables, {mat['n_cons']} contraintes")
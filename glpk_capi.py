@@ -0,0 +1,431 @@
+import ctypes
+import ctypes.util
+import os
+import time
+
+import numpy as np
+
+# =====================================================
+# 1. Chargement de la bibliothèque GLPK (libglpk)
+# =====================================================
+
+GLP_MIN = 1
+GLP_FR, GLP_LO, GLP_UP, GLP_DB, GLP_FX = 1, 2, 3, 4, 5
+GLP_CV, GLP_IV = 1, 2
+GLP_OFF, GLP_ON = 0, 1
+GLP_MSG_OFF, GLP_MSG_ON = 0, 2
+GLP_PRIMAL, GLP_DUALP = 1, 2
+GLP_SF_AUTO = 0x80
+GLP_UNDEF, GLP_FEAS, GLP_INFEAS, GLP_NOFEAS, GLP_OPT, GLP_UNBND = 1, 2, 3, 4, 5, 6
+GLP_ETMLIM, GLP_ESTOP, GLP_EMIPGAP = 9, 13, 14
+GLP_IBINGO, GLP_IHEUR, GLP_IBRANCH, GLP_ISELECT = 2, 3, 5, 6
+GLP_NO_BRNCH = 0
+
+
+class glp_smcp(ctypes.Structure):
+    """Paramètres du simplexe (glpk.h)"""
+    _fields_ = [
+        ('msg_lev', ctypes.c_int), ('meth', ctypes.c_int),
+        ('pricing', ctypes.c_int), ('r_test', ctypes.c_int),
+        ('tol_bnd', ctypes.c_double), ('tol_dj', ctypes.c_double),
+        ('tol_piv', ctypes.c_double), ('obj_ll', ctypes.c_double),
+        ('obj_ul', ctypes.c_double), ('it_lim', ctypes.c_int),
+        ('tm_lim', ctypes.c_int), ('out_frq', ctypes.c_int),
+        ('out_dly', ctypes.c_int), ('presolve', ctypes.c_int),
+        ('excl', ctypes.c_int), ('shift', ctypes.c_int),
+        ('aorn', ctypes.c_int), ('foo_bar', ctypes.c_double * 33),
+    ]
+
+
+CALLBACK = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_void_p)
+
+
+class glp_iocp(ctypes.Structure):
+    """Paramètres du branch-and-cut (glpk.h)"""
+    _fields_ = [
+        ('msg_lev', ctypes.c_int), ('br_tech', ctypes.c_int),
+        ('bt_tech', ctypes.c_int), ('tol_int', ctypes.c_double),
+        ('tol_obj', ctypes.c_double), ('tm_lim', ctypes.c_int),
+        ('out_frq', ctypes.c_int), ('out_dly', ctypes.c_int),
+        ('cb_func', CALLBACK), ('cb_info', ctypes.c_void_p),
+        ('cb_size', ctypes.c_int), ('pp_tech', ctypes.c_int),
+        ('mip_gap', ctypes.c_double), ('mir_cuts', ctypes.c_int),
+        ('gmi_cuts', ctypes.c_int), ('cov_cuts', ctypes.c_int),
+        ('clq_cuts', ctypes.c_int), ('presolve', ctypes.c_int),
+        ('binarize', ctypes.c_int), ('fp_heur', ctypes.c_int),
+        ('ps_heur', ctypes.c_int), ('ps_tm_lim', ctypes.c_int),
+        ('sr_heur', ctypes.c_int), ('use_sol', ctypes.c_int),
+        ('save_sol', ctypes.c_char_p), ('alien', ctypes.c_int),
+        ('flip', ctypes.c_int), ('foo_bar', ctypes.c_double * 23),
+    ]
+
+
+_SIGNATURES = {
+    'glp_create_prob': ([], ctypes.c_void_p),
+    'glp_delete_prob': ([ctypes.c_void_p], None),
+    'glp_set_obj_dir': ([ctypes.c_void_p, ctypes.c_int], None),
+    'glp_add_rows': ([ctypes.c_void_p, ctypes.c_int], ctypes.c_int),
+    'glp_add_cols': ([ctypes.c_void_p, ctypes.c_int], ctypes.c_int),
+    'glp_set_row_bnds': ([ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                          ctypes.c_double, ctypes.c_double], None),
+    'glp_set_col_bnds': ([ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                          ctypes.c_double, ctypes.c_double], None),
+    'glp_set_obj_coef': ([ctypes.c_void_p, ctypes.c_int, ctypes.c_double],
+                         None),
+    'glp_set_col_kind': ([ctypes.c_void_p, ctypes.c_int, ctypes.c_int], None),
+    'glp_load_matrix': ([ctypes.c_void_p, ctypes.c_int,
+                         ctypes.POINTER(ctypes.c_int),
+                         ctypes.POINTER(ctypes.c_int),
+                         ctypes.POINTER(ctypes.c_double)], None),
+    'glp_set_mat_col': ([ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                         ctypes.POINTER(ctypes.c_int),
+                         ctypes.POINTER(ctypes.c_double)], None),
+    'glp_scale_prob': ([ctypes.c_void_p, ctypes.c_int], None),
+    'glp_init_smcp': ([ctypes.POINTER(glp_smcp)], None),
+    'glp_init_iocp': ([ctypes.POINTER(glp_iocp)], None),
+    'glp_simplex': ([ctypes.c_void_p, ctypes.POINTER(glp_smcp)], ctypes.c_int),
+    'glp_intopt': ([ctypes.c_void_p, ctypes.POINTER(glp_iocp)], ctypes.c_int),
+    'glp_get_status': ([ctypes.c_void_p], ctypes.c_int),
+    'glp_mip_status': ([ctypes.c_void_p], ctypes.c_int),
+    'glp_get_obj_val': ([ctypes.c_void_p], ctypes.c_double),
+    'glp_mip_obj_val': ([ctypes.c_void_p], ctypes.c_double),
+    'glp_get_col_prim': ([ctypes.c_void_p, ctypes.c_int], ctypes.c_double),
+    'glp_mip_col_val': ([ctypes.c_void_p, ctypes.c_int], ctypes.c_double),
+    'glp_get_row_dual': ([ctypes.c_void_p, ctypes.c_int], ctypes.c_double),
+    'glp_get_col_dual': ([ctypes.c_void_p, ctypes.c_int], ctypes.c_double),
+    'glp_ios_reason': ([ctypes.c_void_p], ctypes.c_int),
+    'glp_ios_heur_sol': ([ctypes.c_void_p, ctypes.POINTER(ctypes.c_double)],
+                         ctypes.c_int),
+    'glp_ios_can_branch': ([ctypes.c_void_p, ctypes.c_int], ctypes.c_int),
+    'glp_ios_branch_upon': ([ctypes.c_void_p, ctypes.c_int, ctypes.c_int],
+                            None),
+    'glp_ios_terminate': ([ctypes.c_void_p], None),
+    'glp_ios_mip_gap': ([ctypes.c_void_p], ctypes.c_double),
+    'glp_ios_best_node': ([ctypes.c_void_p], ctypes.c_int),
+    'glp_ios_node_bound': ([ctypes.c_void_p, ctypes.c_int], ctypes.c_double),
+    'glp_ios_tree_size': ([ctypes.c_void_p, ctypes.POINTER(ctypes.c_int),
+                           ctypes.POINTER(ctypes.c_int),
+                           ctypes.POINTER(ctypes.c_int)], None),
+    'glp_term_out': ([ctypes.c_int], ctypes.c_int),
+    'glp_version': ([], ctypes.c_char_p),
+}
+
+_lib = None
+
+
+def load_library(path=None):
+    """Charge libglpk (variable d'environnement GLPK_LIBRARY, sinon recherche
+    système). Lève OSError si la bibliothèque est introuvable."""
+    global _lib
+    if _lib is not None and path is None:
+        return _lib
+
+    candidates = [path, os.environ.get('GLPK_LIBRARY'),
+                  ctypes.util.find_library('glpk'), 'libglpk.so.40',
+                  'libglpk.so']
+    for name in filter(None, candidates):
+        try:
+            lib = ctypes.CDLL(name)
+            break
+        except OSError:
+            continue
+    else:
+        raise OSError("libglpk introuvable (installez libglpk-dev ou "
+                      "définissez GLPK_LIBRARY)")
+
+    for fname, (argtypes, restype) in _SIGNATURES.items():
+        func = getattr(lib, fname)
+        func.argtypes = argtypes
+        func.restype = restype
+    _lib = lib
+    return lib
+
+
+def available():
+    """Indique si la bibliothèque GLPK est utilisable en mémoire"""
+    try:
+        load_library()
+        return True
+    except OSError:
+        return False
+
+# =====================================================
+# 2. Problème GLPK construit depuis la forme matricielle
+# =====================================================
+
+
+def _bound_type(lb, ub):
+    """Type de borne GLPK pour chaque paire (lb, ub)"""
+    kind = np.full(len(lb), GLP_DB)
+    lo_inf, up_inf = np.isneginf(lb), np.isposinf(ub)
+    kind[lo_inf & up_inf] = GLP_FR
+    kind[~lo_inf & up_inf] = GLP_LO
+    kind[lo_inf & ~up_inf] = GLP_UP
+    kind[~lo_inf & ~up_inf & (lb == ub)] = GLP_FX
+    return kind
+
+
+class GLPKProblem:
+    """Problème GLPK en mémoire chargé depuis `compile_matrices` (sans fichier
+    LP ni sous-processus)"""
+
+    def __init__(self, mat, lib=None):
+        self.lib = lib or load_library()
+        self.mat = mat
+        self.n, self.m = mat['n_vars'], mat['n_cons']
+        self.prob = self.lib.glp_create_prob()
+        self.lib.glp_set_obj_dir(self.prob, GLP_MIN)
+        self.lib.glp_add_rows(self.prob, self.m)
+        self.lib.glp_add_cols(self.prob, self.n)
+
+        self.set_row_bounds(np.arange(self.m), mat['row_lb'], mat['row_ub'])
+        self.set_col_bounds(np.arange(self.n), mat['col_lb'], mat['col_ub'])
+        nz = np.flatnonzero(mat['c'])
+        self.set_obj_coefs(nz, mat['c'][nz])
+        for j in np.flatnonzero(mat['integer']).tolist():
+            self.lib.glp_set_col_kind(self.prob, j + 1, GLP_IV)
+
+        # Tableaux 1-indexés (l'élément 0 est ignoré par GLPK)
+        ne = len(mat['A_val'])
+        ia = np.empty(ne + 1, dtype=np.intc)
+        ja = np.empty(ne + 1, dtype=np.intc)
+        ar = np.empty(ne + 1, dtype=np.double)
+        ia[1:] = mat['A_row'] + 1
+        ja[1:] = mat['A_col'] + 1
+        ar[1:] = mat['A_val']
+        self.lib.glp_load_matrix(
+            self.prob, ne,
+            ia.ctypes.data_as(ctypes.POINTER(ctypes.c_int)),
+            ja.ctypes.data_as(ctypes.POINTER(ctypes.c_int)),
+            ar.ctypes.data_as(ctypes.POINTER(ctypes.c_double)))
+        # Mise à l'échelle automatique, comme glpsol par défaut
+        self.lib.glp_term_out(GLP_OFF)
+        self.lib.glp_scale_prob(self.prob, GLP_SF_AUTO)
+        self.is_mip = bool(mat['integer'].any())
+        # Simplexe dual (GLP_DUALP) préférable quand seules les bornes
+        # changent entre deux résolutions
+        self.method = GLP_PRIMAL
+
+    def set_row_bounds(self, rows, lb, ub):
+        for i, k, lo, up in zip(rows.tolist(), _bound_type(lb, ub).tolist(),
+                                lb.tolist(), ub.tolist()):
+            self.lib.glp_set_row_bnds(self.prob, i + 1, k, lo, up)
+
+    def set_col_bounds(self, cols, lb, ub):
+        for j, k, lo, up in zip(cols.tolist(), _bound_type(lb, ub).tolist(),
+                                lb.tolist(), ub.tolist()):
+            self.lib.glp_set_col_bnds(self.prob, j + 1, k, lo, up)
+
+    def set_obj_coefs(self, cols, coefs):
+        for j, cj in zip(cols.tolist(), coefs.tolist()):
+            self.lib.glp_set_obj_coef(self.prob, j + 1, cj)
+
+    def set_col_coefs(self, j, rows, vals):
+        """Remplace la colonne j de la matrice (lignes et coefficients)"""
+        ind = np.empty(len(rows) + 1, dtype=np.intc)
+        val = np.empty(len(rows) + 1, dtype=np.double)
+        ind[1:] = np.asarray(rows) + 1
+        val[1:] = vals
+        self.lib.glp_set_mat_col(
+            self.prob, j + 1, len(rows),
+            ind.ctypes.data_as(ctypes.POINTER(ctypes.c_int)),
+            val.ctypes.data_as(ctypes.POINTER(ctypes.c_double)))
+
+    def update(self, mat, diff):
+        """Applique les modifications `diff_matrices` sans reconstruire le
+        problème: la base du simplexe précédent est conservée (démarrage à
+        chaud)"""
+        if len(diff['c']):
+            self.set_obj_coefs(diff['c'], mat['c'][diff['c']])
+        if len(diff['cols']):
+            self.set_col_bounds(diff['cols'], mat['col_lb'][diff['cols']],
+                                mat['col_ub'][diff['cols']])
+        if len(diff['rows']):
+            self.set_row_bounds(diff['rows'], mat['row_lb'][diff['rows']],
+                                mat['row_ub'][diff['rows']])
+        for j in diff['coef_cols'].tolist():
+            sel = mat['A_col'] == j
+            self.set_col_coefs(j, mat['A_row'][sel], mat['A_val'][sel])
+        self.mat = mat
+
+    def _simplex(self, msg, time_limit, monitor=None, interval=1.0):
+        """Simplexe sur la relaxation. Avec `monitor`, le simplexe tourne par
+        tranches de `interval` secondes, chacune repartant de la base de la
+        précédente, pour rendre compte de l'avancement et s'arrêter à la
+        demande (stopped)"""
+        smcp = glp_smcp()
+        self.lib.glp_init_smcp(ctypes.byref(smcp))
+        smcp.msg_lev = GLP_MSG_ON if msg else GLP_MSG_OFF
+        smcp.meth = self.method
+        if monitor is None:
+            if time_limit:
+                smcp.tm_lim = int(time_limit * 1000)
+            self.code = self.lib.glp_simplex(self.prob, ctypes.byref(smcp))
+            return self.lib.glp_get_status(self.prob)
+
+        t0 = time.perf_counter()
+        while True:
+            left = (None if not time_limit
+                    else time_limit - (time.perf_counter() - t0))
+            smcp.tm_lim = int(1000 * (interval if left is None
+                                      else max(min(interval, left), 0.001)))
+            ret = self.code = self.lib.glp_simplex(self.prob,
+                                                   ctypes.byref(smcp))
+            if ret != GLP_ETMLIM or (left is not None and left <= interval):
+                return self.lib.glp_get_status(self.prob)
+            if monitor({'phase': 'relaxation',
+                        'elapsed': time.perf_counter() - t0}):
+                self.stopped = True
+                return GLP_UNDEF
+
+    def complete_start(self, cols, values):
+        """Complète une affectation partielle (typiquement les ouvertures de
+        sites) en solution entière réalisable: les colonnes `cols` sont fixées
+        à `values`, la relaxation est résolue puis les bornes sont rétablies.
+        Retourne le vecteur solution, ou None si l'affectation est infaisable.
+        """
+        cols = np.asarray(cols)
+        self.lib.glp_term_out(GLP_OFF)
+        self.set_col_bounds(cols, np.asarray(values, float),
+                            np.asarray(values, float))
+        status = self._simplex(False, None)
+        x = None
+        if status == GLP_OPT:
+            x = np.fromiter((self.lib.glp_get_col_prim(self.prob, j)
+                             for j in range(1, self.n + 1)),
+                            dtype=float, count=self.n)
+        self.set_col_bounds(cols, self.mat['col_lb'][cols],
+                            self.mat['col_ub'][cols])
+        return x
+
+    def _progress(self, tree, t0):
+        """État du branch-and-cut: meilleure solution entière, meilleure
+        borne, écart relatif et nombre de nœuds"""
+        found = self.lib.glp_mip_status(self.prob) in (GLP_FEAS, GLP_OPT)
+        best = self.lib.glp_ios_best_node(tree)
+        active, total = ctypes.c_int(), ctypes.c_int()
+        self.lib.glp_ios_tree_size(tree, ctypes.byref(active), None,
+                                   ctypes.byref(total))
+        return {
+            'phase': 'branch-and-cut',
+            'incumbent': self.lib.glp_mip_obj_val(self.prob) if found else None,
+            'bound': self.lib.glp_ios_node_bound(tree, best) if best else None,
+            'gap': self.lib.glp_ios_mip_gap(tree) if found else None,
+            'nodes': total.value, 'active': active.value,
+            'elapsed': time.perf_counter() - t0,
+        }
+
+    def solve(self, msg=False, time_limit=None, mip_gap=None, start=None,
+              priority=None, monitor=None, interval=0.25):
+        """Simplexe sur la relaxation puis branch-and-cut si le problème a des
+        variables entières. `start` est une solution entière réalisable
+        (vecteur complet) fournie au branch-and-cut comme solution initiale.
+        `priority` liste des colonnes entières par ordre de priorité de
+        branchement: tant que l'une d'elles est fractionnaire, GLPK branche
+        sur la première.
+
+        `monitor(info)` reçoit l'état de la résolution (voir _progress) à
+        chaque nouvelle solution entière et au plus toutes les `interval`
+        secondes; s'il retourne True, le branch-and-cut s'arrête
+        (glp_ios_terminate) en gardant la meilleure solution trouvée et
+        `stopped` passe à True. Retourne le statut GLPK de la solution;
+        `code` garde le code de retour de glp_simplex puis glp_intopt
+        (GLP_ETMLIM, GLP_EMIPGAP...), qui dit pourquoi la résolution s'est
+        arrêtée sur une solution GLP_FEAS."""
+        self.stopped = False
+        self.code = 0
+        t0 = time.perf_counter()
+        self.lib.glp_term_out(GLP_ON if msg else GLP_OFF)
+        status = self._simplex(msg, time_limit, monitor)
+        if not self.is_mip or self.stopped:
+            return status
+        if status != GLP_OPT:
+            # Pas de solution entière: relaxation infaisable, non bornée ou
+            # simplexe interrompu (limite de temps)
+            return status if status in (GLP_NOFEAS, GLP_UNBND) else GLP_UNDEF
+
+        iocp = glp_iocp()
+        self.lib.glp_init_iocp(ctypes.byref(iocp))
+        iocp.msg_lev = GLP_MSG_ON if msg else GLP_MSG_OFF
+        if time_limit:
+            # Limite commune: le branch-and-cut dispose du temps laissé par
+            # le simplexe (au moins 1 ms, pour rendre GLP_ETMLIM)
+            left = time_limit - (time.perf_counter() - t0)
+            iocp.tm_lim = max(1, int(left * 1000))
+        if mip_gap is not None:
+            iocp.mip_gap = mip_gap
+
+        if start is not None or priority is not None or monitor is not None:
+            x = None
+            if start is not None:
+                x = np.empty(self.n + 1)
+                x[1:] = start
+            order = ([] if priority is None
+                     else (np.asarray(priority) + 1).tolist())
+            sent = []
+            last = [-np.inf]
+            if monitor is not None:
+                monitor({'phase': 'branch-and-cut', 'incumbent': None,
+                         'bound': self.lib.glp_get_obj_val(self.prob),
+                         'gap': None, 'nodes': 0, 'active': 0,
+                         'elapsed': time.perf_counter() - t0})
+
+            def callback(tree, info):
+                reason = self.lib.glp_ios_reason(tree)
+                # Solution initiale transmise à la première occasion
+                if reason == GLP_IHEUR and x is not None and not sent:
+                    self.lib.glp_ios_heur_sol(
+                        tree, x.ctypes.data_as(ctypes.POINTER(ctypes.c_double)))
+                    sent.append(True)
+                elif reason == GLP_IBRANCH:
+                    for j in order:
+                        if self.lib.glp_ios_can_branch(tree, j):
+                            self.lib.glp_ios_branch_upon(tree, j, GLP_NO_BRNCH)
+                            break
+                if monitor is None or self.stopped:
+                    return
+                now = time.perf_counter()
+                if reason == GLP_IBINGO or now - last[0] >= interval:
+                    last[0] = now
+                    if monitor(self._progress(tree, t0)):
+                        self.stopped = True
+                        self.lib.glp_ios_terminate(tree)
+
+            iocp.cb_func = CALLBACK(callback)
+
+        self.code = self.lib.glp_intopt(self.prob, ctypes.byref(iocp))
+        return self.lib.glp_mip_status(self.prob)
+
+    def objective(self):
+        if self.is_mip:
+            return self.lib.glp_mip_obj_val(self.prob)
+        return self.lib.glp_get_obj_val(self.prob)
+
+    def col_values(self):
+        """Valeurs des variables sous forme de tableau NumPy"""
+        get = self.lib.glp_mip_col_val if self.is_mip else self.lib.glp_get_col_prim
+        return np.fromiter((get(self.prob, j) for j in range(1, self.n + 1)),
+                           dtype=float, count=self.n)
+
+    def row_duals(self):
+        """Valeurs duales des contraintes (relaxation continue)"""
+        return np.fromiter((self.lib.glp_get_row_dual(self.prob, i)
+                            for i in range(1, self.m + 1)),
+                           dtype=float, count=self.m)
+
+    def col_duals(self):
+        """Coûts réduits des variables (relaxation continue)"""
+        return np.fromiter((self.lib.glp_get_col_dual(self.prob, j)
+                            for j in range(1, self.n + 1)),
+                           dtype=float, count=self.n)
+
+    def close(self):
+        if self.prob:
+            self.lib.glp_delete_prob(self.prob)
+            self.prob = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
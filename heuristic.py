@@ -0,0 +1,290 @@
+import time
+
+import numpy as np
+
+from matrixmodel import LANES, compile_params
+
+# =====================================================
+# 1. Choix des sites par recherche locale
+# =====================================================
+
+
+def dense_costs(S, prm):
+    """Copie des paramètres où les coûts de transport sont des matrices
+    denses, de coût infini sur les liaisons absentes (forme attendue par les
+    fonctions de ce module)"""
+    dense = dict(prm)
+    for lane, (name, _, ends) in LANES.items():
+        cost = np.full(tuple(len(S[k]) for k in ends), np.inf)
+        cost[prm['lanes'][lane]] = prm[name]
+        dense[name] = cost
+    return dense
+
+
+def path_costs(prm):
+    """Coût unitaire d'approvisionnement de chaque entrepôt par chaque dépôt
+    (dépôt → entrepôt plus l'usine la moins chère vers le dépôt)"""
+    return prm['cDW'] + prm['cFD'].min(axis=0)[:, None]
+
+
+def estimate_cost(prm, yD, yW, up=None):
+    """Coût estimé d'une configuration de sites: coûts fixes plus chaque
+    client servi par le chemin ouvert le moins cher, sans capacités.
+
+    Retourne inf si la capacité ouverte ne couvre pas la demande de la
+    période la plus chargée.
+    """
+    up = path_costs(prm) if up is None else up
+    peak = prm['dem'].sum(axis=(0, 1)).max()
+    if prm['capD'] @ yD < peak or prm['capW'] @ yW < peak:
+        return np.inf
+    open_D, open_W = yD > 0.5, yW > 0.5
+    supply = up[open_D].min(axis=0)[open_W]
+    unit = (prm['cWC'][open_W] + supply[:, None]).min(axis=0)
+    demand = prm['dem'].sum(axis=(0, 2))
+    served = demand > 0
+    return (prm['FD'] @ yD + prm['FW'] @ yW
+            + unit[served] @ demand[served])
+
+
+def local_search(prm, yD=None, yW=None, max_iter=100):
+    """Descente sur les sites (fermeture, ouverture, échange d'entrepôts)
+    à partir de tous les sites ouverts ou de la configuration fournie.
+
+    Chaque itération applique le meilleur mouvement améliorant l'estimation
+    de estimate_cost. Retourne (yD, yW, coût estimé).
+    """
+    up = path_costs(prm)
+    nD = len(prm['capD'])
+    y = np.concatenate([np.ones(nD) if yD is None else yD,
+                        np.ones(len(prm['capW'])) if yW is None else yW])
+    cost = lambda v: estimate_cost(prm, v[:nD], v[nD:], up)
+    best = cost(y)
+
+    for _ in range(max_iter):
+        moves = [[j] for j in range(len(y))]
+        moves += [[i, j] for i in np.flatnonzero(y[nD:] > 0.5) + nD
+                  for j in np.flatnonzero(y[nD:] < 0.5) + nD]
+        candidates = []
+        for move in moves:
+            v = y.copy()
+            v[move] = 1 - v[move]
+            candidates.append((cost(v), v))
+        value, v = min(candidates, key=lambda cv: cv[0])
+        if value >= best - 1e-9:
+            break
+        best, y = value, v
+    return y[:nD], y[nD:], best
+
+# =====================================================
+# 2. Routage à sites fixés
+# =====================================================
+
+
+def transport(cap, need, cost):
+    """Problème de transport par la méthode d'approximation de Vogel: la
+    destination au plus grand regret (écart entre ses deux sources les
+    moins chères) est servie en premier par sa source la moins chère.
+
+    Retourne la matrice des flux (sources × destinations), ou None si la
+    capacité totale ne couvre pas le besoin.
+    """
+    cap, need = cap.astype(float), need.astype(float)
+    flow = np.zeros(cost.shape)
+    if need.sum() > cap.sum() + 1e-9:
+        return None
+    todo = np.flatnonzero(need > 1e-9)
+    while todo.size:
+        masked = np.where((cap > 1e-9)[:, None], cost[:, todo], np.inf)
+        if len(cap) > 1:
+            two = np.partition(masked, 1, axis=0)
+            regret = two[1] - two[0]
+        else:
+            two, regret = masked, np.zeros(todo.size)
+        if np.isinf(two[0]).any():
+            return None   # destination sans liaison vers une source restante
+        k = int(np.argmax(regret))
+        i, j = int(np.argmin(masked[:, k])), todo[k]
+        amount = min(cap[i], need[j])
+        flow[i, j] += amount
+        cap[i] -= amount
+        need[j] -= amount
+        if need[j] <= 1e-9:
+            todo = np.delete(todo, k)
+    return flow
+
+
+def _split(flow, share):
+    """Répartit des flux agrégés (sources × destinations) entre produits au
+    prorata des besoins de chaque destination"""
+    return flow[None, :, :] * share[:, None, :]
+
+
+def route(prm, yD, yW):
+    """Plan de flux et de stocks réalisable pour des sites fixés.
+
+    Période par période, les clients sont affectés aux entrepôts ouverts
+    (coût du chemin complet, capacités capW), puis les besoins des
+    entrepôts aux dépôts ouverts (capacités capD); chaque dépôt est
+    approvisionné par l'usine la moins chère. Le stock initial au-delà du
+    stock de sécurité est consommé avant tout réapprovisionnement.
+    """
+    dem = prm['dem']
+    nP, nC, nT = dem.shape
+    nF, nD = prm['cFD'].shape
+    nW = len(prm['capW'])
+    up = path_costs(prm)
+    open_D, open_W = np.flatnonzero(yD > 0.5), np.flatnonzero(yW > 0.5)
+    eff = prm['cWC'][open_W] + up[open_D].min(axis=0)[open_W, None]
+    factory = prm['cFD'].argmin(axis=0)
+
+    q1 = np.zeros((nP, nF, nD, nT))
+    q2 = np.zeros((nP, nD, nW, nT))
+    q3 = np.zeros((nP, nW, nC, nT))
+    ID = np.zeros((nP, nD, nT))
+    IW = np.zeros((nP, nW, nT))
+    spare_D = np.repeat((prm['ID0'] - prm['ssD'])[:, None], nD, axis=1)
+    spare_W = np.repeat((prm['IW0'] - prm['ssW'])[:, None], nW, axis=1)
+
+    def share(need):
+        total = need.sum(axis=0)
+        return np.divide(need, total, out=np.zeros_like(need),
+                         where=total > 0), total
+
+    for t in range(nT):
+        frac, total = share(dem[:, :, t])
+        flow = transport(prm['capW'][open_W], total, eff)
+        if flow is None:
+            return None
+        q3[..., t][:, open_W] = _split(flow, frac)
+
+        out_W = q3[:, :, :, t].sum(axis=2)
+        used = np.minimum(spare_W, out_W)
+        spare_W -= used
+        IW[:, :, t] = prm['ssW'][:, None] + spare_W
+        frac, total = share(out_W - used)
+        flow = transport(prm['capD'][open_D], total, up[open_D])
+        if flow is None:
+            return None
+        q2[..., t][:, open_D] = _split(flow, frac)
+
+        out_D = q2[:, :, :, t].sum(axis=2)
+        used = np.minimum(spare_D, out_D)
+        spare_D -= used
+        ID[:, :, t] = prm['ssD'][:, None] + spare_D
+        q1[:, factory, np.arange(nD), t] = out_D - used
+
+    return {'q1': q1, 'q2': q2, 'q3': q3, 'ID': ID, 'IW': IW}
+
+# =====================================================
+# 3. Solution heuristique complète
+# =====================================================
+
+
+def solve_heuristic(data, max_iter=100):
+    """Solution réalisable rapide: recherche locale sur les sites puis
+    routage à sites fixés.
+
+    Retourne un dictionnaire de même forme que analyze_results (coûts,
+    sites ouverts, flux par période, taux d'utilisation), utilisable comme
+    aperçu ou comme solution initiale via heuristic_sites.
+    """
+    S, prm = compile_params(data)
+    prm = dense_costs(S, prm)
+    yD, yW, _ = local_search(prm, max_iter=max_iter)
+    plan = route(prm, yD, yW)
+    if plan is None:
+        # Capacités trop fragmentées pour le routage glouton
+        yD, yW = np.ones_like(yD), np.ones_like(yW)
+        plan = route(prm, yD, yW)
+    if plan is None:
+        raise ValueError("Capacité insuffisante pour couvrir la demande")
+
+    finite = lambda a: np.where(np.isfinite(a), a, 0.0)
+    cout_transport = (np.einsum('fd,pfdt->', finite(prm['cFD']), plan['q1'])
+                      + np.einsum('dw,pdwt->', finite(prm['cDW']), plan['q2'])
+                      + np.einsum('wc,pwct->', finite(prm['cWC']), plan['q3']))
+    cout_fixe = prm['FD'] @ yD + prm['FW'] @ yW
+    cout_stockage = (prm['hD'] @ plan['ID'].sum(axis=(1, 2))
+                     + prm['hW'] @ plan['IW'].sum(axis=(1, 2)))
+
+    nT = len(S['T'])
+    util_D = plan['q2'].sum(axis=(0, 2, 3)) / (prm['capD'] * nT) * 100
+    util_W = plan['q3'].sum(axis=(0, 2, 3)) / (prm['capW'] * nT) * 100
+    return {
+        'total_cost': float(cout_transport + cout_fixe + cout_stockage),
+        'depots_ouverts': [d for d, y in zip(S['D'], yD) if y > 0.5],
+        'entrepots_ouverts': [w for w, y in zip(S['W'], yW) if y > 0.5],
+        'cout_transport': float(cout_transport),
+        'cout_fixe': float(cout_fixe),
+        'cout_stockage': float(cout_stockage),
+        'flux_par_periode': dict(zip(S['T'],
+                                     plan['q3'].sum(axis=(0, 1, 2)).tolist())),
+        'util_depots': {d: float(u) for d, u, y in zip(S['D'], util_D, yD)
+                        if y > 0.5},
+        'util_entrepots': {w: float(u) for w, u, y in zip(S['W'], util_W, yW)
+                           if y > 0.5},
+    }
+
+
+def heuristic_sites(analysis, data):
+    """Sites ouverts d'une analyse (heuristique ou analyze_results) au
+    format de read_sites, pour solve_model(start=...)"""
+    return {
+        'yD': {d: int(d in analysis['depots_ouverts'])
+               for d in data['capD']['depot']},
+        'yW': {w: int(w in analysis['entrepots_ouverts'])
+               for w in data['capW']['warehouse']},
+    }
+
+# =====================================================
+# 4. Comparaison avec la solution exacte
+# =====================================================
+
+
+def compare_heuristic(data, backend="glpk_capi", time_limit=None):
+    """Coût et temps de l'heuristique face à la résolution exacte, à froid
+    puis avec les sites de l'heuristique comme solution initiale"""
+    import pandas as pd
+    from pyomo.environ import value
+    from matrixmodel import build_model_matrix
+    from solver import solve_model
+
+    t0 = time.perf_counter()
+    analysis = solve_heuristic(data)
+    rows = [{'mode': 'heuristique', 'temps (s)': time.perf_counter() - t0,
+             'statut': 'réalisable', 'coût': analysis['total_cost']}]
+    sites = heuristic_sites(analysis, data)
+    for label, start in (('exact à froid', None),
+                         ('exact + heuristique', sites)):
+        m = build_model_matrix(data)
+        t0 = time.perf_counter()
+        results, _ = solve_model(m, backend=backend, time_limit=time_limit,
+                                 start=start)
+        rows.append({'mode': label, 'temps (s)': time.perf_counter() - t0,
+                     'statut': str(results.solver.termination_condition),
+                     'coût': value(m.OBJ)})
+
+    table = pd.DataFrame(rows)
+    table['écart (%)'] = (table['coût'] / table['coût'].iloc[-1] - 1) * 100
+    print(f"\n⏱️  HEURISTIQUE ({backend})")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+
+    data = load_and_validate_data(path="Data/")
+    t0 = time.perf_counter()
+    analysis = solve_heuristic(data)
+    print(f"\n✓ Heuristique sur le réseau complet: "
+          f"{analysis['total_cost']:,.2f} MAD en "
+          f"{time.perf_counter() - t0:.3f} s "
+          f"({len(analysis['depots_ouverts'])} dépôts, "
+          f"{len(analysis['entrepots_ouverts'])} entrepôts)")
+
+    # Instance réduite: le réseau complet ne se résout pas en quelques minutes
+    compare_heuristic(subset_instance(data, n_clients=20, n_months=3),
+                      time_limit=300)
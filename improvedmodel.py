@@ -4,31 +4,35 @@ import numpy as np
 from pyomo.environ import *
 import matplotlib.pyplot as plt
 import seaborn as sns
+import contextlib
+import os
+import time
 from datetime import datetime
 
+from dataload import load_tables
+from matrixmodel import build_model_matrix
+from params import lane_dict, model_sets, param_dict
+from presolve import presolve
+from solution import (extract_solution, solution_kpis, solution_tables,
+                      write_tables)
+from solver import MATRIX_BACKENDS, print_timings, solve_model
+from tracing import Tracer, print_trace, span
+
 # =====================================================
 # 1. Lecture des données avec validation
 # =====================================================
 
 
-def load_and_validate_data(path="Data/"):
-    """Charge et valide toutes les données avec gestion d'erreurs"""
+def load_and_validate_data(path="Data/", cache=True):
+    """Charge et valide toutes les données avec gestion d'erreurs.
+
+    Les CSV inchangés depuis le dernier chargement sont relus depuis leur
+    forme binaire (voir dataload.load_tables).
+    """
     try:
-        data = {
-            'demand': pd.read_csv(path+"demand_pct.csv"),
-            'capD': pd.read_csv(path+"capacity_depots.csv"),
-            'capW': pd.read_csv(path+"capacity_warehouses.csv"),
-            'fixD': pd.read_csv(path+"fixed_cost_depots.csv"),
-            'fixW': pd.read_csv(path+"fixed_cost_warehouses.csv"),
-            'hold': pd.read_csv(path+"holding_costs.csv"),
-            'cFD': pd.read_csv(path+"transport_factory_depot.csv"),
-            'cDW': pd.read_csv(path+"transport_depot_warehouse.csv"),
-            'cWC': pd.read_csv(path+"transport_warehouse_client.csv"),
-            'ssD': pd.read_csv(path+"safety_stock_depots.csv"),
-            'ssW': pd.read_csv(path+"safety_stock_warehouses.csv"),
-            'iD': pd.read_csv(path+"initial_stock_depots.csv"),
-            'iW': pd.read_csv(path+"initial_stock_warehouses.csv")
-        }
+        t0 = time.perf_counter()
+        data, source = load_tables(path, cache=cache)
+        elapsed = time.perf_counter() - t0
 
         # Validation basique
         print("✓ Données chargées avec succès")
@@ -36,6 +40,9 @@ def load_and_validate_data(path="Data/"):
         print(f"  - Clients: {data['demand']['client'].nunique()}")
         print(f"  - Produits: {data['demand']['product'].nunique()}")
         print(f"  - Périodes: {data['demand']['month'].nunique()}")
+        print(f"  - Lecture: {elapsed:.3f} s "
+              f"({list(source.values()).count('cache')}/{len(source)} "
+              f"tables depuis le cache)")
 
         return data
     except FileNotFoundError as e:
@@ -50,801 +57,195 @@ def load_and_validate_data(path="Data/"):
 # =====================================================
 
 
-def build_model(data):
-    """Construit le modèle Pyomo"""
-    m = ConcreteModel(name="Supply_Chain_Network")
-
-    # ---------------- Sets ----------------
-    m.P = Set(initialize=data['demand']['product'].unique(), doc="Produits")
-    m.C = Set(initialize=data['demand']['client'].unique(), doc="Clients")
-    m.T = Set(initialize=data['demand']['month'].unique(), doc="Périodes")
-    m.F = Set(initialize=[1, 2], doc="Usines")
-    m.D = Set(initialize=data['capD']['depot'].tolist(), doc="Dépôts")
-    m.W = Set(initialize=data['capW']['warehouse'].tolist(), doc="Entrepôts")
-
-    # ---------------- Parameters ----------------
-    m.dem = Param(m.P, m.C, m.T,
-                  initialize={(r['product'], r['client'], r['month']): r['demand']
-                              for _, r in data['demand'].iterrows()},
-                  within=NonNegativeReals, doc="Demande")
-
-    m.capD = Param(m.D, initialize=dict(
-        zip(data['capD']['depot'], data['capD']['capacity'])))
-    m.capW = Param(m.W, initialize=dict(
-        zip(data['capW']['warehouse'], data['capW']['capacity'])))
-
-    m.FD = Param(m.D, initialize=dict(
-        zip(data['fixD']['depot'], data['fixD']['fixed_cost'])))
-    m.FW = Param(m.W, initialize=dict(
-        zip(data['fixW']['warehouse'], data['fixW']['fixed_cost'])))
-
-    m.hD = Param(m.P, initialize=dict(
-        zip(data['hold']['product'], data['hold']['holding_depot'])))
-    m.hW = Param(m.P, initialize=dict(
-        zip(data['hold']['product'], data['hold']['holding_warehouse'])))
-
-    m.cFD = Param(m.F, m.D, initialize={(r['factory'], r['depot']): r['cost']
-                                        for _, r in data['cFD'].iterrows()})
-    m.cDW = Param(m.D, m.W, initialize={(r['depot'], r['warehouse']): r['cost']
-                                        for _, r in data['cDW'].iterrows()})
-    m.cWC = Param(m.W, m.C, initialize={(r['warehouse'], r['client']): r['cost']
-                                        for _, r in data['cWC'].iterrows()})
-
-    m.ssD = Param(m.P, initialize=dict(
-        zip(data['ssD']['product'], data['ssD']['safety_stock'])))
-    m.ssW = Param(m.P, initialize=dict(
-        zip(data['ssW']['product'], data['ssW']['safety_stock'])))
-
-    m.ID0 = Param(m.P, initialize=dict(
-        zip(data['iD']['product'], data['iD']['initial_stock'])))
-    m.IW0 = Param(m.P, initialize=dict(
-        zip(data['iW']['product'], data['iW']['initial_stock'])))
-
-    # ---------------- Variables ----------------
-    m.yD = Var(m.D, within=Binary, doc="Ouverture dépôt")
-    m.yW = Var(m.W, within=Binary, doc="Ouverture entrepôt")
-
-    m.q1 = Var(m.P, m.F, m.D, m.T, within=NonNegativeReals,
-               doc="Flux usine->dépôt")
-    m.q2 = Var(m.P, m.D, m.W, m.T, within=NonNegativeReals,
-               doc="Flux dépôt->entrepôt")
-    m.q3 = Var(m.P, m.W, m.C, m.T, within=NonNegativeReals,
-               doc="Flux entrepôt->client")
-
-    m.ID = Var(m.P, m.D, m.T, within=NonNegativeReals, doc="Stock dépôt")
-    m.IW = Var(m.P, m.W, m.T, within=NonNegativeReals, doc="Stock entrepôt")
-
-    # =====================================================
-    # 3. Fonction Objectif
-    # =====================================================
-
-    def obj_rule(m):
-
-        cost_FD = sum(
-            m.cFD[f, d] * m.q1[p, f, d, t]
-            for p in m.P for f in m.F for d in m.D for t in m.T
-        )
-
-        cost_DW = sum(
-            m.cDW[d, w] * m.q2[p, d, w, t]
-            for p in m.P for d in m.D for w in m.W for t in m.T
-        )
-
-        cost_WC = sum(
-            m.cWC[w, c] * m.q3[p, w, c, t]
-            for p in m.P for w in m.W for c in m.C for t in m.T
-        )
-
-        fixed_costs = (
-            sum(m.FD[d] * m.yD[d] for d in m.D)
-        + sum(m.FW[w] * m.yW[w] for w in m.W)
-        )
-
-        holding_costs = (
-            sum(m.hD[p] * m.ID[p, d, t] for p in m.P for d in m.D for t in m.T)
-        + sum(m.hW[p] * m.IW[p, w, t] for p in m.P for w in m.W for t in m.T)
-        )
-
-        return cost_FD + cost_DW + cost_WC + fixed_costs + holding_costs
-
-    m.OBJ = Objective(rule=obj_rule, sense=minimize)
-
-    # =====================================================
-    # 4. Contraintes
-    # =====================================================
-
-    # Satisfaction de la demande
-    def demand_rule(m, p, c, t):
-        return sum(m.q3[p, w, c, t] for w in m.W) == m.dem[p, c, t]
-    m.DEM = Constraint(m.P, m.C, m.T, rule=demand_rule)
-
-    # Équilibre stocks dépôts
-    def stockD_rule(m, p, d, t):
-        if t == 1:
-            return m.ID[p, d, t] == m.ID0[p] + sum(m.q1[p, f, d, t] for f in m.F) - sum(m.q2[p, d, w, t] for w in m.W)
-        return m.ID[p, d, t] == m.ID[p, d, t-1] + sum(m.q1[p, f, d, t] for f in m.F) - sum(m.q2[p, d, w, t] for w in m.W)
-    m.STD = Constraint(m.P, m.D, m.T, rule=stockD_rule)
-
-    # Équilibre stocks entrepôts
-    def stockW_rule(m, p, w, t):
-        if t == 1:
-            return m.IW[p, w, t] == m.IW0[p] + sum(m.q2[p, d, w, t] for d in m.D) - sum(m.q3[p, w, c, t] for c in m.C)
-        return m.IW[p, w, t] == m.IW[p, w, t-1] + sum(m.q2[p, d, w, t] for d in m.D) - sum(m.q3[p, w, c, t] for c in m.C)
-    m.STW = Constraint(m.P, m.W, m.T, rule=stockW_rule)
-
-    # Capacités
-    m.CAPD = Constraint(m.D, m.T,
-                        rule=lambda m, d, t: sum(m.q2[p, d, w, t] for p in m.P for w in m.W) <= m.capD[d] * m.yD[d])
-    m.CAPW = Constraint(m.W, m.T,
-                        rule=lambda m, w, t: sum(m.q3[p, w, c, t] for p in m.P for c in m.C) <= m.capW[w] * m.yW[w])
-
-    # Stocks de sécurité
-    m.SSD = Constraint(m.P, m.D, m.T, rule=lambda m, p,
-                       d, t: m.ID[p, d, t] >= m.ssD[p])
-    m.SSW = Constraint(m.P, m.W, m.T, rule=lambda m, p,
-                       w, t: m.IW[p, w, t] >= m.ssW[p])
-
-    print(
-        f"\n✓ Modèle construit: {len(m.P)} produits, {len(m.C)} clients, {len(m.T)} périodes")
-
-    return m
-
-# =====================================================
-# 5. Analyse des résultats
-# =====================================================
-
-
-def analyze_results(m, results):
-    """Analyse complète de la solution optimale"""
-
-    print("\n" + "="*70)
-    print("                    RÉSULTATS DE L'OPTIMISATION")
-    print("="*70)
-
-    # 1. Statut de la solution
-    print(f"\n📊 STATUT DE LA SOLUTION")
-    print(f"   Statut du solveur: {results.solver.status}")
-    print(f"   Condition d'arrêt: {results.solver.termination_condition}")
-    print(f"   Temps de calcul: {results.solver.time:.2f} secondes")
-
-    if results.solver.termination_condition != TerminationCondition.optimal:
-        print("⚠️  ATTENTION: Solution non-optimale!")
-        return None
-
-    # 2. Coût total
-    total_cost = value(m.OBJ)
-    print(f"\n💰 COÛT TOTAL OPTIMAL: {total_cost:,.2f} MAD")
-
-    # 3. Sites ouverts
-    print(f"\n🏢 CONFIGURATION DU RÉSEAU")
-
-    depots_ouverts = [d for d in m.D if value(m.yD[d]) > 0.5]
-    depots_fermes = [d for d in m.D if value(m.yD[d]) < 0.5]
-    print(
-        f"   Dépôts ouverts ({len(depots_ouverts)}/{len(m.D)}): {depots_ouverts}")
-    print(
-        f"   Dépôts fermés ({len(depots_fermes)}/{len(m.D)}): {depots_fermes}")
-
-    entrepots_ouverts = [w for w in m.W if value(m.yW[w]) > 0.5]
-    entrepots_fermes = [w for w in m.W if value(m.yW[w]) < 0.5]
-    print(
-        f"   Entrepôts ouverts ({len(entrepots_ouverts)}/{len(m.W)}): {entrepots_ouverts[:10]}{'...' if len(entrepots_ouverts) > 10 else ''}")
-    print(
-        f"   Entrepôts fermés ({len(entrepots_fermes)}/{len(m.W)}): {entrepots_fermes[:10]}{'...' if len(entrepots_fermes) > 10 else ''}")
-
-    # 4. Décomposition des coûts
-    print(f"\n📈 DÉCOMPOSITION DES COÛTS")
-
-    # Coûts de transport
-    cout_transport_fd = sum(value(m.cFD[f, d] * m.q1[p, f, d, t])
-                            for p in m.P for f in m.F for d in m.D for t in m.T)
-    cout_transport_dw = sum(value(m.cDW[d, w] * m.q2[p, d, w, t])
-                            for p in m.P for d in m.D for w in m.W for t in m.T)
-    cout_transport_wc = sum(value(m.cWC[w, c] * m.q3[p, w, c, t])
-                            for p in m.P for w in m.W for c in m.C for t in m.T)
-    cout_transport_total = cout_transport_fd + cout_transport_dw + cout_transport_wc
-
-    # Coûts fixes
-    cout_fixe_depots = sum(value(m.FD[d] * m.yD[d]) for d in m.D)
-    cout_fixe_entrepots = sum(value(m.FW[w] * m.yW[w]) for w in m.W)
-    cout_fixe_total = cout_fixe_depots + cout_fixe_entrepots
-
-    # Coûts de stockage
-    cout_stockage_depots = sum(
-        value(m.hD[p] * m.ID[p, d, t]) for p in m.P for d in m.D for t in m.T)
-    cout_stockage_entrepots = sum(
-        value(m.hW[p] * m.IW[p, w, t]) for p in m.P for w in m.W for t in m.T)
-    cout_stockage_total = cout_stockage_depots + cout_stockage_entrepots
-
-    print(
-        f"\n   COÛTS DE TRANSPORT ({cout_transport_total/total_cost*100:.1f}%):")
-    print(
-        f"      - Usine → Dépôt:      {cout_transport_fd:>15,.2f} MAD ({cout_transport_fd/total_cost*100:>5.2f}%)")
-    print(
-        f"      - Dépôt → Entrepôt:   {cout_transport_dw:>15,.2f} MAD ({cout_transport_dw/total_cost*100:>5.2f}%)")
-    print(
-        f"      - Entrepôt → Client:  {cout_transport_wc:>15,.2f} MAD ({cout_transport_wc/total_cost*100:>5.2f}%)")
-    print(f"      - TOTAL TRANSPORT:    {cout_transport_total:>15,.2f} MAD")
-
-    print(f"\n   COÛTS FIXES ({cout_fixe_total/total_cost*100:.1f}%):")
-    print(
-        f"      - Dépôts:             {cout_fixe_depots:>15,.2f} MAD ({cout_fixe_depots/total_cost*100:>5.2f}%)")
-    print(
-        f"      - Entrepôts:          {cout_fixe_entrepots:>15,.2f} MAD ({cout_fixe_entrepots/total_cost*100:>5.2f}%)")
-    print(f"      - TOTAL FIXES:        {cout_fixe_total:>15,.2f} MAD")
-
-    print(
-        f"\n   COÛTS DE STOCKAGE ({cout_stockage_total/total_cost*100:.1f}%):")
-    print(
-        f"      - Dépôts:             {cout_stockage_depots:>15,.2f} MAD ({cout_stockage_depots/total_cost*100:>5.2f}%)")
-    print(
-        f"      - Entrepôts:          {cout_stockage_entrepots:>15,.2f} MAD ({cout_stockage_entrepots/total_cost*100:>5.2f}%)")
-    print(f"      - TOTAL STOCKAGE:     {cout_stockage_total:>15,.2f} MAD")
-
-    # 5. Analyse des flux
-    print(f"\n📦 ANALYSE DES FLUX")
-
-    flux_total = sum(value(m.q3[p, w, c, t])
-                     for p in m.P for w in m.W for c in m.C for t in m.T)
-    print(f"   Volume total livré aux clients: {flux_total:,.0f} unités")
-
-    flux_par_periode = {}
-    for t in m.T:
-        flux_par_periode[t] = sum(value(m.q3[p, w, c, t])
-                                  for p in m.P for w in m.W for c in m.C)
-    print(
-        f"   Flux moyen par mois: {np.mean(list(flux_par_periode.values())):,.0f} unités")
-    print(
-        f"   Flux maximum: {max(flux_par_periode.values()):,.0f} unités (mois {max(flux_par_periode, key=flux_par_periode.get)})")
-    print(
-        f"   Flux minimum: {min(flux_par_periode.values()):,.0f} unités (mois {min(flux_par_periode, key=flux_par_periode.get)})")
-
-    # 6. Taux d'utilisation des capacités
-    print(f"\n⚙️  TAUX D'UTILISATION DES CAPACITÉS")
-
-    util_depots = {}
-    for d in depots_ouverts:
-        utilisation = sum(value(m.q2[p, d, w, t])
-                          for p in m.P for w in m.W for t in m.T)
-        capacite_totale = value(m.capD[d]) * len(m.T)
-        util_depots[d] = (utilisation / capacite_totale *
-                          100) if capacite_totale > 0 else 0
-
-    if util_depots:
-        print(f"   Dépôts:")
-        print(
-            f"      - Utilisation moyenne: {np.mean(list(util_depots.values())):.1f}%")
-        print(
-            f"      - Utilisation maximale: {max(util_depots.values()):.1f}% (dépôt {max(util_depots, key=util_depots.get)})")
-        print(
-            f"      - Utilisation minimale: {min(util_depots.values()):.1f}% (dépôt {min(util_depots, key=util_depots.get)})")
-
-    util_entrepots = {}
-    for w in entrepots_ouverts:
-        utilisation = sum(value(m.q3[p, w, c, t])
-                          for p in m.P for c in m.C for t in m.T)
-        capacite_totale = value(m.capW[w]) * len(m.T)
-        util_entrepots[w] = (utilisation / capacite_totale *
-                             100) if capacite_totale > 0 else 0
-
-    if util_entrepots:
-        print(f"   Entrepôts:")
-        print(
-            f"      - Utilisation moyenne: {np.mean(list(util_entrepots.values())):.1f}%")
-        print(
-            f"      - Utilisation maximale: {max(util_entrepots.values()):.1f}% (entrepôt {max(util_entrepots, key=util_entrepots.get)})")
-        print(
-            f"      - Utilisation minimale: {min(util_entrepots.values()):.1f}% (entrepôt {min(util_entrepots, key=util_entrepots.get)})")
-
-    # 7. Analyse des stocks
-    print(f"\n📊 ANALYSE DES STOCKS")
-
-    stock_moyen_depots = np.mean([value(m.ID[p, d, t])
-                                 for p in m.P for d in depots_ouverts for t in m.T])
-    stock_moyen_entrepots = np.mean(
-        [value(m.IW[p, w, t]) for p in m.P for w in entrepots_ouverts for t in m.T])
-
-    print(f"   Stock moyen dans les dépôts: {stock_moyen_depots:,.0f} unités")
-    print(
-        f"   Stock moyen dans les entrepôts: {stock_moyen_entrepots:,.0f} unités")
-
-    print("\n" + "="*70)
-
-    # Retourner un dictionnaire avec tous les résultats
-    return {
-        'total_cost': total_cost,
-        'depots_ouverts': depots_ouverts,
-        'entrepots_ouverts': entrepots_ouverts,
-        'cout_transport': cout_transport_total,
-        'cout_fixe': cout_fixe_total,
-        'cout_stockage': cout_stockage_total,
-        'flux_par_periode': flux_par_periode,
-        'util_depots': util_depots,
-        'util_entrepots': util_entrepots
-    }
-
-# =====================================================
-# 6. Export des résultats
-# =====================================================
-
-
-def export_results(m, output_path="results/"):
-    """Exporte les résultats vers des fichiers CSV"""
-    import os
-    os.makedirs(output_path, exist_ok=True)
-
-    # Sites ouverts
-    sites_df = pd.DataFrame({
-        'depot': list(m.D),
-        'ouvert': [value(m.yD[d]) for d in m.D]
-    })
-    sites_df.to_csv(output_path + "sites_depots.csv", index=False)
-
-    sites_w_df = pd.DataFrame({
-        'warehouse': list(m.W),
-        'ouvert': [value(m.yW[w]) for w in m.W]
-    })
-    sites_w_df.to_csv(output_path + "sites_entrepots.csv", index=False)
-
-    # Flux principaux (> 0)
-    flux_q3 = []
-    for p in m.P:
-        for w in m.W:
-            for c in m.C:
-                for t in m.T:
-                    val = value(m.q3[p, w, c, t])
-                    if val > 0.01:
-                        flux_q3.append({
-                            'product': p, 'warehouse': w, 'client': c,
-                            'month': t, 'quantity': val
-                        })
-
-    pd.DataFrame(flux_q3).to_csv(
-        output_path + "flux_entrepot_client.csv", index=False)
-
-    print(f"\n✓ Résultats exportés dans {output_path}")
-
-
-    import matplotlib.pyplot as plt
-
-import seaborn as sns
-
-# Configuration du style
-sns.set_style("whitegrid")
-plt.rcParams['figure.figsize'] = (12, 8)
-plt.rcParams['font.size'] = 10
-
-
-def plot_cost_breakdown(analysis):
-    """Graphique en camembert de la décomposition des coûts"""
-
-    fig, ax = plt.subplots(1, 1, figsize=(10, 7))
-
-    costs = [
-        analysis['cout_transport'],
-        analysis['cout_fixe'],
-        analysis['cout_stockage']
-    ]
-    labels = ['Transport', 'Coûts Fixes', 'Stockage']
-    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1']
-    explode = (0.05, 0.05, 0.05)
-
-    wedges, texts, autotexts = ax.pie(
-        costs,
-        labels=labels,
-        autopct='%1.1f%%',
-        startangle=90,
-        colors=colors,
-        explode=explode,
-        textprops={'fontsize': 12, 'weight': 'bold'}
-    )
-
-    for autotext in autotexts:
-        autotext.set_color('white')
-        autotext.set_fontsize(14)
-
-    ax.set_title('Répartition des Coûts Totaux',
-                 fontsize=16, weight='bold', pad=20)
-
-    # Légende avec valeurs
-    legend_labels = [f'{labels[i]}: {costs[i]:,.0f} MAD ({costs[i]/sum(costs)*100:.1f}%)'
-                     for i in range(len(labels))]
-    ax.legend(legend_labels, loc='upper left',
-              bbox_to_anchor=(1, 1), fontsize=10)
-
-    plt.tight_layout()
-    plt.savefig('results/cost_breakdown.png', dpi=300, bbox_inches='tight')
-    print("✓ Graphique sauvegardé: cost_breakdown.png")
-    # plt.show()
-
-
-def plot_flux_evolution(analysis):
-    """Graphique de l'évolution des flux mensuels"""
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-
-    mois = sorted(analysis['flux_par_periode'].keys())
-    flux = [analysis['flux_par_periode'][m] for m in mois]
-
-    ax.plot(mois, flux, marker='o', linewidth=2.5, markersize=8,
-            color='#3498db', label='Flux mensuel')
-    ax.fill_between(mois, flux, alpha=0.3, color='#3498db')
-
-    # Ligne de tendance
-    z = np.polyfit(mois, flux, 1)
-    p = np.poly1d(z)
-    ax.plot(mois, p(mois), "--", linewidth=2, color='#e74c3c',
-            label=f'Tendance (pente: {z[0]:,.0f})')
-
-    # Moyenne
-    flux_moyen = np.mean(flux)
-    ax.axhline(y=flux_moyen, color='#2ecc71', linestyle='--', linewidth=2,
-               label=f'Moyenne: {flux_moyen:,.0f} unités')
-
-    ax.set_xlabel('Mois', fontsize=12, weight='bold')
-    ax.set_ylabel('Flux Total (unités)', fontsize=12, weight='bold')
-    ax.set_title('Évolution des Flux Mensuels',
-                 fontsize=14, weight='bold', pad=15)
-    ax.legend(fontsize=10, loc='best')
-    ax.grid(True, alpha=0.3)
-
-    plt.tight_layout()
-    plt.savefig('results/flux_evolution.png', dpi=300, bbox_inches='tight')
-    print("✓ Graphique sauvegardé: flux_evolution.png")
-    # plt.show()
-
-
-def plot_capacity_utilization(analysis):
-    """Graphique des taux d'utilisation des capacités"""
-
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-
-    # Dépôts
-    if analysis['util_depots']:
-        depots = list(analysis['util_depots'].keys())
-        util_d = list(analysis['util_depots'].values())
-
-        colors_d = ['#2ecc71' if u > 80 else '#f39c12' if u > 50 else '#e74c3c'
-                    for u in util_d]
-
-        ax1.barh(depots, util_d, color=colors_d,
-                 edgecolor='black', linewidth=1.2)
-        ax1.axvline(x=80, color='red', linestyle='--',
-                    linewidth=2, label='Seuil critique (80%)')
-        ax1.set_xlabel('Taux d\'utilisation (%)', fontsize=11, weight='bold')
-        ax1.set_ylabel('Dépôt', fontsize=11, weight='bold')
-        ax1.set_title('Utilisation des Dépôts', fontsize=13, weight='bold')
-        ax1.legend()
-        ax1.grid(axis='x', alpha=0.3)
-
-    # Entrepôts (top 15)
-    if analysis['util_entrepots']:
-        entrepots_sorted = sorted(analysis['util_entrepots'].items(),
-                                  key=lambda x: x[1], reverse=True)[:15]
-        entrepots = [e[0] for e in entrepots_sorted]
-        util_w = [e[1] for e in entrepots_sorted]
-
-        colors_w = ['#2ecc71' if u > 80 else '#f39c12' if u > 50 else '#e74c3c'
-                    for u in util_w]
-
-        ax2.barh(entrepots, util_w, color=colors_w,
-                 edgecolor='black', linewidth=1.2)
-        ax2.axvline(x=80, color='red', linestyle='--',
-                    linewidth=2, label='Seuil critique (80%)')
-        ax2.set_xlabel('Taux d\'utilisation (%)', fontsize=11, weight='bold')
-        ax2.set_ylabel('Entrepôt', fontsize=11, weight='bold')
-        ax2.set_title('Top 15 Entrepôts (Utilisation)',
-                      fontsize=13, weight='bold')
-        ax2.legend()
-        ax2.grid(axis='x', alpha=0.3)
-
-    plt.tight_layout()
-    plt.savefig('results/capacity_utilization.png',dpi=300, bbox_inches='tight')
-    print("✓ Graphique sauvegardé: capacity_utilization.png")
-    # plt.show()
-
-
-def plot_stock_evolution(m, depots_ouverts, entrepots_ouverts_sample):
-    """Évolution des stocks au cours du temps"""
-
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
-
-    # Stocks dépôts
-    for d in depots_ouverts[:3]:  # Top 3 dépôts
-        for p in list(m.P)[:2]:  # 2 premiers produits
-            mois = sorted(m.T)
-            stocks = [value(m.ID[p, d, t]) for t in mois]
-            ax1.plot(mois, stocks, marker='o',
-                     label=f'Dépôt {d} - Produit {p}', linewidth=2)
-
-    ax1.set_xlabel('Mois', fontsize=11, weight='bold')
-    ax1.set_ylabel('Stock (unités)', fontsize=11, weight='bold')
-    ax1.set_title('Évolution des Stocks dans les Dépôts',
-                  fontsize=13, weight='bold')
-    ax1.legend(fontsize=9, loc='best')
-    ax1.grid(True, alpha=0.3)
-
-    # Stocks entrepôts
-    for w in entrepots_ouverts_sample[:3]:  # Top 3 entrepôts
-        for p in list(m.P)[:2]:
-            mois = sorted(m.T)
-            stocks = [value(m.IW[p, w, t]) for t in mois]
-            ax2.plot(mois, stocks, marker='s',
-                     label=f'Entrepôt {w} - Produit {p}', linewidth=2)
-
-    ax2.set_xlabel('Mois', fontsize=11, weight='bold')
-    ax2.set_ylabel('Stock (unités)', fontsize=11, weight='bold')
-    ax2.set_title('Évolution des Stocks dans les Entrepôts',
-                  fontsize=13, weight='bold')
-    ax2.legend(fontsize=9, loc='best')
-    ax2.grid(True, alpha=0.3)
-
-    plt.tight_layout()
-    plt.savefig('results/stock_evolution.png', dpi=300, bbox_inches='tight')
-    print("✓ Graphique sauvegardé: stock_evolution.png")
-    # plt.show()
-
-
-def generate_all_visualizations(m, analysis):
-    """Génère toutes les visualisations"""
-
-    print("\n" + "="*50)
-    print("GÉNÉRATION DES VISUALISATIONS")
-    print("="*50 + "\n")
-
-    plot_cost_breakdown(analysis)
-    plot_flux_evolution(analysis)
-    plot_capacity_utilization(analysis)
-
-    # Pour l'évolution des stocks, on a besoin du modèle
-    entrepots_sample = analysis['entrepots_ouverts'][:5]
-    plot_stock_evolution(m, analysis['depots_ouverts'], entrepots_sample)
-
-    print("\n✅ Toutes les visualisations ont été générées!")
-
-# Utilisation après résolution:
-# generate_all_visualizations(model, analysis)
-
-# =====================================================
-# 7. Fonction principale
-# =====================================================
-
-
-def main():
-    """Fonction principale avec visualisations intégrées"""
-
-    print("="*70)
-    print("    OPTIMISATION DU RÉSEAU LOGISTIQUE - SUPPLY CHAIN NETWORK")
-    print("="*70)
-    print(f"Démarrage: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-
-    # Chargement des données
-    print("📁 Étape 1/5: Chargement des données...")
-    data = load_and_validate_data(path="Data/")
-
-    # Construction du modèle
-    print("\n🔧 Étape 2/5: Construction du modèle...")
-    m = build_model(data)
-
-    # Résolution
-    print("\n⚡ Étape 3/5: Résolution du problème MILP...")
-    print("   (Ceci peut prendre plusieurs minutes...)\n")
-
-    # solver = SolverFactory("glpk")
-    solver = SolverFactory("glpk")
-    results = solver.solve(m, tee=True)
-
-    # Analyse des résultats
-    print("\n📊 Étape 4/5: Analyse des résultats...")
-    analysis = analyze_results(m, results)
-
-    # NOUVEAU: Génération des visualisations
-    print("\n📈 Étape 5/5: Génération des visualisations...")
-    try:
-        generate_all_visualizations(m, analysis)
-    except Exception as e:
-        print(f"⚠️ Erreur lors de la génération des graphiques: {e}")
-        print("   Les résultats numériques restent disponibles.")
-
-    # Export (optionnel)
-    # export_results(m, output_path="results/")
-
-    print(
-        f"\n✅ Optimisation terminée: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-    return m, results, analysis
-
-# =====================================================
-# Exécution
-# =====================================================
-
-
-
-from pyomo.environ import value
-import pandas as pd
-import numpy as np
-from pyomo.environ import *
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime
-
-# =====================================================
-# 1. Lecture des données avec validation
-# =====================================================
-
-
-def load_and_validate_data(path="Data/"):
-    """Charge et valide toutes les données avec gestion d'erreurs"""
-    try:
-        data = {
-            'demand': pd.read_csv(path+"demand_pct.csv"),
-            'capD': pd.read_csv(path+"capacity_depots.csv"),
-            'capW': pd.read_csv(path+"capacity_warehouses.csv"),
-            'fixD': pd.read_csv(path+"fixed_cost_depots.csv"),
-            'fixW': pd.read_csv(path+"fixed_cost_warehouses.csv"),
-            'hold': pd.read_csv(path+"holding_costs.csv"),
-            'cFD': pd.read_csv(path+"transport_factory_depot.csv"),
-            'cDW': pd.read_csv(path+"transport_depot_warehouse.csv"),
-            'cWC': pd.read_csv(path+"transport_warehouse_client.csv"),
-            'ssD': pd.read_csv(path+"safety_stock_depots.csv"),
-            'ssW': pd.read_csv(path+"safety_stock_warehouses.csv"),
-            'iD': pd.read_csv(path+"initial_stock_depots.csv"),
-            'iW': pd.read_csv(path+"initial_stock_warehouses.csv")
-        }
-
-        # Validation basique
-        print("✓ Données chargées avec succès")
-        print(f"  - Demandes: {len(data['demand'])} lignes")
-        print(f"  - Clients: {data['demand']['client'].nunique()}")
-        print(f"  - Produits: {data['demand']['product'].nunique()}")
-        print(f"  - Périodes: {data['demand']['month'].nunique()}")
-
-        return data
-    except FileNotFoundError as e:
-        print(f"❌ Erreur: Fichier non trouvé - {e}")
-        raise
-    except Exception as e:
-        print(f"❌ Erreur lors du chargement: {e}")
-        raise
-
-# =====================================================
-# 2. Construction du modèle
-# =====================================================
+def _neighbours(lanes, ends_in, ends_out):
+    """Pour des liaisons (origine, destination): origines de chaque
+    destination et destinations de chaque origine"""
+    into = {k: [] for k in ends_in}
+    out = {k: [] for k in ends_out}
+    for a, b in lanes:
+        into[b].append(a)
+        out[a].append(b)
+    return into, out
 
 
 def build_model(data):
-    """Construit le modèle Pyomo"""
+    """Construit le modèle Pyomo.
+
+    Les flux q1, q2, q3 ne sont créés que sur les liaisons présentes dans
+    les tables de transport (ensembles LFD, LDW, LWC).
+    """
     m = ConcreteModel(name="Supply_Chain_Network")
 
     # ---------------- Sets ----------------
-    m.P = Set(initialize=data['demand']['product'].unique(), doc="Produits")
-    m.C = Set(initialize=data['demand']['client'].unique(), doc="Clients")
-    m.T = Set(initialize=data['demand']['month'].unique(), doc="Périodes")
-    m.F = Set(initialize=[1, 2], doc="Usines")
-    m.D = Set(initialize=data['capD']['depot'].tolist(), doc="Dépôts")
-    m.W = Set(initialize=data['capW']['warehouse'].tolist(), doc="Entrepôts")
+    with span("ensembles", model=m):
+        S = model_sets(data)
+        m.P = Set(initialize=S['P'], doc="Produits")
+        m.C = Set(initialize=S['C'], doc="Clients")
+        m.T = Set(initialize=S['T'], doc="Périodes")
+        m.F = Set(initialize=S['F'], doc="Usines")
+        m.D = Set(initialize=S['D'], doc="Dépôts")
+        m.W = Set(initialize=S['W'], doc="Entrepôts")
 
     # ---------------- Parameters ----------------
-    m.dem = Param(m.P, m.C, m.T,
-                  initialize={(r['product'], r['client'], r['month']): r['demand']
-                              for _, r in data['demand'].iterrows()},
-                  within=NonNegativeReals, doc="Demande")
-
-    m.capD = Param(m.D, initialize=dict(
-        zip(data['capD']['depot'], data['capD']['capacity'])))
-    m.capW = Param(m.W, initialize=dict(
-        zip(data['capW']['warehouse'], data['capW']['capacity'])))
-
-    m.FD = Param(m.D, initialize=dict(
-        zip(data['fixD']['depot'], data['fixD']['fixed_cost'])))
-    m.FW = Param(m.W, initialize=dict(
-        zip(data['fixW']['warehouse'], data['fixW']['fixed_cost'])))
-
-    m.hD = Param(m.P, initialize=dict(
-        zip(data['hold']['product'], data['hold']['holding_depot'])))
-    m.hW = Param(m.P, initialize=dict(
-        zip(data['hold']['product'], data['hold']['holding_warehouse'])))
-
-    m.cFD = Param(m.F, m.D, initialize={(r['factory'], r['depot']): r['cost']
-                                        for _, r in data['cFD'].iterrows()})
-    m.cDW = Param(m.D, m.W, initialize={(r['depot'], r['warehouse']): r['cost']
-                                        for _, r in data['cDW'].iterrows()})
-    m.cWC = Param(m.W, m.C, initialize={(r['warehouse'], r['client']): r['cost']
-                                        for _, r in data['cWC'].iterrows()})
-
-    m.ssD = Param(m.P, initialize=dict(
-        zip(data['ssD']['product'], data['ssD']['safety_stock'])))
-    m.ssW = Param(m.P, initialize=dict(
-        zip(data['ssW']['product'], data['ssW']['safety_stock'])))
-
-    m.ID0 = Param(m.P, initialize=dict(
-        zip(data['iD']['product'], data['iD']['initial_stock'])))
-    m.IW0 = Param(m.P, initialize=dict(
-        zip(data['iW']['product'], data['iW']['initial_stock'])))
+    with span("paramètre dem", model=m):
+        m.dem = Param(m.P, m.C, m.T,
+                      initialize=param_dict(data['demand'], ['product', 'client', 'month'], 'demand',
+                                            (S['P'], S['C'], S['T']), 'dem'),
+                      within=NonNegativeReals, doc="Demande")
+
+    with span("paramètres sites", model=m):
+        m.capD = Param(m.D, initialize=param_dict(
+            data['capD'], ['depot'], 'capacity', (S['D'],), 'capD'))
+        m.capW = Param(m.W, initialize=param_dict(
+            data['capW'], ['warehouse'], 'capacity', (S['W'],), 'capW'))
+
+        m.FD = Param(m.D, initialize=param_dict(
+            data['fixD'], ['depot'], 'fixed_cost', (S['D'],), 'FD'))
+        m.FW = Param(m.W, initialize=param_dict(
+            data['fixW'], ['warehouse'], 'fixed_cost', (S['W'],), 'FW'))
+
+        m.hD = Param(m.P, initialize=param_dict(
+            data['hold'], ['product'], 'holding_depot', (S['P'],), 'hD'))
+        m.hW = Param(m.P, initialize=param_dict(
+            data['hold'], ['product'], 'holding_warehouse', (S['P'],), 'hW'))
+
+    with span("liaisons", model=m):
+        # Coûts de transport sur les seules liaisons présentes dans les tables
+        cFD = lane_dict(data['cFD'], ['factory', 'depot'], 'cost',
+                        (S['F'], S['D']), 'cFD')
+        cDW = lane_dict(data['cDW'], ['depot', 'warehouse'], 'cost',
+                        (S['D'], S['W']), 'cDW')
+        cWC = lane_dict(data['cWC'], ['warehouse', 'client'], 'cost',
+                        (S['W'], S['C']), 'cWC')
+        m.LFD = Set(dimen=2, initialize=list(cFD), ordered=True,
+                    doc="Liaisons usine->dépôt")
+        m.LDW = Set(dimen=2, initialize=list(cDW), ordered=True,
+                    doc="Liaisons dépôt->entrepôt")
+        m.LWC = Set(dimen=2, initialize=list(cWC), ordered=True,
+                    doc="Liaisons entrepôt->client")
+        m.cFD = Param(m.LFD, initialize=cFD)
+        m.cDW = Param(m.LDW, initialize=cDW)
+        m.cWC = Param(m.LWC, initialize=cWC)
+
+        # Voisins de chaque site par liaison (entrée, sortie)
+        F_of_D, _ = _neighbours(cFD, S['D'], S['F'])
+        D_of_W, W_of_D = _neighbours(cDW, S['W'], S['D'])
+        W_of_C, C_of_W = _neighbours(cWC, S['C'], S['W'])
+        unserved = [c for c in S['C'] if not W_of_C[c]
+                    and any(m.dem[p, c, t] > 0 for p in S['P'] for t in S['T'])]
+        if unserved:
+            raise ValueError(f"Clients avec demande sans liaison entrepôt->client "
+                             f"(ex: {unserved[:5]})")
+
+    with span("paramètres stocks", model=m):
+        m.ssD = Param(m.P, initialize=param_dict(
+            data['ssD'], ['product'], 'safety_stock', (S['P'],), 'ssD'))
+        m.ssW = Param(m.P, initialize=param_dict(
+            data['ssW'], ['product'], 'safety_stock', (S['P'],), 'ssW'))
+
+        m.ID0 = Param(m.P, initialize=param_dict(
+            data['iD'], ['product'], 'initial_stock', (S['P'],), 'ID0'))
+        m.IW0 = Param(m.P, initialize=param_dict(
+            data['iW'], ['product'], 'initial_stock', (S['P'],), 'IW0'))
 
     # ---------------- Variables ----------------
-    m.yD = Var(m.D, within=Binary, doc="Ouverture dépôt")
-    m.yW = Var(m.W, within=Binary, doc="Ouverture entrepôt")
-
-    m.q1 = Var(m.P, m.F, m.D, m.T, within=NonNegativeReals,
-               doc="Flux usine->dépôt")
-    m.q2 = Var(m.P, m.D, m.W, m.T, within=NonNegativeReals,
-               doc="Flux dépôt->entrepôt")
-    m.q3 = Var(m.P, m.W, m.C, m.T, within=NonNegativeReals,
-               doc="Flux entrepôt->client")
-
-    m.ID = Var(m.P, m.D, m.T, within=NonNegativeReals, doc="Stock dépôt")
-    m.IW = Var(m.P, m.W, m.T, within=NonNegativeReals, doc="Stock entrepôt")
+    with span("variables sites", model=m):
+        m.yD = Var(m.D, within=Binary, doc="Ouverture dépôt")
+        m.yW = Var(m.W, within=Binary, doc="Ouverture entrepôt")
+
+    with span("variable q1", model=m):
+        m.q1 = Var(m.P, m.LFD, m.T, within=NonNegativeReals,
+                   doc="Flux usine->dépôt")
+    with span("variable q2", model=m):
+        m.q2 = Var(m.P, m.LDW, m.T, within=NonNegativeReals,
+                   doc="Flux dépôt->entrepôt")
+    with span("variable q3", model=m):
+        m.q3 = Var(m.P, m.LWC, m.T, within=NonNegativeReals,
+                   doc="Flux entrepôt->client")
+
+    with span("variables stocks", model=m):
+        m.ID = Var(m.P, m.D, m.T, within=NonNegativeReals, doc="Stock dépôt")
+        m.IW = Var(m.P, m.W, m.T, within=NonNegativeReals, doc="Stock entrepôt")
 
     # =====================================================
     # 3. Fonction Objectif
     # =====================================================
 
-    def obj_rule(m):
+    with span("objectif", model=m):
+        def obj_rule(m):
 
-        cost_FD = sum(
-            m.cFD[f, d] * m.q1[p, f, d, t]
-            for p in m.P for f in m.F for d in m.D for t in m.T
-        )
+            cost_FD = sum(
+                m.cFD[f, d] * m.q1[p, f, d, t]
+                for p in m.P for f, d in m.LFD for t in m.T
+            )
 
-        cost_DW = sum(
-            m.cDW[d, w] * m.q2[p, d, w, t]
-            for p in m.P for d in m.D for w in m.W for t in m.T
-        )
+            cost_DW = sum(
+                m.cDW[d, w] * m.q2[p, d, w, t]
+                for p in m.P for d, w in m.LDW for t in m.T
+            )
 
-        cost_WC = sum(
-            m.cWC[w, c] * m.q3[p, w, c, t]
-            for p in m.P for w in m.W for c in m.C for t in m.T
-        )
+            cost_WC = sum(
+                m.cWC[w, c] * m.q3[p, w, c, t]
+                for p in m.P for w, c in m.LWC for t in m.T
+            )
 
-        fixed_costs = (
-            sum(m.FD[d] * m.yD[d] for d in m.D)
-        + sum(m.FW[w] * m.yW[w] for w in m.W)
-        )
+            fixed_costs = (
+                sum(m.FD[d] * m.yD[d] for d in m.D)
+            + sum(m.FW[w] * m.yW[w] for w in m.W)
+            )
 
-        holding_costs = (
-            sum(m.hD[p] * m.ID[p, d, t] for p in m.P for d in m.D for t in m.T)
-        + sum(m.hW[p] * m.IW[p, w, t] for p in m.P for w in m.W for t in m.T)
-        )
+            holding_costs = (
+                sum(m.hD[p] * m.ID[p, d, t] for p in m.P for d in m.D for t in m.T)
+            + sum(m.hW[p] * m.IW[p, w, t] for p in m.P for w in m.W for t in m.T)
+            )
 
-        return cost_FD + cost_DW + cost_WC + fixed_costs + holding_costs
+            return cost_FD + cost_DW + cost_WC + fixed_costs + holding_costs
 
-    m.OBJ = Objective(rule=obj_rule, sense=minimize)
+        m.OBJ = Objective(rule=obj_rule, sense=minimize)
 
     # =====================================================
     # 4. Contraintes
     # =====================================================
 
     # Satisfaction de la demande
-    def demand_rule(m, p, c, t):
-        return sum(m.q3[p, w, c, t] for w in m.W) == m.dem[p, c, t]
-    m.DEM = Constraint(m.P, m.C, m.T, rule=demand_rule)
-
-    # Équilibre stocks dépôts
-    def stockD_rule(m, p, d, t):
-        if t == 1:
-            return m.ID[p, d, t] == m.ID0[p] + sum(m.q1[p, f, d, t] for f in m.F) - sum(m.q2[p, d, w, t] for w in m.W)
-        return m.ID[p, d, t] == m.ID[p, d, t-1] + sum(m.q1[p, f, d, t] for f in m.F) - sum(m.q2[p, d, w, t] for w in m.W)
-    m.STD = Constraint(m.P, m.D, m.T, rule=stockD_rule)
+    with span("contrainte DEM", model=m):
+        def demand_rule(m, p, c, t):
+            if not W_of_C[c]:
+                return Constraint.Skip   # client sans demande ni liaison
+            return sum(m.q3[p, w, c, t] for w in W_of_C[c]) == m.dem[p, c, t]
+        m.DEM = Constraint(m.P, m.C, m.T, rule=demand_rule)
+
+    # Équilibre stocks dépôts (périodes enchaînées dans l'ordre de m.T)
+    with span("contrainte STD", model=m):
+        def stockD_rule(m, p, d, t):
+            if t == m.T.first():
+                return m.ID[p, d, t] == m.ID0[p] + sum(m.q1[p, f, d, t] for f in F_of_D[d]) - sum(m.q2[p, d, w, t] for w in W_of_D[d])
+            return m.ID[p, d, t] == m.ID[p, d, m.T.prev(t)] + sum(m.q1[p, f, d, t] for f in F_of_D[d]) - sum(m.q2[p, d, w, t] for w in W_of_D[d])
+        m.STD = Constraint(m.P, m.D, m.T, rule=stockD_rule)
 
     # Équilibre stocks entrepôts
-    def stockW_rule(m, p, w, t):
-        if t == 1:
-            return m.IW[p, w, t] == m.IW0[p] + sum(m.q2[p, d, w, t] for d in m.D) - sum(m.q3[p, w, c, t] for c in m.C)
-        return m.IW[p, w, t] == m.IW[p, w, t-1] + sum(m.q2[p, d, w, t] for d in m.D) - sum(m.q3[p, w, c, t] for c in m.C)
-    m.STW = Constraint(m.P, m.W, m.T, rule=stockW_rule)
+    with span("contrainte STW", model=m):
+        def stockW_rule(m, p, w, t):
+            if t == m.T.first():
+                return m.IW[p, w, t] == m.IW0[p] + sum(m.q2[p, d, w, t] for d in D_of_W[w]) - sum(m.q3[p, w, c, t] for c in C_of_W[w])
+            return m.IW[p, w, t] == m.IW[p, w, m.T.prev(t)] + sum(m.q2[p, d, w, t] for d in D_of_W[w]) - sum(m.q3[p, w, c, t] for c in C_of_W[w])
+        m.STW = Constraint(m.P, m.W, m.T, rule=stockW_rule)
 
     # Capacités
-    m.CAPD = Constraint(m.D, m.T,
-                        rule=lambda m, d, t: sum(m.q2[p, d, w, t] for p in m.P for w in m.W) <= m.capD[d] * m.yD[d])
-    m.CAPW = Constraint(m.W, m.T,
-                        rule=lambda m, w, t: sum(m.q3[p, w, c, t] for p in m.P for c in m.C) <= m.capW[w] * m.yW[w])
+    with span("contrainte CAPD", model=m):
+        m.CAPD = Constraint(m.D, m.T,
+                            rule=lambda m, d, t: sum(m.q2[p, d, w, t] for p in m.P for w in W_of_D[d]) <= m.capD[d] * m.yD[d])
+    with span("contrainte CAPW", model=m):
+        m.CAPW = Constraint(m.W, m.T,
+                            rule=lambda m, w, t: sum(m.q3[p, w, c, t] for p in m.P for c in C_of_W[w]) <= m.capW[w] * m.yW[w])
 
     # Stocks de sécurité
-    m.SSD = Constraint(m.P, m.D, m.T, rule=lambda m, p,
-                       d, t: m.ID[p, d, t] >= m.ssD[p])
-    m.SSW = Constraint(m.P, m.W, m.T, rule=lambda m, p,
-                       w, t: m.IW[p, w, t] >= m.ssW[p])
+    with span("contrainte SSD", model=m):
+        m.SSD = Constraint(m.P, m.D, m.T, rule=lambda m, p,
+                           d, t: m.ID[p, d, t] >= m.ssD[p])
+    with span("contrainte SSW", model=m):
+        m.SSW = Constraint(m.P, m.W, m.T, rule=lambda m, p,
+                           w, t: m.IW[p, w, t] >= m.ssW[p])
 
     print(
         f"\n✓ Modèle construit: {len(m.P)} produits, {len(m.C)} clients, {len(m.T)} périodes")
@@ -869,10 +270,17 @@ def analyze_results(m, results):
     print(f"   Condition d'arrêt: {results.solver.termination_condition}")
     print(f"   Temps de calcul: {results.solver.time:.2f} secondes")
 
-    if results.solver.termination_condition != TerminationCondition.optimal:
+    if results.solver.termination_condition == TerminationCondition.feasible:
+        # Résolution arrêtée avec une solution entière (incumbent accepté)
+        print("⚠️  Solution réalisable, optimalité non prouvée")
+    elif results.solver.termination_condition != TerminationCondition.optimal:
         print("⚠️  ATTENTION: Solution non-optimale!")
         return None
 
+    # Valeurs de la solution lues une seule fois en tableaux NumPy
+    kpis = solution_kpis(extract_solution(m))
+    detail = kpis.pop('detail')
+
     # 2. Coût total
     total_cost = value(m.OBJ)
     print(f"\n💰 COÛT TOTAL OPTIMAL: {total_cost:,.2f} MAD")
@@ -880,15 +288,15 @@ def analyze_results(m, results):
     # 3. Sites ouverts
     print(f"\n🏢 CONFIGURATION DU RÉSEAU")
 
-    depots_ouverts = [d for d in m.D if value(m.yD[d]) > 0.5]
-    depots_fermes = [d for d in m.D if value(m.yD[d]) < 0.5]
+    depots_ouverts = kpis['depots_ouverts']
+    depots_fermes = [d for d in m.D if d not in depots_ouverts]
     print(
         f"   Dépôts ouverts ({len(depots_ouverts)}/{len(m.D)}): {depots_ouverts}")
     print(
         f"   Dépôts fermés ({len(depots_fermes)}/{len(m.D)}): {depots_fermes}")
 
-    entrepots_ouverts = [w for w in m.W if value(m.yW[w]) > 0.5]
-    entrepots_fermes = [w for w in m.W if value(m.yW[w]) < 0.5]
+    entrepots_ouverts = kpis['entrepots_ouverts']
+    entrepots_fermes = [w for w in m.W if w not in entrepots_ouverts]
     print(
         f"   Entrepôts ouverts ({len(entrepots_ouverts)}/{len(m.W)}): {entrepots_ouverts[:10]}{'...' if len(entrepots_ouverts) > 10 else ''}")
     print(
@@ -898,25 +306,20 @@ def analyze_results(m, results):
     print(f"\n📈 DÉCOMPOSITION DES COÛTS")
 
     # Coûts de transport
-    cout_transport_fd = sum(value(m.cFD[f, d] * m.q1[p, f, d, t])
-                            for p in m.P for f in m.F for d in m.D for t in m.T)
-    cout_transport_dw = sum(value(m.cDW[d, w] * m.q2[p, d, w, t])
-                            for p in m.P for d in m.D for w in m.W for t in m.T)
-    cout_transport_wc = sum(value(m.cWC[w, c] * m.q3[p, w, c, t])
-                            for p in m.P for w in m.W for c in m.C for t in m.T)
-    cout_transport_total = cout_transport_fd + cout_transport_dw + cout_transport_wc
+    cout_transport_fd = detail['transport']['fd']
+    cout_transport_dw = detail['transport']['dw']
+    cout_transport_wc = detail['transport']['wc']
+    cout_transport_total = kpis['cout_transport']
 
     # Coûts fixes
-    cout_fixe_depots = sum(value(m.FD[d] * m.yD[d]) for d in m.D)
-    cout_fixe_entrepots = sum(value(m.FW[w] * m.yW[w]) for w in m.W)
-    cout_fixe_total = cout_fixe_depots + cout_fixe_entrepots
+    cout_fixe_depots = detail['fixe']['depots']
+    cout_fixe_entrepots = detail['fixe']['entrepots']
+    cout_fixe_total = kpis['cout_fixe']
 
     # Coûts de stockage
-    cout_stockage_depots = sum(
-        value(m.hD[p] * m.ID[p, d, t]) for p in m.P for d in m.D for t in m.T)
-    cout_stockage_entrepots = sum(
-        value(m.hW[p] * m.IW[p, w, t]) for p in m.P for w in m.W for t in m.T)
-    cout_stockage_total = cout_stockage_depots + cout_stockage_entrepots
+    cout_stockage_depots = detail['stockage']['depots']
+    cout_stockage_entrepots = detail['stockage']['entrepots']
+    cout_stockage_total = kpis['cout_stockage']
 
     print(
         f"\n   COÛTS DE TRANSPORT ({cout_transport_total/total_cost*100:.1f}%):")
@@ -946,14 +349,9 @@ def analyze_results(m, results):
     # 5. Analyse des flux
     print(f"\n📦 ANALYSE DES FLUX")
 
-    flux_total = sum(value(m.q3[p, w, c, t])
-                     for p in m.P for w in m.W for c in m.C for t in m.T)
+    flux_par_periode = kpis['flux_par_periode']
+    flux_total = sum(flux_par_periode.values())
     print(f"   Volume total livré aux clients: {flux_total:,.0f} unités")
-
-    flux_par_periode = {}
-    for t in m.T:
-        flux_par_periode[t] = sum(value(m.q3[p, w, c, t])
-                                  for p in m.P for w in m.W for c in m.C)
     print(
         f"   Flux moyen par mois: {np.mean(list(flux_par_periode.values())):,.0f} unités")
     print(
@@ -964,14 +362,7 @@ def analyze_results(m, results):
     # 6. Taux d'utilisation des capacités
     print(f"\n⚙️  TAUX D'UTILISATION DES CAPACITÉS")
 
-    util_depots = {}
-    for d in depots_ouverts:
-        utilisation = sum(value(m.q2[p, d, w, t])
-                          for p in m.P for w in m.W for t in m.T)
-        capacite_totale = value(m.capD[d]) * len(m.T)
-        util_depots[d] = (utilisation / capacite_totale *
-                          100) if capacite_totale > 0 else 0
-
+    util_depots = kpis['util_depots']
     if util_depots:
         print(f"   Dépôts:")
         print(
@@ -981,14 +372,7 @@ def analyze_results(m, results):
         print(
             f"      - Utilisation minimale: {min(util_depots.values()):.1f}% (dépôt {min(util_depots, key=util_depots.get)})")
 
-    util_entrepots = {}
-    for w in entrepots_ouverts:
-        utilisation = sum(value(m.q3[p, w, c, t])
-                          for p in m.P for c in m.C for t in m.T)
-        capacite_totale = value(m.capW[w]) * len(m.T)
-        util_entrepots[w] = (utilisation / capacite_totale *
-                             100) if capacite_totale > 0 else 0
-
+    util_entrepots = kpis['util_entrepots']
     if util_entrepots:
         print(f"   Entrepôts:")
         print(
@@ -1001,68 +385,46 @@ def analyze_results(m, results):
     # 7. Analyse des stocks
     print(f"\n📊 ANALYSE DES STOCKS")
 
-    stock_moyen_depots = np.mean([value(m.ID[p, d, t])
-                                 for p in m.P for d in depots_ouverts for t in m.T])
-    stock_moyen_entrepots = np.mean(
-        [value(m.IW[p, w, t]) for p in m.P for w in entrepots_ouverts for t in m.T])
-
-    print(f"   Stock moyen dans les dépôts: {stock_moyen_depots:,.0f} unités")
+    print(f"   Stock moyen dans les dépôts: {detail['stock_moyen_depots']:,.0f} unités")
     print(
-        f"   Stock moyen dans les entrepôts: {stock_moyen_entrepots:,.0f} unités")
+        f"   Stock moyen dans les entrepôts: {detail['stock_moyen_entrepots']:,.0f} unités")
 
     print("\n" + "="*70)
 
     # Retourner un dictionnaire avec tous les résultats
-    return {
-        'total_cost': total_cost,
-        'depots_ouverts': depots_ouverts,
-        'entrepots_ouverts': entrepots_ouverts,
-        'cout_transport': cout_transport_total,
-        'cout_fixe': cout_fixe_total,
-        'cout_stockage': cout_stockage_total,
-        'flux_par_periode': flux_par_periode,
-        'util_depots': util_depots,
-        'util_entrepots': util_entrepots
-    }
+    return dict(kpis, total_cost=total_cost)
 
 # =====================================================
 # 6. Export des résultats
 # =====================================================
 
 
-def export_results(m, output_path="results/"):
-    """Exporte les résultats vers des fichiers CSV"""
-    import os
+def export_results(m, output_path="results/", fmt="parquet",
+                   partition_by="month"):
+    """Exporte les résultats: sites ouverts en CSV (relus par read_sites) et
+    toutes les variables de flux et de stock (q1, q2, q3, ID, IW) au format
+    colonnaire `fmt` ('parquet', 'feather' ou 'csv'), partitionnées par
+    `partition_by` ('month', 'product' ou None)"""
     os.makedirs(output_path, exist_ok=True)
+    sol = extract_solution(m)
 
     # Sites ouverts
     sites_df = pd.DataFrame({
-        'depot': list(m.D),
-        'ouvert': [value(m.yD[d]) for d in m.D]
+        'depot': sol['sets']['D'],
+        'ouvert': sol['values']['yD']
     })
-    sites_df.to_csv(output_path + "sites_depots.csv", index=False)
+    sites_df.to_csv(os.path.join(output_path, "sites_depots.csv"), index=False)
 
     sites_w_df = pd.DataFrame({
-        'warehouse': list(m.W),
-        'ouvert': [value(m.yW[w]) for w in m.W]
+        'warehouse': sol['sets']['W'],
+        'ouvert': sol['values']['yW']
     })
-    sites_w_df.to_csv(output_path + "sites_entrepots.csv", index=False)
-
-    # Flux principaux (> 0)
-    flux_q3 = []
-    for p in m.P:
-        for w in m.W:
-            for c in m.C:
-                for t in m.T:
-                    val = value(m.q3[p, w, c, t])
-                    if val > 0.01:
-                        flux_q3.append({
-                            'product': p, 'warehouse': w, 'client': c,
-                            'month': t, 'quantity': val
-                        })
-
-    pd.DataFrame(flux_q3).to_csv(
-        output_path + "flux_entrepot_client.csv", index=False)
+    sites_w_df.to_csv(os.path.join(output_path, "sites_entrepots.csv"),
+                      index=False)
+
+    # Flux et stocks, écrits en bloc depuis les tableaux
+    write_tables(solution_tables(sol), output_path, fmt=fmt,
+                 partition_by=partition_by)
 
     print(f"\n✓ Résultats exportés dans {output_path}")
 
@@ -1077,7 +439,7 @@ plt.rcParams['figure.figsize'] = (12, 8)
 plt.rcParams['font.size'] = 10
 
 
-def plot_cost_breakdown(analysis):
+def plot_cost_breakdown(analysis, output_path="results/"):
     """Graphique en camembert de la décomposition des coûts"""
 
     fig, ax = plt.subplots(1, 1, figsize=(10, 7))
@@ -1115,27 +477,32 @@ def plot_cost_breakdown(analysis):
               bbox_to_anchor=(1, 1), fontsize=10)
 
     plt.tight_layout()
-    plt.savefig('results/cost_breakdown.png', dpi=300, bbox_inches='tight')
+    plt.savefig(os.path.join(output_path, 'cost_breakdown.png'), dpi=300,
+                bbox_inches='tight')
+    plt.close(fig)
     print("✓ Graphique sauvegardé: cost_breakdown.png")
     # plt.show()
 
 
-def plot_flux_evolution(analysis):
+def plot_flux_evolution(analysis, output_path="results/"):
     """Graphique de l'évolution des flux mensuels"""
 
     fig, ax = plt.subplots(figsize=(12, 6))
 
     mois = sorted(analysis['flux_par_periode'].keys())
     flux = [analysis['flux_par_periode'][m] for m in mois]
+    # Abscisse: rang de la période (les libellés peuvent être du texte)
+    x = np.arange(len(mois))
 
-    ax.plot(mois, flux, marker='o', linewidth=2.5, markersize=8,
+    ax.plot(x, flux, marker='o', linewidth=2.5, markersize=8,
             color='#3498db', label='Flux mensuel')
-    ax.fill_between(mois, flux, alpha=0.3, color='#3498db')
+    ax.fill_between(x, flux, alpha=0.3, color='#3498db')
+    ax.set_xticks(x, [str(m) for m in mois])
 
     # Ligne de tendance
-    z = np.polyfit(mois, flux, 1)
+    z = np.polyfit(x, flux, 1)
     p = np.poly1d(z)
-    ax.plot(mois, p(mois), "--", linewidth=2, color='#e74c3c',
+    ax.plot(x, p(x), "--", linewidth=2, color='#e74c3c',
             label=f'Tendance (pente: {z[0]:,.0f})')
 
     # Moyenne
@@ -1151,12 +518,14 @@ def plot_flux_evolution(analysis):
     ax.grid(True, alpha=0.3)
 
     plt.tight_layout()
-    plt.savefig('results/flux_evolution.png', dpi=300, bbox_inches='tight')
+    plt.savefig(os.path.join(output_path, 'flux_evolution.png'), dpi=300,
+                bbox_inches='tight')
+    plt.close(fig)
     print("✓ Graphique sauvegardé: flux_evolution.png")
     # plt.show()
 
 
-def plot_capacity_utilization(analysis):
+def plot_capacity_utilization(analysis, output_path="results/"):
     """Graphique des taux d'utilisation des capacités"""
 
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
@@ -1201,7 +570,9 @@ def plot_capacity_utilization(analysis):
         ax2.grid(axis='x', alpha=0.3)
 
     plt.tight_layout()
-    plt.savefig('results/capacity_utilization.png',dpi=300, bbox_inches='tight')
+    plt.savefig(os.path.join(output_path, 'capacity_utilization.png'),
+                dpi=300, bbox_inches='tight')
+    plt.close(fig)
     print("✓ Graphique sauvegardé: capacity_utilization.png")
     # plt.show()
 
@@ -1247,7 +618,8 @@ def plot_capacity_utilization(analysis):
 #     # plt.show()
 
 
-def plot_stock_evolution(m, depots_ouverts, entrepots_ouverts_sample):
+def plot_stock_evolution(m, depots_ouverts, entrepots_ouverts_sample,
+                         output_path="results/"):
 
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
 
@@ -1255,7 +627,7 @@ def plot_stock_evolution(m, depots_ouverts, entrepots_ouverts_sample):
     if depots_ouverts:
         for d in depots_ouverts[:3]:
             for p in list(m.P)[:2]:
-                mois = sorted(m.T, key=lambda x: int(x))
+                mois = list(m.T)   # ordre de params.period_order
                 stocks = [value(m.ID[p, d, t]) for t in mois]
 
                 ax1.plot(
@@ -1280,7 +652,7 @@ def plot_stock_evolution(m, depots_ouverts, entrepots_ouverts_sample):
     if entrepots_ouverts_sample:
         for w in entrepots_ouverts_sample[:3]:
             for p in list(m.P)[:2]:
-                mois = sorted(m.T, key=lambda x: int(x))
+                mois = list(m.T)   # ordre de params.period_order
                 stocks = [value(m.IW[p, w, t]) for t in mois]
 
                 ax2.plot(
@@ -1301,23 +673,26 @@ def plot_stock_evolution(m, depots_ouverts, entrepots_ouverts_sample):
     ax2.grid(True, alpha=0.3)
 
     plt.tight_layout()
-    plt.savefig("results/stock_evolution.png", dpi=300)
+    plt.savefig(os.path.join(output_path, "stock_evolution.png"), dpi=300)
+    plt.close(fig)
 
 
-def generate_all_visualizations(m, analysis):
-    """Génère toutes les visualisations"""
+def generate_all_visualizations(m, analysis, output_path="results/"):
+    """Génère toutes les visualisations dans `output_path`"""
+    os.makedirs(output_path, exist_ok=True)
 
     print("\n" + "="*50)
     print("GÉNÉRATION DES VISUALISATIONS")
     print("="*50 + "\n")
 
-    plot_cost_breakdown(analysis)
-    plot_flux_evolution(analysis)
-    plot_capacity_utilization(analysis)
+    plot_cost_breakdown(analysis, output_path)
+    plot_flux_evolution(analysis, output_path)
+    plot_capacity_utilization(analysis, output_path)
 
     # Pour l'évolution des stocks, on a besoin du modèle
     entrepots_sample = analysis['entrepots_ouverts'][:5]
-    plot_stock_evolution(m, analysis['depots_ouverts'], entrepots_sample)
+    plot_stock_evolution(m, analysis['depots_ouverts'], entrepots_sample,
+                         output_path)
 
     print("\n✅ Toutes les visualisations ont été générées!")
 
@@ -1329,55 +704,99 @@ def generate_all_visualizations(m, analysis):
 # =====================================================
 
 
-# def main():
-#     """Fonction principale avec visualisations intégrées"""
-
-#     print("="*70)
-#     print("    OPTIMISATION DU RÉSEAU LOGISTIQUE - SUPPLY CHAIN NETWORK")
-#     print("="*70)
-#     print(f"Démarrage: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-
-#     # Chargement des données
-#     print("📁 Étape 1/5: Chargement des données...")
-#     data = load_and_validate_data(path="Data/")
-
-#     # Construction du modèle
-#     print("\n🔧 Étape 2/5: Construction du modèle...")
-#     m = build_model(data)
-
-#     # Résolution
-#     print("\n⚡ Étape 3/5: Résolution du problème MILP...")
-#     print("   (Ceci peut prendre plusieurs minutes...)\n")
-
-#     # solver = SolverFactory("glpk")
-#     solver = SolverFactory("glpk")
-#     results = solver.solve(m, tee=True)
+def main(backend="glpk", start=None, reduce=False, data_path="Data/",
+         output_path="results/", time_limit=None, mip_gap=None,
+         fmt="parquet", partition_by="month", plots=True, export=False,
+         tee=True, trace=False):
+    """Fonction principale avec visualisations intégrées
+
+    `backend` choisit le solveur: "glpk" (fichier LP + glpsol), "glpk_capi"
+    (GLPK en mémoire), "appsi_highs" (HiGHS persistant) ou "benders"
+    (décomposition maître/sous-problème avec GLPK en mémoire). `start` est le
+    dossier d'une exécution précédente (sites_depots.csv,
+    sites_entrepots.csv) utilisé comme solution initiale. Avec `reduce`, le
+    presolve (presolve.py) retire les liaisons dominées et fixe les sites
+    déterminés avant la construction.
+
+    Les données sont lues dans `data_path`; graphiques (`plots`) et export
+    des résultats (`export`, format `fmt`) sont écrits dans `output_path`.
+    Avec `trace`, chaque étape (et chaque bloc du modèle) est mesurée: temps
+    réel et CPU, pic de mémoire, taille du modèle; la trace est écrite dans
+    `output_path`/trace.json (voir tracing.py).
+    """
+    tracer = Tracer() if trace else None
+    with tracer or contextlib.nullcontext():
+        print("="*70)
+        print("    OPTIMISATION DU RÉSEAU LOGISTIQUE - SUPPLY CHAIN NETWORK")
+        print("="*70)
+        print(f"Démarrage: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+        # Chargement des données
+        print("📁 Étape 1/5: Chargement des données...")
+        with span("lecture"):
+            data = load_and_validate_data(path=data_path)
+        fixings = None
+        if reduce:
+            with span("presolve"):
+                data, fixings, _ = presolve(data)
+
+        # Construction du modèle
+        print("\n🔧 Étape 2/5: Construction du modèle...")
+        with span("construction") as s:
+            m = s.model = (build_model_matrix(data, fixings=fixings)
+                           if backend in MATRIX_BACKENDS or reduce
+                           else build_model(data))
+
+        # Résolution
+        print("\n⚡ Étape 3/5: Résolution du problème MILP...")
+        print("   (Ceci peut prendre plusieurs minutes...)\n")
+
+        results, timings = solve_model(m, backend=backend, tee=tee,
+                                       start=start,
+                                       priority=start is not None,
+                                       time_limit=time_limit, mip_gap=mip_gap)
+        print_timings(timings, backend)
+
+        # Analyse des résultats
+        print("\n📊 Étape 4/5: Analyse des résultats...")
+        with span("analyse"):
+            analysis = analyze_results(m, results)
+
+        # NOUVEAU: Génération des visualisations
+        if plots and analysis is not None:
+            print("\n📈 Étape 5/5: Génération des visualisations...")
+            try:
+                with span("graphiques"):
+                    generate_all_visualizations(m, analysis, output_path)
+            except Exception as e:
+                print(f"⚠️ Erreur lors de la génération des graphiques: {e}")
+                print("   Les résultats numériques restent disponibles.")
+
+        # Export (optionnel)
+        if export and analysis is not None:
+            with span("export"):
+                export_results(m, output_path=output_path, fmt=fmt,
+                               partition_by=partition_by)
+
+    if tracer is not None:
+        print_trace(tracer)
+        path = tracer.save(os.path.join(output_path, "trace.json"),
+                           backend=backend, data_path=data_path)
+        print(f"✓ Trace: {path}")
 
-#     # Analyse des résultats
-#     print("\n📊 Étape 4/5: Analyse des résultats...")
-#     analysis = analyze_results(m, results)
-
-#     # NOUVEAU: Génération des visualisations
-#     print("\n📈 Étape 5/5: Génération des visualisations...")
-#     try:
-#         generate_all_visualizations(m, analysis)
-#     except Exception as e:
-#         print(f"⚠️ Erreur lors de la génération des graphiques: {e}")
-#         print("   Les résultats numériques restent disponibles.")
-
-#     # Export (optionnel)
-#     # export_results(m, output_path="results/")
-
-#     print(
-#         f"\n✅ Optimisation terminée: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(
+        f"\n✅ Optimisation terminée: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-#     return m, results, analysis
+    return m, results, analysis
 
 # =====================================================
 # Exécution
 # =====================================================
 
 
+if __name__ == "__main__":
+    # Ligne de commande: voir cli.py (python improvedmodel.py --help)
+    import sys
+    from cli import cli
 
-# if __name__ == "__main__":
-#     model, results, analysis = main()
+    sys.exit(cli())
@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+
+from pyomo.common.gc_manager import PauseGC
+from pyomo.environ import TerminationCondition
+
+import glpk_capi
+from matrixmodel import (compile_matrices, diff_matrices, model_from_matrices,
+                         same_structure, update_model)
+from solver import glpk_termination, load_vector, make_results
+
+# =====================================================
+# Résolution incrémentale (modèle et solveur persistants)
+# =====================================================
+
+
+class IncrementalSolver:
+    """Garde le modèle Pyomo et le problème GLPK en mémoire entre deux
+    résolutions.
+
+    À chaque appel de `solve(data)`, les nouvelles données sont compilées
+    (NumPy, rapide) et comparées à la forme précédente: si les ensembles sont
+    identiques, seuls les coefficients, bornes et seconds membres modifiés
+    sont mis à jour, GLPK repart de la base précédente et la configuration de
+    sites précédente sert de solution initiale. Sinon, le modèle est
+    reconstruit.
+    """
+
+    def __init__(self):
+        self.model = None
+        self.problem = None
+        self.last_changes = {}
+        self.last_sites = None
+
+    def _rebuild(self, mat):
+        if self.problem is not None:
+            self.problem.close()
+        with PauseGC():
+            self.model = model_from_matrices(mat)
+        self.problem = glpk_capi.GLPKProblem(mat)
+
+    @staticmethod
+    def _site_cols(mat):
+        return np.concatenate([mat['var_index']['yD'], mat['var_index']['yW']])
+
+    def solve(self, data, tee=False, time_limit=None, mip_gap=None,
+              monitor=None):
+        """Met à jour puis résout (`monitor`: voir solve_model). Retourne
+        (model, results, timings)"""
+        t0 = time.perf_counter()
+        mat = compile_matrices(data)
+        t1 = time.perf_counter()
+
+        if self.model is None or not same_structure(self.model.matrix_form, mat):
+            self._rebuild(mat)
+            mode = 'complet'
+            self.last_changes = {}
+        else:
+            diff = diff_matrices(self.model.matrix_form, mat)
+            self.problem.update(mat, diff)
+            update_model(self.model, mat, diff)
+            mode = 'incrémental'
+            self.last_changes = {name: len(pos)
+                                 for name, pos in diff['params'].items()
+                                 if len(pos)}
+        t2 = time.perf_counter()
+
+        # Démarrage à chaud: sites ouverts de la solution précédente,
+        # complétés en solution réalisable pour les nouvelles données
+        start = None
+        if mode == 'incrémental' and self.last_sites is not None:
+            start = self.problem.complete_start(self._site_cols(mat),
+                                                self.last_sites)
+        status = self.problem.solve(msg=tee, time_limit=time_limit,
+                                    mip_gap=mip_gap, start=start,
+                                    monitor=monitor)
+        t3 = time.perf_counter()
+        termination = glpk_termination(self.problem, status)
+        if termination in (TerminationCondition.optimal,
+                           TerminationCondition.maxTimeLimit,
+                           TerminationCondition.feasible):
+            x = self.problem.col_values()
+            load_vector(self.model, x)
+            self.last_sites = x[self._site_cols(mat)].round()
+        t4 = time.perf_counter()
+
+        results = make_results(termination, t3 - t2)
+        timings = {'compilation': t1 - t0, f'mise à jour ({mode})': t2 - t1,
+                   'resolution': t3 - t2, 'chargement': t4 - t3,
+                   'total': t4 - t0}
+        return self.model, results, timings
+
+    def close(self):
+        if self.problem is not None:
+            self.problem.close()
+        self.model = self.problem = self.last_sites = None
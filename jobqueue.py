@@ -0,0 +1,516 @@
+import json
+import os
+import pickle
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from background import MONITORED, traced
+from tracing import Tracer, span
+
+# =====================================================
+# 1. File de jobs persistante (SQLite)
+# =====================================================
+
+WAITING, RUNNING = 'en attente', 'en cours'
+FINAL = ('terminé', 'sans solution', 'annulé', 'erreur', 'expiré')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    settings BLOB NOT NULL,
+    data BLOB,
+    data_path TEXT,
+    time_limit REAL,
+    state TEXT NOT NULL,
+    request TEXT,
+    worker INTEGER,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    progress TEXT,
+    result BLOB,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, owner);
+"""
+
+# Ordre de service équitable: d'abord le propriétaire qui a le moins de
+# jobs en cours, puis celui servi le moins récemment, puis l'ordre d'arrivée
+WAITING_ORDER = f"""
+SELECT id FROM jobs AS j WHERE state = '{WAITING}'
+ORDER BY (SELECT COUNT(*) FROM jobs AS r
+          WHERE r.owner = j.owner AND r.state = '{RUNNING}'),
+         COALESCE((SELECT MAX(started) FROM jobs AS s
+                   WHERE s.owner = j.owner), 0),
+         submitted, id
+"""
+NEXT_JOB = WAITING_ORDER + "LIMIT 1"
+
+
+class JobQueue:
+    """File de résolutions partagée par les sessions de l'application et
+    les processus de calcul, stockée dans une base SQLite (mode WAL).
+
+    submit / status / result / cancel / accept côté application; claim,
+    report et finish côté workers (voir WorkerPool). Les données sont
+    transmises au job (pickle), ou relues par le worker depuis `data_path`
+    avec load_and_validate_data.
+
+    Les données d'un job sont effacées dès qu'il se termine (elles restent
+    jusque-là pour le remettre en file si son worker s'arrête), et les jobs
+    terminés depuis plus de `retention` secondes sont supprimés avec leur
+    résultat (voir purge).
+    """
+
+    def __init__(self, path=".cache/jobs.sqlite", default_time_limit=600,
+                 retention=24 * 3600):
+        self.path = os.path.abspath(path)
+        self.default_time_limit = default_time_limit
+        self.retention = retention
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as con:
+            con.executescript(SCHEMA)
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.row_factory = sqlite3.Row
+        return _Closing(con)
+
+    # ------------------------------------------------------------------
+    # Côté application
+    # ------------------------------------------------------------------
+    def submit(self, data=None, backend="glpk_capi", owner="local",
+               time_limit=None, mip_gap=None, start=None, data_path=None):
+        """Ajoute une résolution à la file et retourne son identifiant.
+        `time_limit` (secondes) borne la résolution; le worker est arrêté
+        s'il le dépasse nettement (voir WorkerPool)."""
+        if data is None and data_path is None:
+            raise ValueError("Fournir data ou data_path")
+        self.purge()
+        settings = {'mip_gap': mip_gap, 'start': start}
+        with self._connect() as con:
+            cur = con.execute(
+                "INSERT INTO jobs (owner, backend, settings, data, data_path,"
+                " time_limit, state, submitted) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (owner, backend, pickle.dumps(settings),
+                 None if data is None else pickle.dumps(data), data_path,
+                 time_limit or self.default_time_limit, WAITING, time.time()))
+            return cur.lastrowid
+
+    def status(self, job_id):
+        """État d'un job: file, progression, temps; None s'il n'existe pas"""
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT id, owner, backend, time_limit, state, request, worker,"
+                " submitted, started, finished, progress, error"
+                " FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            info = dict(row)
+            info['progress'] = json.loads(row['progress'] or 'null')
+            info['position'] = None
+            if row['state'] == WAITING:
+                # Rang dans l'ordre où claim attribue les jobs
+                order = [r['id'] for r in con.execute(WAITING_ORDER)]
+                info['position'] = order.index(job_id) + 1
+        return info
+
+    def result(self, job_id):
+        """Résultat d'un job terminé (analyse, solution, temps, condition
+        d'arrêt), ou None"""
+        with self._connect() as con:
+            row = con.execute("SELECT result FROM jobs WHERE id = ?",
+                              (job_id,)).fetchone()
+        return pickle.loads(row['result']) if row and row['result'] else None
+
+    def _request(self, job_id, request):
+        with self._connect() as con:
+            con.execute("UPDATE jobs SET request = ? WHERE id = ? AND state = ?",
+                        (request, job_id, RUNNING))
+            # Un job encore en file est retiré directement
+            if request == 'annuler':
+                con.execute("UPDATE jobs SET state = 'annulé', finished = ?,"
+                            " data = NULL WHERE id = ? AND state = ?",
+                            (time.time(), job_id, WAITING))
+
+    def cancel(self, job_id):
+        self._request(job_id, 'annuler')
+
+    def accept(self, job_id):
+        self._request(job_id, 'accepter')
+
+    def purge(self, max_age=None):
+        """Supprime les jobs terminés depuis plus de `max_age` secondes
+        (défaut: `retention`); retourne leur nombre. Les pages libérées
+        sont réutilisées par les jobs suivants."""
+        max_age = self.retention if max_age is None else max_age
+        if max_age is None:
+            return 0
+        with self._connect() as con:
+            cur = con.execute(
+                f"DELETE FROM jobs WHERE state IN ({', '.join('?' * len(FINAL))})"
+                " AND finished < ?", (*FINAL, time.time() - max_age))
+            return cur.rowcount
+
+    def jobs(self, owner=None):
+        """Tableau des jobs (sans données ni résultats)"""
+        query = ("SELECT id, owner, backend, state, time_limit, submitted,"
+                 " started, finished, worker FROM jobs")
+        with self._connect() as con:
+            rows = (con.execute(query + " WHERE owner = ? ORDER BY id", (owner,))
+                    if owner is not None
+                    else con.execute(query + " ORDER BY id")).fetchall()
+        return pd.DataFrame([dict(r) for r in rows])
+
+    # ------------------------------------------------------------------
+    # Côté workers
+    # ------------------------------------------------------------------
+    def claim(self, worker):
+        """Attribue au worker le prochain job (ordre équitable), ou None"""
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            row = con.execute(NEXT_JOB).fetchone()
+            if row is None:
+                con.execute("COMMIT")
+                return None
+            con.execute("UPDATE jobs SET state = ?, started = ?, worker = ?"
+                        " WHERE id = ?", (RUNNING, time.time(), worker,
+                                          row['id']))
+            job = dict(con.execute(
+                "SELECT id, backend, settings, data, data_path, time_limit"
+                " FROM jobs WHERE id = ?", (row['id'],)).fetchone())
+            con.execute("COMMIT")
+        job['settings'] = pickle.loads(job['settings'])
+        job['data'] = pickle.loads(job['data']) if job['data'] else None
+        return job
+
+    def report(self, job_id, progress):
+        """Enregistre la progression; retourne la demande en attente
+        ('accepter', 'annuler' ou None)"""
+        with self._connect() as con:
+            con.execute("UPDATE jobs SET progress = ? WHERE id = ?",
+                        (json.dumps(progress), job_id))
+            row = con.execute("SELECT request FROM jobs WHERE id = ?",
+                              (job_id,)).fetchone()
+        return row['request'] if row else None
+
+    def finish(self, job_id, state, result=None, error=None):
+        with self._connect() as con:
+            con.execute(
+                "UPDATE jobs SET state = ?, finished = ?, result = ?, error = ?,"
+                " data = NULL WHERE id = ? AND state = ?",
+                (state, time.time(),
+                 None if result is None else pickle.dumps(result),
+                 error, job_id, RUNNING))
+
+    def requeue(self, workers):
+        """Remet en file les jobs en cours des workers arrêtés"""
+        with self._connect() as con:
+            con.executemany(
+                "UPDATE jobs SET state = ?, started = NULL, worker = NULL,"
+                " progress = NULL, request = NULL WHERE state = ? AND worker = ?",
+                [(WAITING, RUNNING, w) for w in workers])
+
+    def running(self):
+        with self._connect() as con:
+            return [dict(r) for r in con.execute(
+                "SELECT id, worker, started, time_limit FROM jobs"
+                " WHERE state = ?", (RUNNING,)).fetchall()]
+
+
+class _Closing:
+    """Connexion SQLite fermée en sortie de bloc `with`"""
+
+    def __init__(self, con):
+        self.con = con
+
+    def __enter__(self):
+        return self.con
+
+    def __exit__(self, *exc):
+        self.con.close()
+
+# =====================================================
+# 2. Workers (processus) et supervision
+# =====================================================
+
+
+def run_job(queue, job, report_every=1.0):
+    """Construit, résout et analyse un job réclamé par un worker; le
+    résultat porte la trace des étapes (tracing.Tracer.to_dict)"""
+    from cache import MODEL_CACHE
+    from improvedmodel import analyze_results, build_model
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import build_model_matrix
+    from solution import extract_solution
+    from solver import MATRIX_BACKENDS, solve_model
+
+    builder = (build_model_matrix if job['backend'] in MATRIX_BACKENDS
+               else build_model)
+    request = [None]
+    last = [0.0]
+
+    def monitor(info):
+        now = time.perf_counter()
+        if now - last[0] >= report_every:
+            last[0] = now
+            request[0] = queue.report(job['id'], info)
+        return request[0] is not None
+
+    tracer = Tracer()
+    with tracer:
+        data = job['data']
+        if data is None:
+            with span("lecture"):
+                data = load_and_validate_data(path=job['data_path'])
+        with MODEL_CACHE.checkout(data, traced(builder)) as m:
+            queue.report(job['id'], {'phase': 'résolution', 'elapsed': 0.0})
+            results, timings = solve_model(
+                m, backend=job['backend'], time_limit=job['time_limit'],
+                mip_gap=job['settings']['mip_gap'],
+                start=job['settings']['start'], monitor=monitor)
+            if request[0] == 'annuler':
+                return 'annulé', None
+            termination = str(results.solver.termination_condition)
+            with span("analyse"):
+                analysis = analyze_results(m, results)
+            if analysis is not None:
+                with span("extraction"):
+                    solution = extract_solution(m)
+    trace = tracer.to_dict(backend=job['backend'], worker=os.getpid())
+    if analysis is None:
+        return 'sans solution', {'termination': termination,
+                                 'timings': timings, 'trace': trace}
+    return 'terminé', {'analysis': analysis, 'solution': solution,
+                       'timings': timings, 'termination': termination,
+                       'trace': trace}
+
+
+def worker_loop(path, poll=0.5):
+    """Boucle d'un processus de calcul: réclame un job, le traite,
+    recommence; s'arrête si le processus qui l'a lancé disparaît"""
+    queue = JobQueue(path)
+    worker, parent = os.getpid(), os.getppid()
+    while os.getppid() == parent:
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll)
+            continue
+        try:
+            state, result = run_job(queue, job)
+            queue.finish(job['id'], state, result)
+        except Exception as e:
+            queue.finish(job['id'], 'erreur', error=f"{type(e).__name__}: {e}")
+
+
+class WorkerPool:
+    """`n_workers` processus de calcul alimentés par une JobQueue.
+
+    Chaque worker est un interpréteur Python indépendant
+    (`python jobqueue.py worker <base>`) qui ne partage que la base SQLite:
+    ni fork d'un serveur Streamlit multi-thread, ni réimport du script de
+    l'application, et une résolution GLPK bloquée n'affecte que son
+    processus.
+
+    Un thread de supervision arrête (et remplace) le worker d'un job qui
+    dépasse sa limite de temps de plus de `grace` secondes (backends sans
+    limite interne, construction trop longue...) et marque ce job
+    'expiré'; un worker mort en cours de job est remplacé et son job
+    marqué 'erreur'. `stop()` remet en file les jobs interrompus.
+    """
+
+    def __init__(self, queue, n_workers=None, grace=30.0):
+        self.queue = queue
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.grace = grace
+        self._procs = {}
+        self._stop = threading.Event()
+        self._supervisor = None
+
+    def _spawn(self, slot):
+        here = os.path.dirname(os.path.abspath(__file__))
+        self._procs[slot] = subprocess.Popen(
+            [sys.executable, os.path.join(here, "jobqueue.py"), "worker",
+             self.queue.path], cwd=here)
+
+    def start(self):
+        for slot in range(self.n_workers):
+            self._spawn(slot)
+        self._supervisor = threading.Thread(target=self._supervise,
+                                            daemon=True)
+        self._supervisor.start()
+        return self
+
+    def _kill(self, proc):
+        proc.terminate()
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+    def _supervise(self, every=1.0):
+        while not self._stop.wait(every):
+            jobs = {j['worker']: j for j in self.queue.running()}
+            now = time.time()
+            for slot, proc in list(self._procs.items()):
+                job = jobs.get(proc.pid)
+                if proc.poll() is not None:
+                    if job is not None:
+                        self.queue.finish(job['id'], 'erreur',
+                                          error="Processus de calcul arrêté")
+                    self._spawn(slot)
+                elif (job is not None and job['time_limit']
+                      and now - job['started'] > job['time_limit'] + self.grace):
+                    self._kill(proc)
+                    self.queue.finish(
+                        job['id'], 'expiré',
+                        error=f"Limite de {job['time_limit']:.0f} s dépassée")
+                    self._spawn(slot)
+
+    def stop(self):
+        self._stop.set()
+        if self._supervisor is not None:
+            self._supervisor.join()
+        pids = [proc.pid for proc in self._procs.values()]
+        for proc in self._procs.values():
+            self._kill(proc)
+        self.queue.requeue(pids)
+
+# =====================================================
+# 3. Job en file vu comme un SolveJob (application)
+# =====================================================
+
+
+class QueuedJob:
+    """Vue d'un job de la file avec l'interface de background.SolveJob
+    (state, done, latest, elapsed, accept, cancel, result, error), pour
+    que l'application affiche indifféremment l'un ou l'autre"""
+
+    def __init__(self, queue, job_id, backend):
+        self.queue = queue
+        self.id = job_id
+        self.backend = backend
+        self.request = None
+        self._info = queue.status(job_id)
+
+    def _refresh(self):
+        info = self.queue.status(self.id)
+        if info is None:
+            # Job supprimé de la file (voir JobQueue.purge)
+            info = dict(self._info, state='expiré', position=None,
+                        error="Job supprimé de la file")
+        self._info = info
+        return self._info
+
+    @property
+    def state(self):
+        return self._refresh()['state']
+
+    @property
+    def done(self):
+        return self.state in FINAL
+
+    @property
+    def position(self):
+        return self._info['position']
+
+    @property
+    def latest(self):
+        return self._info['progress']
+
+    @property
+    def elapsed(self):
+        info = self._info
+        if info['started'] is None:
+            return 0.0
+        return (info['finished'] or time.time()) - info['started']
+
+    @property
+    def interruptible(self):
+        return self.backend in MONITORED
+
+    @property
+    def result(self):
+        return self.queue.result(self.id)
+
+    @property
+    def error(self):
+        return self._info['error']
+
+    def accept(self):
+        self.request = 'accepter'
+        self.queue.accept(self.id)
+
+    def cancel(self):
+        self.request = 'annuler'
+        self.queue.cancel(self.id)
+
+
+def submit_solve(queue, data, backend, owner="local", **options):
+    """Soumet une résolution et retourne sa vue QueuedJob"""
+    return QueuedJob(queue, queue.submit(data, backend, owner=owner,
+                                         **options), backend)
+
+# =====================================================
+# 4. Démonstration: équité et limites de temps
+# =====================================================
+
+
+def demo_queue(data, n_workers=1, jobs_per_owner=2, backend="glpk_capi"):
+    """Deux planificateurs soumettent chacun plusieurs résolutions (A d'abord
+    en bloc, puis B); l'ordre de service alterne entre eux. Un dernier job
+    sur le réseau complet, avec une limite de 1 s (construction comprise),
+    est arrêté par le superviseur."""
+    import tempfile
+    from matrixmodel import subset_instance
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = JobQueue(os.path.join(tmp, "jobs.sqlite"))
+        for owner in ('A', 'B'):
+            for k in range(jobs_per_owner):
+                queue.submit(subset_instance(data, n_clients=15 + 5 * k,
+                                             n_months=3),
+                             backend, owner=owner, time_limit=120)
+        queue.submit(data, backend, owner='C', time_limit=1)
+
+        pool = WorkerPool(queue, n_workers=n_workers, grace=0.5).start()
+        t0 = time.perf_counter()
+        while not queue.jobs()['state'].isin(FINAL).all():
+            time.sleep(0.5)
+        total = time.perf_counter() - t0
+        pool.stop()
+
+        table = queue.jobs()
+        t_first = table['submitted'].min()
+        table['attente (s)'] = table['started'] - table['submitted']
+        table['durée (s)'] = table['finished'] - table['started']
+        table['ordre de service'] = table['started'].rank().astype(int)
+        table['coût'] = [(queue.result(i) or {}).get('analysis', {})
+                         .get('total_cost') for i in table['id']]
+        table = table[['id', 'owner', 'state', 'ordre de service',
+                       'attente (s)', 'durée (s)', 'coût']]
+
+    print(f"\n⏱️  FILE DE JOBS ({n_workers} worker(s), {total:.1f} s au total, "
+          f"débit {len(table) / total * 60:.1f} jobs/min)")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    return table
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["worker"]:
+        worker_loop(sys.argv[2])
+        sys.exit()
+
+    from improvedmodel import load_and_validate_data
+
+    demo_queue(load_and_validate_data(path="Data/"),
+               n_workers=os.cpu_count() or 1)
@@ -0,0 +1,290 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import glpk_capi
+from benders import subproblem_matrices
+
+# =====================================================
+# 1. Sous-problèmes par produit
+# =====================================================
+
+
+def product_matrices(mat):
+    """Forme matricielle de chaque produit pris isolément, extraite de `mat`.
+
+    Chaque sous-problème garde les colonnes yD/yW (fixées à la résolution)
+    et ses propres lignes CAPD/CAPW: les flux d'un seul produit contre toute
+    la capacité restent une contrainte valide qui borne le sous-problème,
+    seule la somme sur les produits est relâchée.
+    """
+    ix, rx = mat['var_index'], mat['con_index']
+    mats = []
+    for k in range(len(mat['sets']['P'])):
+        blocks = {name: (idx if name in ('yD', 'yW') else idx[k:k + 1])
+                  for name, idx in ix.items()}
+        cols = np.concatenate([b.ravel() for b in blocks.values()])
+        row_blocks = {name: (idx if name in ('CAPD', 'CAPW') else idx[k:k + 1])
+                      for name, idx in rx.items()}
+        rows = np.concatenate([b.ravel() for b in row_blocks.values()])
+
+        col_pos = np.full(mat['n_vars'], -1)
+        col_pos[cols] = np.arange(len(cols))
+        row_pos = np.full(mat['n_cons'], -1)
+        row_pos[rows] = np.arange(len(rows))
+        keep = (col_pos[mat['A_col']] >= 0) & (row_pos[mat['A_row']] >= 0)
+
+        def renumber(groups):
+            out, n = {}, 0
+            for name, idx in groups.items():
+                out[name] = n + np.arange(idx.size).reshape(idx.shape)
+                n += idx.size
+            return out
+
+        sub = {
+            'sets': dict(mat['sets'], P=[mat['sets']['P'][k]]),
+            'params': mat['params'],
+            'var_index': renumber(blocks), 'con_index': renumber(row_blocks),
+            'c': mat['c'][cols], 'col_lb': mat['col_lb'][cols],
+            'col_ub': mat['col_ub'][cols], 'integer': mat['integer'][cols],
+            'A_row': row_pos[mat['A_row'][keep]],
+            'A_col': col_pos[mat['A_col'][keep]],
+            'A_val': mat['A_val'][keep],
+            'row_lb': mat['row_lb'][rows], 'row_ub': mat['row_ub'][rows],
+            'n_vars': len(cols), 'n_cons': len(rows),
+        }
+        mats.append(subproblem_matrices(sub))
+    return mats
+
+
+# Problèmes GLPK conservés dans chaque processus (un par produit)
+_PRODUCTS = []
+_PROBLEMS = {}
+
+
+def _init_worker(mats):
+    global _PRODUCTS
+    _PRODUCTS = mats
+    _PROBLEMS.clear()
+
+
+def _solve_product(k, y, lam_D, lam_W, used_D=None, used_W=None,
+                   want_x=False):
+    """LP du produit k à sites `y` fixés, avec les coûts de transport
+    augmentés des multiplicateurs des capacités (lam_D, lam_W).
+
+    `used_D`/`used_W` retirent de la capacité ce qui est déjà consommé par
+    d'autres produits (réparation séquentielle). Retourne (statut, valeur
+    lagrangienne, utilisation des dépôts, utilisation des entrepôts, x).
+    """
+    mat = _PRODUCTS[k]
+    ix, rx = mat['var_index'], mat['con_index']
+    prob = _PROBLEMS.get(k)
+    if prob is None:
+        prob = _PROBLEMS[k] = glpk_capi.GLPKProblem(mat)
+        prob.method = glpk_capi.GLP_DUALP
+
+    sites = np.concatenate([ix['yD'], ix['yW']])
+    prob.set_col_bounds(sites, y, y)
+    q2, q3 = ix['q2'][0], ix['q3'][0]
+    lane_d = mat['params']['lanes']['LDW'][0]
+    lane_w = mat['params']['lanes']['LWC'][0]
+    prob.set_obj_coefs(q2.ravel(), (mat['c'][q2] + lam_D[lane_d]).ravel())
+    prob.set_obj_coefs(q3.ravel(), (mat['c'][q3] + lam_W[lane_w]).ravel())
+    for rows, used in ((rx['CAPD'], used_D), (rx['CAPW'], used_W)):
+        ub = np.zeros(rows.size) if used is None else -used.ravel()
+        prob.set_row_bounds(rows.ravel(), np.full(rows.size, -np.inf), ub)
+
+    status = prob.solve()
+    if status != glpk_capi.GLP_OPT:
+        return status, np.inf, None, None, None
+    x = prob.col_values()
+    return (status, prob.objective(), _by_site(x[q2], lane_d, len(lam_D)),
+            _by_site(x[q3], lane_w, len(lam_W)), x if want_x else None)
+
+
+def _by_site(flows, lane_site, n_sites):
+    """Somme des flux (liaison × période) par site d'origine"""
+    out = np.zeros((n_sites, flows.shape[1]))
+    np.add.at(out, lane_site, flows)
+    return out
+
+# =====================================================
+# 2. Relaxation lagrangienne des capacités
+# =====================================================
+
+
+def _assemble(mat, mats, xs, y):
+    """Vecteur solution complet (colonnes de `mat`) à partir des solutions
+    par produit"""
+    x = np.zeros(mat['n_vars'])
+    ix = mat['var_index']
+    x[np.concatenate([ix['yD'], ix['yW']])] = y
+    for k, (mat_k, x_k) in enumerate(zip(mats, xs)):
+        for name in ('q1', 'q2', 'q3', 'ID', 'IW'):
+            x[ix[name][k]] = x_k[mat_k['var_index'][name][0]]
+    return x
+
+
+def solve_lagrangian(mat, y, max_iter=50, tol=1e-4, workers=None,
+                     repair_every=10, time_limit=None, tee=False):
+    """Plan de flux et de stocks à sites fixés par relaxation lagrangienne
+    des capacités CAPD/CAPW.
+
+    Les sous-problèmes (un LP par produit) sont résolus en parallèle dans un
+    ProcessPoolExecutor; les multiplicateurs sont mis à jour par sous-gradient
+    (pas de Polyak). Une solution réalisable est reconstruite en résolvant
+    les produits l'un après l'autre sur la capacité résiduelle, avec les
+    coûts augmentés des multiplicateurs courants.
+
+    `y` contient les valeurs de yD puis yW. Retourne un dictionnaire: borne
+    inférieure, coût de la meilleure solution réalisable `x` (colonnes de
+    `mat`), historique et temps par étape.
+    """
+    prm = mat['params']
+    nD = len(prm['capD'])
+    y = np.asarray(y, dtype=float)
+    cap_D = (prm['capD'] * y[:nD])[:, None]
+    cap_W = (prm['capW'] * y[nD:])[:, None]
+    fixed = mat['c'][:len(y)] @ y
+
+    t0 = time.perf_counter()
+    mats = product_matrices(mat)
+    n_products = len(mats)
+    workers = workers or min(n_products, os.cpu_count() or 1)
+    lam_D = np.zeros((nD, len(mat['sets']['T'])))
+    lam_W = np.zeros((len(y) - nD, len(mat['sets']['T'])))
+    lower, upper, best_x = -np.inf, np.inf, None
+    best_lam = (lam_D, lam_W)
+    history = []
+    timings = {'preparation': time.perf_counter() - t0,
+               'sous-problèmes': 0.0, 'reparation': 0.0}
+    _init_worker(mats)
+
+    def repair():
+        """Produits traités par demande décroissante sur la capacité
+        restante"""
+        used_D, used_W = np.zeros_like(lam_D), np.zeros_like(lam_W)
+        xs = [None] * n_products
+        order = np.argsort(-prm['dem'].sum(axis=(1, 2)))
+        for k in order.tolist():
+            status, _, uD, uW, x_k = _solve_product(
+                k, y, lam_D, lam_W, used_D, used_W, want_x=True)
+            if status != glpk_capi.GLP_OPT:
+                return None
+            used_D += uD
+            used_W += uW
+            xs[k] = x_k
+        return _assemble(mat, mats, xs, y)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(mats,)) as pool:
+        step, stall = 1.0, 0
+        for it in range(1, max_iter + 1):
+            t1 = time.perf_counter()
+            out = list(pool.map(_solve_product, range(n_products),
+                                [y] * n_products, [lam_D] * n_products,
+                                [lam_W] * n_products))
+            timings['sous-problèmes'] += time.perf_counter() - t1
+            if any(o[0] != glpk_capi.GLP_OPT for o in out):
+                raise ValueError("Sous-problème infaisable: la configuration "
+                                 "de sites ne couvre pas la demande d'un "
+                                 "produit")
+
+            g_D = sum(o[2] for o in out) - cap_D
+            g_W = sum(o[3] for o in out) - cap_W
+            value = (fixed + sum(o[1] for o in out)
+                     - (lam_D * cap_D).sum() - (lam_W * cap_W).sum())
+            if value > lower:
+                lower, best_lam, stall = value, (lam_D, lam_W), 0
+            else:
+                stall += 1
+
+            last = it == max_iter or (
+                time_limit and time.perf_counter() - t0 > time_limit)
+            if it == 1 or it % repair_every == 0 or last:
+                t2 = time.perf_counter()
+                x = repair()
+                timings['reparation'] += time.perf_counter() - t2
+                if x is not None and mat['c'] @ x < upper:
+                    upper, best_x = mat['c'] @ x, x
+
+            gap = (upper - lower) / max(abs(upper), 1.0)
+            history.append({'iteration': it, 'borne inf': lower,
+                            'borne sup': upper, 'ecart': gap})
+            if tee:
+                print(f"   it {it:>3}  inf {lower:>14.2f}  "
+                      f"sup {upper:>14.2f}  écart {gap:>9.2e}")
+            # Relâchement complémentaire: plus de violation ni de prix inutile
+            norm = (np.maximum(g_D, -lam_D) ** 2).sum() \
+                + (np.maximum(g_W, -lam_W) ** 2).sum()
+            if gap <= tol or norm < 1e-12 or last:
+                break
+
+            # Pas de Polyak vers la meilleure solution réalisable connue;
+            # sans progrès, le pas est divisé par deux et l'on repart des
+            # meilleurs multiplicateurs
+            if stall >= 3:
+                step, stall = step / 2, 0
+                lam_D, lam_W = best_lam
+                continue
+            target = upper if np.isfinite(upper) else 1.05 * abs(value)
+            t = step * (target - value) / max(norm, 1e-12)
+            lam_D = np.maximum(0.0, lam_D + t * g_D)
+            lam_W = np.maximum(0.0, lam_W + t * g_W)
+
+    _PROBLEMS.clear()
+    timings['total'] = time.perf_counter() - t0
+    return {
+        'lower_bound': lower, 'objective': upper, 'x': best_x,
+        'gap': (upper - lower) / max(abs(upper), 1.0),
+        'iterations': len(history), 'history': history, 'workers': workers,
+        'timings': timings,
+    }
+
+# =====================================================
+# 3. Comparaison avec le LP monolithique
+# =====================================================
+
+
+def compare_lagrangian(mat, y, workers=(1, None)):
+    """Compare le LP de flux à sites fixés résolu d'un bloc et la relaxation
+    lagrangienne avec différents nombres de processus"""
+    import pandas as pd
+    from benders import Subproblem
+
+    t0 = time.perf_counter()
+    sub = Subproblem(mat)
+    feasible, val, _, _ = sub.evaluate(np.asarray(y, dtype=float))
+    sub.close()
+    rows = [{'mode': 'LP monolithique', 'processus': 1,
+             'temps (s)': time.perf_counter() - t0,
+             'borne inf': val + mat['c'][:len(y)] @ y if feasible else np.nan,
+             'coût': val + mat['c'][:len(y)] @ y if feasible else np.nan}]
+    for n in workers:
+        out = solve_lagrangian(mat, y, workers=n)
+        rows.append({'mode': 'lagrangien', 'processus': out['workers'],
+                     'temps (s)': out['timings']['total'],
+                     'borne inf': out['lower_bound'],
+                     'coût': out['objective']})
+
+    table = pd.DataFrame(rows)
+    print("\n⏱️  RELAXATION LAGRANGIENNE DES CAPACITÉS")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import compile_matrices
+    from warmstart import read_sites, site_start
+
+    mat = compile_matrices(load_and_validate_data(path="Data/"))
+    # Sites d'une exécution précédente si disponibles, sinon tous ouverts
+    y = np.ones(len(mat['var_index']['yD']) + len(mat['var_index']['yW']))
+    if os.path.exists("results/sites_depots.csv"):
+        cols, vals = site_start(mat, read_sites("results/"))
+        y[cols] = vals
+    compare_lagrangian(mat, y)
@@ -0,0 +1,501 @@
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import *
+from pyomo.common.gc_manager import PauseGC
+from pyomo.core.expr.numeric_expr import LinearExpression, MonomialTermExpression
+
+from params import array_dict, lane_array, model_sets, param_array
+from tracing import span
+
+# =====================================================
+# 1. Compilation matricielle
+# =====================================================
+
+
+# Liaisons de transport: ensemble, paramètre de coût, colonnes de la table
+# et ensembles reliés
+LANES = {
+    'LFD': ('cFD', ['factory', 'depot'], 'FD'),
+    'LDW': ('cDW', ['depot', 'warehouse'], 'DW'),
+    'LWC': ('cWC', ['warehouse', 'client'], 'WC'),
+}
+
+
+def compile_params(data):
+    """Ensembles du modèle et paramètres sous forme de tableaux NumPy denses
+    (sans construire la matrice des contraintes).
+
+    Les coûts de transport ne sont définis que sur les liaisons présentes
+    dans les tables: `S['LFD']`, `S['LDW']`, `S['LWC']` listent ces paires
+    et `prm['lanes']` donne leurs positions dans les deux ensembles reliés.
+    """
+    S = model_sets(data)
+    P, C, T, F, D, W = (S[k] for k in 'PCTFDW')
+
+    dem = param_array(data['demand'], ['product', 'client', 'month'],
+                      'demand', [P, C, T], 'dem')
+    capD = param_array(data['capD'], ['depot'], 'capacity', [D], 'capD')
+    capW = param_array(data['capW'], ['warehouse'], 'capacity', [W], 'capW')
+    FD = param_array(data['fixD'], ['depot'], 'fixed_cost', [D], 'FD')
+    FW = param_array(data['fixW'], ['warehouse'], 'fixed_cost', [W], 'FW')
+    hD = param_array(data['hold'], ['product'], 'holding_depot', [P], 'hD')
+    hW = param_array(data['hold'], ['product'], 'holding_warehouse', [P], 'hW')
+    ssD = param_array(data['ssD'], ['product'], 'safety_stock', [P], 'ssD')
+    ssW = param_array(data['ssW'], ['product'], 'safety_stock', [P], 'ssW')
+    ID0 = param_array(data['iD'], ['product'], 'initial_stock', [P], 'ID0')
+    IW0 = param_array(data['iW'], ['product'], 'initial_stock', [P], 'IW0')
+
+    prm = {
+        'dem': dem, 'capD': capD, 'capW': capW, 'FD': FD, 'FW': FW,
+        'hD': hD, 'hW': hW, 'ssD': ssD, 'ssW': ssW, 'ID0': ID0, 'IW0': IW0,
+        'lanes': {},
+    }
+    for lane, (name, keys, ends) in LANES.items():
+        ends = [S[k] for k in ends]
+        idx, prm[name] = lane_array(data[name], keys, 'cost', ends, name)
+        S[lane] = list(zip(*(np.asarray(s, dtype=object)[i].tolist()
+                             for s, i in zip(ends, idx))))
+        prm['lanes'][lane] = idx
+
+    served = np.zeros(len(C), dtype=bool)
+    served[prm['lanes']['LWC'][1]] = True
+    if (dem.sum(axis=(0, 2))[~served] > 0).any():
+        missing = [c for c, ok in zip(C, served) if not ok][:5]
+        raise ValueError(f"Clients avec demande sans liaison entrepôt->client "
+                         f"(ex: {missing})")
+    return S, prm
+
+
+def compile_matrices(data):
+    """Compile le modèle sous forme matricielle.
+
+    Retourne un dictionnaire contenant le vecteur de coûts `c`, la matrice
+    des contraintes au format COO (`A_row`, `A_col`, `A_val`), les bornes
+    des lignes et des colonnes ainsi que les positions de chaque bloc de
+    variables et de contraintes. Les flux q1, q2, q3 sont indexés par
+    (produit, liaison, période).
+    """
+    S, prm = compile_params(data)
+    nP, nC, nT, nF, nD, nW = (len(S[k]) for k in 'PCTFDW')
+    fd_d = prm['lanes']['LFD'][1]
+    dw_d, dw_w = prm['lanes']['LDW']
+    wc_w, wc_c = prm['lanes']['LWC']
+
+    # ---------------- Paramètres ----------------
+    dem, capD, capW, FD, FW = (prm[k] for k in ('dem', 'capD', 'capW', 'FD', 'FW'))
+    hD, hW, ssD, ssW, ID0, IW0 = (
+        prm[k] for k in ('hD', 'hW', 'ssD', 'ssW', 'ID0', 'IW0'))
+    cFD, cDW, cWC = prm['cFD'], prm['cDW'], prm['cWC']
+
+    # ---------------- Variables ----------------
+    var_shapes = [
+        ('yD', (nD,)), ('yW', (nW,)),
+        ('q1', (nP, len(fd_d), nT)), ('q2', (nP, len(dw_d), nT)),
+        ('q3', (nP, len(wc_w), nT)),
+        ('ID', (nP, nD, nT)), ('IW', (nP, nW, nT)),
+    ]
+    ix, n = {}, 0
+    for name, shape in var_shapes:
+        size = int(np.prod(shape))
+        ix[name] = n + np.arange(size).reshape(shape)
+        n += size
+
+    c = np.zeros(n)
+    c[ix['yD']] = FD
+    c[ix['yW']] = FW
+    c[ix['q1']] = cFD[None, :, None]
+    c[ix['q2']] = cDW[None, :, None]
+    c[ix['q3']] = cWC[None, :, None]
+    c[ix['ID']] = hD[:, None, None]
+    c[ix['IW']] = hW[:, None, None]
+
+    col_lb = np.zeros(n)
+    col_ub = np.full(n, np.inf)
+    col_ub[ix['yD']] = 1
+    col_ub[ix['yW']] = 1
+    # Stocks de sécurité (SSD, SSW) exprimés comme bornes inférieures
+    col_lb[ix['ID']] = ssD[:, None, None]
+    col_lb[ix['IW']] = ssW[:, None, None]
+    integer = np.zeros(n, dtype=bool)
+    integer[ix['yD']] = True
+    integer[ix['yW']] = True
+
+    # ---------------- Contraintes ----------------
+    con_shapes = [
+        ('DEM', (nP, nC, nT)), ('STD', (nP, nD, nT)), ('STW', (nP, nW, nT)),
+        ('CAPD', (nD, nT)), ('CAPW', (nW, nT)),
+    ]
+    rx, m_rows = {}, 0
+    for name, shape in con_shapes:
+        size = int(np.prod(shape))
+        rx[name] = m_rows + np.arange(size).reshape(shape)
+        m_rows += size
+
+    rows, cols, vals = [], [], []
+
+    def add(r, j, v):
+        r, j = np.broadcast_arrays(r, j)
+        rows.append(r.ravel())
+        cols.append(j.ravel())
+        vals.append(np.broadcast_to(v, r.shape).ravel().astype(float))
+
+    # Satisfaction de la demande
+    add(rx['DEM'][:, wc_c, :], ix['q3'], 1.0)
+
+    # Équilibre stocks dépôts
+    add(rx['STD'], ix['ID'], 1.0)
+    add(rx['STD'][:, :, 1:], ix['ID'][:, :, :-1], -1.0)
+    add(rx['STD'][:, fd_d, :], ix['q1'], -1.0)
+    add(rx['STD'][:, dw_d, :], ix['q2'], 1.0)
+
+    # Équilibre stocks entrepôts
+    add(rx['STW'], ix['IW'], 1.0)
+    add(rx['STW'][:, :, 1:], ix['IW'][:, :, :-1], -1.0)
+    add(rx['STW'][:, dw_w, :], ix['q2'], -1.0)
+    add(rx['STW'][:, wc_w, :], ix['q3'], 1.0)
+
+    # Capacités
+    add(rx['CAPD'][None, dw_d, :], ix['q2'], 1.0)
+    add(rx['CAPD'], ix['yD'][:, None], -capD[:, None])
+    add(rx['CAPW'][None, wc_w, :], ix['q3'], 1.0)
+    add(rx['CAPW'], ix['yW'][:, None], -capW[:, None])
+
+    row_lb = np.zeros(m_rows)
+    row_ub = np.zeros(m_rows)
+    row_lb[rx['DEM']] = dem
+    row_ub[rx['DEM']] = dem
+    row_lb[rx['STD'][:, :, 0]] = ID0[:, None]
+    row_ub[rx['STD'][:, :, 0]] = ID0[:, None]
+    row_lb[rx['STW'][:, :, 0]] = IW0[:, None]
+    row_ub[rx['STW'][:, :, 0]] = IW0[:, None]
+    row_lb[rx['CAPD']] = -np.inf
+    row_lb[rx['CAPW']] = -np.inf
+
+    return {
+        'sets': S,
+        'params': prm,
+        'var_index': ix, 'con_index': rx,
+        'c': c, 'col_lb': col_lb, 'col_ub': col_ub, 'integer': integer,
+        'A_row': np.concatenate(rows), 'A_col': np.concatenate(cols),
+        'A_val': np.concatenate(vals),
+        'row_lb': row_lb, 'row_ub': row_ub,
+        'n_vars': n, 'n_cons': m_rows,
+    }
+
+
+def to_csr(mat):
+    """Convertit la matrice COO compilée en CSR (indptr, indices, data)"""
+    order = np.lexsort((mat['A_col'], mat['A_row']))
+    indptr = np.zeros(mat['n_cons'] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(mat['A_row'], minlength=mat['n_cons']),
+              out=indptr[1:])
+    return indptr, mat['A_col'][order], mat['A_val'][order]
+
+# =====================================================
+# 2. Construction du modèle Pyomo à partir des matrices
+# =====================================================
+
+
+PARAM_SETS = {
+    'dem': 'PCT', 'capD': 'D', 'capW': 'W', 'FD': 'D', 'FW': 'W',
+    'hD': 'P', 'hW': 'P', 'cFD': ('LFD',), 'cDW': ('LDW',), 'cWC': ('LWC',),
+    'ssD': 'P', 'ssW': 'P', 'ID0': 'P', 'IW0': 'P',
+}
+CON_SETS = {'DEM': 'PCT', 'STD': 'PDT', 'STW': 'PWT', 'CAPD': 'DT',
+            'CAPW': 'WT'}
+
+
+def variable_list(m, mat):
+    """Variables du modèle dans l'ordre des colonnes de la matrice"""
+    vlist = []
+    for name in mat['var_index']:
+        vlist.extend(getattr(m, name).values())
+    return vlist
+
+
+def _objective_expr(mat, vlist):
+    nz = np.flatnonzero(mat['c'])
+    return LinearExpression(
+        constant=0, linear_coefs=mat['c'][nz].tolist(),
+        linear_vars=[vlist[j] for j in nz])
+
+
+def _row_expr(mat, csr, vlist, i):
+    """Expression Pyomo de la ligne i (csr: indptr, indices, coefs en listes)"""
+    indptr, indices, coefs = csr
+    s, e = indptr[i], indptr[i + 1]
+    body = LinearExpression([
+        vlist[j] if a == 1 else MonomialTermExpression((a, vlist[j]))
+        for a, j in zip(coefs[s:e], indices[s:e])])
+    ub = float(mat['row_ub'][i])
+    if mat['row_lb'][i] == ub:
+        return body == ub
+    return body <= ub
+
+
+def model_from_matrices(mat):
+    """Crée le ConcreteModel (mêmes composants que build_model) à partir de
+    la forme matricielle compilée"""
+    S, prm = mat['sets'], mat['params']
+    m = ConcreteModel(name="Supply_Chain_Network")
+
+    # ---------------- Sets ----------------
+    m.P = Set(initialize=S['P'], doc="Produits")
+    m.C = Set(initialize=S['C'], doc="Clients")
+    m.T = Set(initialize=S['T'], doc="Périodes")
+    m.F = Set(initialize=S['F'], doc="Usines")
+    m.D = Set(initialize=S['D'], doc="Dépôts")
+    m.W = Set(initialize=S['W'], doc="Entrepôts")
+    m.LFD = Set(dimen=2, initialize=S['LFD'], ordered=True,
+                doc="Liaisons usine->dépôt")
+    m.LDW = Set(dimen=2, initialize=S['LDW'], ordered=True,
+                doc="Liaisons dépôt->entrepôt")
+    m.LWC = Set(dimen=2, initialize=S['LWC'], ordered=True,
+                doc="Liaisons entrepôt->client")
+
+    # ---------------- Parameters ----------------
+    # Paramètres mutables pour permettre les mises à jour incrémentales
+    for name, letters in PARAM_SETS.items():
+        sets = [getattr(m, k) for k in letters]
+        m.add_component(name, Param(*sets, mutable=True, initialize=array_dict(
+            prm[name], *(S[k] for k in letters))))
+
+    # ---------------- Variables ----------------
+    m.yD = Var(m.D, within=Binary, doc="Ouverture dépôt")
+    m.yW = Var(m.W, within=Binary, doc="Ouverture entrepôt")
+    m.q1 = Var(m.P, m.LFD, m.T, within=NonNegativeReals,
+               doc="Flux usine->dépôt")
+    m.q2 = Var(m.P, m.LDW, m.T, within=NonNegativeReals,
+               doc="Flux dépôt->entrepôt")
+    m.q3 = Var(m.P, m.LWC, m.T, within=NonNegativeReals,
+               doc="Flux entrepôt->client")
+    m.ID = Var(m.P, m.D, m.T, within=NonNegativeReals, doc="Stock dépôt")
+    m.IW = Var(m.P, m.W, m.T, within=NonNegativeReals, doc="Stock entrepôt")
+
+    vlist = variable_list(m, mat)
+    for j in np.flatnonzero(mat['col_lb'] > 0):
+        vlist[j].setlb(float(mat['col_lb'][j]))
+    # Sites fixés fermés (presolve)
+    for j in np.flatnonzero(mat['integer'] & (mat['col_ub'] < 1)):
+        vlist[j].setub(float(mat['col_ub'][j]))
+
+    # ---------------- Objectif ----------------
+    m.OBJ = Objective(expr=_objective_expr(mat, vlist), sense=minimize)
+
+    # ---------------- Contraintes ----------------
+    csr = [a.tolist() for a in to_csr(mat)]
+    for name, rows in mat['con_index'].items():
+        sets = [getattr(m, k) for k in CON_SETS[name]]
+        rows = dict(zip(itertools.product(*sets), rows.ravel().tolist()))
+        m.add_component(name, Constraint(
+            *sets, rule=lambda m, *key, rows=rows: _row_expr(mat, csr, vlist, rows[key])))
+
+    m.matrix_form = mat
+    return m
+
+
+def apply_fixings(mat, fixings):
+    """Fixe les colonnes yD/yW aux valeurs de `fixings` (format de
+    read_sites, par exemple les sites déterminés par le presolve)"""
+    from warmstart import site_start
+    cols, vals = site_start(mat, fixings)
+    mat['col_lb'][cols] = vals
+    mat['col_ub'][cols] = vals
+    return mat
+
+
+def build_model_matrix(data, fixings=None):
+    """Construit le modèle Pyomo à partir des vecteurs de coûts et de la
+    matrice creuse des contraintes (même modèle que build_model).
+
+    `fixings` fixe des ouvertures de sites (voir presolve.site_fixings).
+    """
+    with span("compilation matricielle"):
+        mat = compile_matrices(data)
+        if fixings:
+            apply_fixings(mat, fixings)
+    # Le ramasse-miettes est suspendu pendant la création des expressions
+    with span("modèle Pyomo") as s, PauseGC():
+        m = s.model = model_from_matrices(mat)
+
+    print(
+        f"\n✓ Modèle matriciel construit: {len(m.P)} produits, {len(m.C)} clients, "
+        f"{len(m.T)} périodes ({mat['n_vars']} variables, {mat['n_cons']} contraintes, "
+        f"{len(mat['A_val'])} non-nuls)")
+
+    return m
+
+# =====================================================
+# 3. Mise à jour incrémentale
+# =====================================================
+
+
+def same_structure(old, new):
+    """Deux formes compilées ont-elles les mêmes ensembles (donc la même
+    structure de matrice) ?"""
+    return old['sets'] == new['sets']
+
+
+def diff_matrices(old, new):
+    """Positions des valeurs modifiées entre deux formes de même structure"""
+    changed = lambda a, b: np.flatnonzero(a.ravel() != b.ravel())
+    rows = np.union1d(changed(old['row_lb'], new['row_lb']),
+                      changed(old['row_ub'], new['row_ub']))
+    coefs = changed(old['A_val'], new['A_val'])
+    return {
+        'params': {name: changed(old['params'][name], new['params'][name])
+                   for name in PARAM_SETS},
+        'c': changed(old['c'], new['c']),
+        'cols': np.union1d(changed(old['col_lb'], new['col_lb']),
+                           changed(old['col_ub'], new['col_ub'])),
+        'rows': np.union1d(rows, old['A_row'][coefs]),
+        'coef_cols': np.unique(old['A_col'][coefs]),
+    }
+
+
+def update_model(m, mat, diff):
+    """Reporte dans le modèle Pyomo les valeurs modifiées d'une nouvelle forme
+    compilée de même structure (paramètres, bornes, objectif, lignes)"""
+    S = mat['sets']
+    for name, pos in diff['params'].items():
+        if not len(pos):
+            continue
+        letters = PARAM_SETS[name]
+        param = getattr(m, name)
+        shape = mat['params'][name].shape
+        for flat in pos.tolist():
+            idx = np.unravel_index(flat, shape)
+            key = tuple(S[k][i] for k, i in zip(letters, idx))
+            param[key if len(key) > 1 else key[0]] = float(
+                mat['params'][name].ravel()[flat])
+
+    vlist = variable_list(m, mat)
+    for j in diff['cols'].tolist():
+        vlist[j].setlb(float(mat['col_lb'][j]))
+        ub = float(mat['col_ub'][j])
+        vlist[j].setub(None if np.isinf(ub) else ub)
+
+    if len(diff['c']):
+        m.OBJ.set_value(_objective_expr(mat, vlist))
+
+    if len(diff['rows']):
+        csr = [a.tolist() for a in to_csr(mat)]
+        for name, rows in mat['con_index'].items():
+            con = getattr(m, name)
+            sets = [S[k] for k in CON_SETS[name]]
+            hit = np.isin(rows, diff['rows'])
+            for idx in zip(*np.nonzero(hit)):
+                key = tuple(s[i] for s, i in zip(sets, idx))
+                con[key].set_value(_row_expr(mat, csr, vlist, rows[idx]))
+
+    m.matrix_form = mat
+
+# =====================================================
+# 4. Comparaison des temps de construction
+# =====================================================
+
+
+def scale_clients(data, factor):
+    """Duplique les clients `factor` fois (demande et coûts entrepôt->client)"""
+    if factor == 1:
+        return data
+    n = data['demand']['client'].max()
+    demand, cwc = [], []
+    for k in range(factor):
+        dk = data['demand'].copy()
+        dk['client'] = dk['client'] + k * n
+        demand.append(dk)
+        ck = data['cWC'].copy()
+        ck['client'] = ck['client'] + k * n
+        cwc.append(ck)
+    scaled = dict(data)
+    scaled['demand'] = pd.concat(demand, ignore_index=True)
+    scaled['cWC'] = pd.concat(cwc, ignore_index=True)
+    return scaled
+
+
+def subset_instance(data, n_clients=None, n_months=None):
+    """Instance réduite aux `n_clients` premiers clients et `n_months`
+    premières périodes (essais rapides du MILP)"""
+    demand = data['demand']
+    clients = demand['client'].unique()[:n_clients]
+    months = demand['month'].unique()[:n_months]
+    small = dict(data)
+    small['demand'] = demand[demand['client'].isin(clients)
+                             & demand['month'].isin(months)]
+    small['cWC'] = data['cWC'][data['cWC']['client'].isin(clients)]
+    return small
+
+
+def sparse_lanes(data, density, seed=0):
+    """Garde une fraction `density` des liaisons entrepôt->client tirées au
+    hasard, plus la moins chère de chaque client (qui reste servi)"""
+    if density >= 1:
+        return data
+    cwc = data['cWC']
+    rng = np.random.default_rng(seed)
+    keep = rng.random(len(cwc)) < density
+    keep[cwc.groupby('client')['cost'].idxmin().map(cwc.index.get_loc)] = True
+    sparse = dict(data)
+    sparse['cWC'] = cwc[keep]
+    return sparse
+
+
+def compare_lane_density(data, densities=(1.0, 0.5, 0.2, 0.05)):
+    """Temps de construction et mémoire (pic tracemalloc) de build_model et
+    build_model_matrix selon la proportion de liaisons entrepôt->client"""
+    import tracemalloc
+    from improvedmodel import build_model
+
+    rows = []
+    for density in densities:
+        sparse = sparse_lanes(data, density)
+        row = {'liaisons WC': len(sparse['cWC'])}
+        for label, build in (('build_model', build_model),
+                             ('build_model_matrix', build_model_matrix)):
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            build(sparse)
+            row[f'{label} (s)'] = time.perf_counter() - t0
+            row[f'{label} (Mo)'] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        rows.append(row)
+
+    table = pd.DataFrame(rows)
+    print("\n⏱️  CONSTRUCTION SELON LE NOMBRE DE LIAISONS")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    return table
+
+
+def compare_build_times(data, factors=(1, 2, 4)):
+    """Compare build_model et build_model_matrix quand le nombre de clients croît"""
+    from improvedmodel import build_model
+
+    rows = []
+    for k in factors:
+        scaled = scale_clients(data, k)
+        t0 = time.perf_counter()
+        build_model(scaled)
+        t_loop = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        build_model_matrix(scaled)
+        t_mat = time.perf_counter() - t0
+        rows.append({'clients': scaled['demand']['client'].nunique(),
+                     'build_model (s)': t_loop,
+                     'build_model_matrix (s)': t_mat,
+                     'speedup': t_loop / t_mat})
+
+    table = pd.DataFrame(rows)
+    print("\n⏱️  TEMPS DE CONSTRUCTION DU MODÈLE")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    data = load_and_validate_data(path="Data/")
+    compare_build_times(data)
+    compare_lane_density(data)
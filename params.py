@@ -0,0 +1,130 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# =====================================================
+# 1. Ensembles du modèle
+# =====================================================
+
+
+def period_order(data):
+    """Périodes dans l'ordre chronologique: valeurs triées de la colonne
+    `month` de la demande. Les équilibres de stocks enchaînent les périodes
+    dans cet ordre, que les valeurs soient consécutives ou non (semaines,
+    mois, trimestres ou numéros de seaux de buckets.py). Les numéros sont
+    triés comme des nombres, les libellés comme du texte: ils doivent donc
+    suivre un format triable (2024-03, 2024-W05, 2024-Q1)."""
+    return sorted(data['demand']['month'].unique().tolist())
+
+
+def model_sets(data):
+    """Ensembles ordonnés du modèle, partagés par tous les constructeurs"""
+    return {
+        'P': data['demand']['product'].unique().tolist(),
+        'C': data['demand']['client'].unique().tolist(),
+        'T': period_order(data),
+        'F': data['cFD']['factory'].unique().tolist(),
+        'D': data['capD']['depot'].tolist(),
+        'W': data['capW']['warehouse'].tolist(),
+    }
+
+# =====================================================
+# 2. Ingestion colonnaire des paramètres indexés
+# =====================================================
+
+
+def _positions(df, keys, sets, name):
+    """Positions des lignes dans le produit cartésien des ensembles.
+
+    Vérifie au passage qu'il n'y a ni doublon ni clé manquante. Les lignes
+    dont une clé est hors des ensembles ont la position -1.
+    """
+    codes = [pd.Index(s).get_indexer(df[k]) for s, k in zip(sets, keys)]
+    shape = tuple(len(s) for s in sets)
+    keep = np.all([c >= 0 for c in codes], axis=0)
+    flat = np.full(len(df), -1, dtype=np.int64)
+    flat[keep] = np.ravel_multi_index([c[keep] for c in codes], shape)
+
+    count = np.bincount(flat[keep], minlength=int(np.prod(shape)))
+    if (count > 1).any():
+        dup = np.unravel_index(np.flatnonzero(count > 1)[:5], shape)
+        dup = [tuple(s[i] for s, i in zip(sets, idx)) for idx in zip(*dup)]
+        raise ValueError(f"Paramètre {name}: clés en double (ex: {dup})")
+    if (count == 0).any():
+        missing = np.unravel_index(np.flatnonzero(count == 0)[:5], shape)
+        missing = [tuple(s[i] for s, i in zip(sets, idx))
+                   for idx in zip(*missing)]
+        raise ValueError(
+            f"Paramètre {name}: {int((count == 0).sum())} clés manquantes "
+            f"(ex: {missing})")
+    return flat
+
+
+def param_dict(df, keys, value, sets=None, name=""):
+    """Construit le dictionnaire {clé: valeur} d'un Param Pyomo directement
+    à partir des colonnes de la table (sans itération ligne par ligne).
+
+    Si `sets` est fourni, les clés sont validées: pas de doublon, aucune clé
+    manquante par rapport au produit cartésien des ensembles, et les lignes
+    hors des ensembles sont ignorées.
+    """
+    if sets is not None:
+        arr = param_array(df, keys, value, sets, name)
+        return array_dict(arr, *sets)
+
+    vals = df[value].to_numpy().tolist()
+    if len(keys) == 1:
+        return dict(zip(df[keys[0]].to_numpy().tolist(), vals))
+    cols = [df[k].to_numpy().tolist() for k in keys]
+    return dict(zip(zip(*cols), vals))
+
+
+def param_array(df, keys, value, sets, name=""):
+    """Tableau NumPy dense d'un paramètre indexé par `sets` (même validation
+    que param_dict)"""
+    flat = _positions(df, keys, sets, name or value)
+    keep = flat >= 0
+    arr = np.empty(tuple(len(s) for s in sets))
+    arr.ravel()[flat[keep]] = df[value].to_numpy(float)[keep]
+    return arr
+
+
+def lane_array(df, keys, value, sets, name=""):
+    """Liaisons (lanes) présentes dans la table et leurs valeurs.
+
+    Contrairement à param_array, une clé absente n'est pas une erreur: la
+    liaison n'existe pas. Les doublons restent interdits et les lignes hors
+    des ensembles sont ignorées. Retourne (positions dans chaque ensemble,
+    valeurs), triées dans l'ordre du produit cartésien des ensembles.
+    """
+    codes = [pd.Index(s).get_indexer(df[k]) for s, k in zip(sets, keys)]
+    shape = tuple(len(s) for s in sets)
+    keep = np.all([c >= 0 for c in codes], axis=0)
+    flat = np.ravel_multi_index([c[keep] for c in codes], shape)
+    order = np.argsort(flat, kind="stable")
+    flat = flat[order]
+
+    dup = np.flatnonzero(flat[1:] == flat[:-1])
+    if len(dup):
+        dup = np.unravel_index(flat[dup[:5]], shape)
+        dup = [tuple(s[i] for s, i in zip(sets, idx)) for idx in zip(*dup)]
+        raise ValueError(f"Paramètre {name or value}: clés en double (ex: {dup})")
+    values = df[value].to_numpy(float)[keep][order]
+    return np.unravel_index(flat, shape), values
+
+
+def lane_dict(df, keys, value, sets, name=""):
+    """Dictionnaire {liaison: valeur} des seules liaisons présentes dans la
+    table, dans l'ordre du produit cartésien (même validation que
+    lane_array)"""
+    idx, values = lane_array(df, keys, value, sets, name)
+    labels = [np.asarray(s, dtype=object)[i].tolist() for s, i in zip(sets, idx)]
+    return dict(zip(zip(*labels), values.tolist()))
+
+
+def array_dict(arr, *sets):
+    """Dictionnaire {clé: valeur} à partir d'un tableau dense indexé par `sets`"""
+    if len(sets) == 1:
+        return dict(zip(sets[0], arr.tolist()))
+    return dict(zip(itertools.product(*sets), arr.ravel().tolist()))
@@ -0,0 +1,292 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from matrixmodel import compile_matrices, compile_params
+
+# =====================================================
+# 1. Réductions exactes
+# =====================================================
+
+
+def site_fixings(data):
+    """Ouvertures de sites déterminées par les données seules.
+
+    - fermé: capacité nulle, ou aucune liaison sortante vers un client avec
+      demande (entrepôt) ou vers un entrepôt (dépôt), à coût fixe positif;
+    - ouvert: sans ce site, la capacité restante ne couvre pas la demande
+      d'une période (entrepôts) ou la demande cumulée diminuée du stock
+      initial disponible des entrepôts (dépôts).
+
+    Retourne les valeurs fixées au format de read_sites (sites non
+    déterminés absents).
+    """
+    S, prm = compile_params(data)
+    dem_t = prm['dem'].sum(axis=(0, 1))
+    cum_t = np.cumsum(dem_t)
+    periods = np.arange(1, len(dem_t) + 1)
+    spare_W = np.maximum(prm['IW0'] - prm['ssW'], 0).sum() * len(S['W'])
+
+    wc_w, wc_c = prm['lanes']['LWC']
+    demanded = prm['dem'].sum(axis=(0, 2)) > 0
+    has_client = np.zeros(len(S['W']), dtype=bool)
+    has_client[wc_w[demanded[wc_c]]] = True
+    has_warehouse = np.zeros(len(S['D']), dtype=bool)
+    has_warehouse[prm['lanes']['LDW'][0]] = True
+
+    fixed = {'yD': {}, 'yW': {}}
+    for k, w in enumerate(S['W']):
+        if (prm['capW'][k] <= 0 or not has_client[k]) and prm['FW'][k] >= 0:
+            fixed['yW'][w] = 0
+        elif prm['capW'].sum() - prm['capW'][k] < dem_t.max():
+            fixed['yW'][w] = 1
+    for k, d in enumerate(S['D']):
+        if (prm['capD'][k] <= 0 or not has_warehouse[k]) and prm['FD'][k] >= 0:
+            fixed['yD'][d] = 0
+        elif ((prm['capD'].sum() - prm['capD'][k]) * periods + spare_W
+              < cum_t).any():
+            fixed['yD'][d] = 1
+    return fixed
+
+
+def dominated_lanes(data, fixed):
+    """Tables de transport sans les liaisons dominées:
+
+    - usine->dépôt: les usines n'ont pas de capacité, seule l'usine la moins
+      chère de chaque dépôt est utile;
+    - liaisons depuis un site fixé fermé (un dépôt fermé n'expédie rien);
+    - liaisons vers un site fixé fermé, sauf si son stock initial est sous
+      le stock de sécurité: le plancher s'applique aussi aux sites fermés,
+      qu'il faut alors approvisionner.
+    """
+    _, prm = compile_params(data)
+    closed_D = [d for d, v in fixed['yD'].items() if v == 0]
+    closed_W = [w for w, v in fixed['yW'].items() if v == 0]
+    into_D = [] if (prm['ID0'] < prm['ssD']).any() else closed_D
+    into_W = [] if (prm['IW0'] < prm['ssW']).any() else closed_W
+
+    cFD = data['cFD'][~data['cFD']['depot'].isin(into_D)]
+    cFD = cFD.loc[cFD.groupby('depot', sort=False)['cost'].idxmin()]
+    cDW = data['cDW'][~data['cDW']['depot'].isin(closed_D)
+                      & ~data['cDW']['warehouse'].isin(into_W)]
+    cWC = data['cWC'][~data['cWC']['warehouse'].isin(closed_W)]
+    return cFD, cDW, cWC
+
+
+def idle_clients(data):
+    """Clients sans aucune demande: leurs lignes et liaisons sont inutiles"""
+    total = data['demand'].groupby('client', sort=False)['demand'].sum()
+    return total.index[total <= 0].tolist()
+
+# =====================================================
+# 2. Sites fixés par borne (borne inférieure contre solution connue)
+# =====================================================
+
+
+def _min_cover(fixed, cap, need, max_size=100_000):
+    """Coût fixe minimal d'un ensemble de sites de capacité totale >= need
+    (sac à dos en nombres entiers, programmation dynamique sur la capacité).
+
+    Les quantités sont comptées en unités de `unit` >= 1, choisie pour que
+    le tableau ait au plus `max_size` cases. Capacités arrondies au-dessus
+    et besoin au-dessous: le résultat reste une borne inférieure.
+    """
+    need = max(need, 0)
+    unit = max(1.0, need / max_size)
+    need = int(np.floor(need / unit))
+    best = np.full(need + 1, np.inf)
+    best[0] = 0.0
+    steps = np.arange(need + 1)
+    for f, c in zip(fixed, np.ceil(np.asarray(cap) / unit).astype(int)):
+        best = np.minimum(best, best[np.maximum(steps - c, 0)] + f)
+    return best[need]
+
+
+def bound_fixings(data, upper, fixed=None):
+    """Sites fixés par comparaison de bornes.
+
+    Toute solution coûte au moins: transport minimal de chaque client
+    (sans capacités), stocks de sécurité sur tous les sites, et coût fixe
+    minimal des dépôts et entrepôts couvrant la demande. Si cette borne,
+    calculée avec un site forcé ouvert (resp. fermé), dépasse le coût
+    `upper` d'une solution réalisable connue, le site est fermé (resp.
+    ouvert) dans toute solution optimale.
+    """
+    from heuristic import dense_costs, path_costs
+
+    S, prm = compile_params(data)
+    costs = dense_costs(S, prm)
+    fixed = {'yD': dict(fixed['yD']), 'yW': dict(fixed['yW'])} if fixed \
+        else {'yD': {}, 'yW': {}}
+    nT = len(S['T'])
+
+    # Transport: chemin le moins cher de chaque client, moins ce que le
+    # stock initial disponible peut éviter en amont
+    demand = prm['dem'].sum(axis=(0, 2))
+    up = path_costs(costs).min(axis=0)
+    served = demand > 0
+    path = (costs['cWC'] + up[:, None]).min(axis=0)
+    spare_W = np.maximum(prm['IW0'] - prm['ssW'], 0).sum() * len(S['W'])
+    spare_D = np.maximum(prm['ID0'] - prm['ssD'], 0).sum() * len(S['D'])
+    total = demand.sum()
+    last_leg = costs['cWC'].min(axis=0)[served] @ demand[served]
+    # Un site sans liaison amont (coût infini) n'est alimenté que par son
+    # stock initial: la première borne n'est alors pas valide (et vaudrait
+    # nan avec un stock disponible nul)
+    up_D = costs['cFD'].min(axis=0)
+    first = -np.inf
+    if np.isfinite(up).all() and np.isfinite(up_D).all():
+        first = (path[served] @ demand[served] - spare_W * up.max()
+                 - spare_D * up_D.max())
+    transport = max(
+        first,
+        last_leg + max(total - spare_W, 0) * costs['cDW'].min()
+        + max(total - spare_W - spare_D, 0) * costs['cFD'].min())
+    holding = nT * (len(S['D']) * prm['hD'] @ prm['ssD']
+                    + len(S['W']) * prm['hW'] @ prm['ssW'])
+
+    # Couverture: capacité des entrepôts >= demande de chaque période,
+    # capacité des dépôts x périodes >= demande cumulée - stock disponible
+    dem_t = prm['dem'].sum(axis=(0, 1))
+    need = {'yW': dem_t.max(),
+            'yD': ((np.cumsum(dem_t) - spare_W)
+                   / np.arange(1, nT + 1)).max()}
+    sites = {'yD': (S['D'], prm['FD'], prm['capD']),
+             'yW': (S['W'], prm['FW'], prm['capW'])}
+
+    def cover(name, forced):
+        """Borne du coût fixe du type de site `name` avec `forced`
+        ({position: 0/1}) en plus des sites déjà fixés"""
+        labels, F, cap = sites[name]
+        state = {k: fixed[name][s] for k, s in enumerate(labels)
+                 if s in fixed[name]}
+        state.update(forced)
+        opened = [k for k, v in state.items() if v == 1]
+        free = [k for k in range(len(labels)) if k not in state]
+        return F[opened].sum() + _min_cover(
+            F[free], cap[free], need[name] - cap[opened].sum())
+
+    base = {name: cover(name, {}) for name in sites}
+    lower = transport + holding + sum(base.values())
+    for name, (labels, _, _) in sites.items():
+        other = lower - base[name]
+        for k, s in enumerate(labels):
+            if s in fixed[name]:
+                continue
+            if other + cover(name, {k: 1}) > upper + 1e-6:
+                fixed[name][s] = 0
+            elif other + cover(name, {k: 0}) > upper + 1e-6:
+                fixed[name][s] = 1
+    return fixed, lower
+
+# =====================================================
+# 3. Presolve complet
+# =====================================================
+
+
+def model_size(mat):
+    return {'variables': mat['n_vars'], 'contraintes': mat['n_cons'],
+            'non-nuls': len(mat['A_val'])}
+
+
+def presolve(data, upper=None, tee=True):
+    """Réduit les données avant la construction du modèle.
+
+    Retourne (données réduites, sites fixés, rapport). Les sites fixés
+    s'appliquent au modèle avec build_model_matrix(data, fixings=...) et
+    leurs liaisons sont retirées des tables. `upper` est le coût d'une
+    solution réalisable connue; par défaut celui de l'heuristique.
+    """
+    from heuristic import solve_heuristic
+
+    t0 = time.perf_counter()
+    idle = idle_clients(data)
+    reduced = dict(data)
+    reduced['demand'] = data['demand'][~data['demand']['client'].isin(idle)]
+    reduced['cWC'] = data['cWC'][~data['cWC']['client'].isin(idle)]
+
+    fixed = site_fixings(reduced)
+    if upper is None:
+        upper = solve_heuristic(reduced)['total_cost']
+    fixed, lower = bound_fixings(reduced, upper, fixed)
+    reduced['cFD'], reduced['cDW'], reduced['cWC'] = dominated_lanes(
+        reduced, fixed)
+    elapsed = time.perf_counter() - t0
+
+    before = model_size(compile_matrices(data))
+    after = model_size(compile_matrices(reduced))
+    report = {
+        'dépôts fixés': dict(fixed['yD']), 'entrepôts fixés': dict(fixed['yW']),
+        'clients sans demande': len(idle),
+        'liaisons retirées': {
+            name: len(data[name]) - len(reduced[name])
+            for name in ('cFD', 'cDW', 'cWC')},
+        'borne inf': lower, 'borne sup': upper,
+        'avant': before, 'après': after,
+        'retirés': {key: before[key] - after[key] for key in before},
+        'temps': elapsed,
+    }
+    if tee:
+        print_report(report)
+    return reduced, fixed, report
+
+
+def print_report(report):
+    print("\n🔎 PRESOLVE")
+    for label in ('dépôts fixés', 'entrepôts fixés'):
+        sites = report[label]
+        print(f"   {label.capitalize()}: "
+              f"{sum(v == 1 for v in sites.values())} ouverts, "
+              f"{sum(v == 0 for v in sites.values())} fermés")
+    print(f"   Clients sans demande: {report['clients sans demande']}")
+    print(f"   Bornes: {report['borne inf']:,.2f} ≤ optimum ≤ "
+          f"{report['borne sup']:,.2f}")
+    for name, n in report['liaisons retirées'].items():
+        print(f"   Liaisons {name} retirées: {n}")
+    for key, n in report['retirés'].items():
+        print(f"   {key.capitalize():<12} {report['avant'][key]:>9} → "
+              f"{report['après'][key]:>9} (-{n})")
+    print(f"   Temps: {report['temps']:.3f} s")
+
+# =====================================================
+# 4. Vérification: même optimum avec et sans presolve
+# =====================================================
+
+
+def compare_presolve(data, backend="glpk_capi", time_limit=None):
+    """Résout le modèle complet puis le modèle réduit et compare tailles,
+    temps et optimum"""
+    from pyomo.environ import value
+    from matrixmodel import build_model_matrix
+    from solver import solve_model
+
+    reduced, fixed, _ = presolve(data)
+    rows = []
+    for label, d, fixings in (('complet', data, None),
+                              ('presolve', reduced, fixed)):
+        m = build_model_matrix(d, fixings=fixings)
+        t0 = time.perf_counter()
+        results, _ = solve_model(m, backend=backend, time_limit=time_limit)
+        rows.append({'modèle': label, **model_size(m.matrix_form),
+                     'temps (s)': time.perf_counter() - t0,
+                     'statut': str(results.solver.termination_condition),
+                     'optimum': value(m.OBJ)})
+
+    table = pd.DataFrame(rows)
+    table['écart'] = table['optimum'] - table['optimum'].iloc[0]
+    print(f"\n⏱️  PRESOLVE ({backend})")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+
+    data = load_and_validate_data(path="Data/")
+    presolve(data)
+
+    # Instance réduite: le réseau complet ne se résout pas en quelques minutes
+    compare_presolve(subset_instance(data, n_clients=20, n_months=3),
+                     time_limit=300)
@@ -0,0 +1,226 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import glpk_capi
+from matrixmodel import compile_matrices
+from params import period_order
+
+# =====================================================
+# 1. Fenêtres de l'horizon
+# =====================================================
+
+
+def horizon_windows(n_periods, window=3, step=None):
+    """Fenêtres glissantes (début, fin, périodes engagées) sur les positions
+    0..n_periods-1: chaque fenêtre couvre `window` périodes et engage les
+    `step` premières (toutes pour la dernière), la suivante commence à la
+    première période non engagée"""
+    step = step or window
+    if not 0 < step <= window:
+        raise ValueError("Il faut 0 < step <= window")
+    windows, start = [], 0
+    while start < n_periods:
+        end = min(start + window, n_periods)
+        commit = end - start if end == n_periods else step
+        windows.append((start, end, commit))
+        start += commit
+    return windows
+
+
+def window_data(data, periods):
+    """Données restreintes à la demande des périodes `periods`"""
+    demand = data['demand']
+    return dict(data, demand=demand[demand['month'].isin(periods)])
+
+
+def repeat_months(data, repeat):
+    """Historique de demande répété `repeat` fois sur des mois successifs
+    (horizons longs pour les essais)"""
+    demand = data['demand']
+    n_months = demand['month'].max()
+    return dict(data, demand=pd.concat(
+        [demand.assign(month=demand['month'] + k * n_months)
+         for k in range(repeat)], ignore_index=True))
+
+
+def set_initial_stocks(mat, ID0, IW0):
+    """Stocks initiaux par produit et par site (tableaux (P, D) et (P, W))
+    au lieu des stocks ID0/IW0 par produit: seconds membres des équilibres
+    de la première période"""
+    rx = mat['con_index']
+    for name, stock in (('STD', ID0), ('STW', IW0)):
+        rows = rx[name][:, :, 0]
+        mat['row_lb'][rows] = stock
+        mat['row_ub'][rows] = stock
+    return mat
+
+
+def add_site_rows(mat, rows):
+    """Ajoute des inégalités `a·y >= rhs` sur les seules colonnes yD/yW"""
+    cols = np.concatenate([mat['var_index']['yD'], mat['var_index']['yW']])
+    A_row, A_col, A_val = [mat['A_row']], [mat['A_col']], [mat['A_val']]
+    for i, (a, rhs) in enumerate(rows):
+        nz = np.flatnonzero(a)
+        A_row.append(np.full(len(nz), mat['n_cons'] + i))
+        A_col.append(cols[nz])
+        A_val.append(a[nz])
+    mat.update({
+        'A_row': np.concatenate(A_row), 'A_col': np.concatenate(A_col),
+        'A_val': np.concatenate(A_val),
+        'row_lb': np.append(mat['row_lb'], [rhs for _, rhs in rows]),
+        'row_ub': np.append(mat['row_ub'], np.full(len(rows), np.inf)),
+        'n_cons': mat['n_cons'] + len(rows),
+    })
+    return mat
+
+# =====================================================
+# 2. Résolution à horizon glissant
+# =====================================================
+
+
+def _window_cost(mat, x, commit):
+    """Coût de flux et de stockage des `commit` premières périodes"""
+    return sum(float(mat['c'][idx[..., :commit]].ravel()
+                     @ x[idx[..., :commit]].ravel())
+               for name, idx in mat['var_index'].items()
+               if name not in ('yD', 'yW'))
+
+
+def solve_rolling(data, window=3, step=None, time_limit=None, mip_gap=None,
+                  tee=False):
+    """Résout l'horizon complet par fenêtres glissantes.
+
+    La première fenêtre est un MILP: elle choisit les sites, avec les
+    couvertures de capacité de tout l'horizon (benders.capacity_cover) pour
+    que ces sites puissent servir les fenêtres suivantes. Les sites sont
+    ensuite fixés et chaque fenêtre suivante est un LP de flux et de stocks
+    dont les stocks initiaux, par site, sont les stocks de fin de la
+    dernière période engagée. Seules les `step` premières périodes de
+    chaque fenêtre sont engagées; les autres servent d'anticipation.
+
+    Les périodes suivent params.period_order: une fenêtre peut commencer à
+    n'importe quelle période.
+
+    Retourne un dictionnaire: statut, coût total (coûts fixes + coûts
+    engagés), sites `y`, tableau par fenêtre et temps.
+    """
+    from benders import capacity_cover
+
+    t_start = time.perf_counter()
+    periods = period_order(data)
+    windows = horizon_windows(len(periods), window, step)
+    full = compile_matrices(data)
+    covers = capacity_cover(full)
+    n_sites = len(covers[0][0])
+
+    y = stocks = None
+    status, fixed, rows = 'optimal', 0.0, []
+    for k, (start, end, commit) in enumerate(windows):
+        t0 = time.perf_counter()
+        mat = compile_matrices(window_data(data, periods[start:end]))
+        if y is None:
+            add_site_rows(mat, covers)
+        else:
+            set_initial_stocks(mat, *stocks)
+            cols = np.arange(n_sites)
+            mat['col_lb'][cols] = y
+            mat['col_ub'][cols] = y
+            mat['integer'][:] = False
+        t1 = time.perf_counter()
+
+        prob = glpk_capi.GLPKProblem(mat)
+        code = prob.solve(time_limit=time_limit if y is None else None,
+                          mip_gap=mip_gap)
+        t2 = time.perf_counter()
+        if code not in (glpk_capi.GLP_OPT, glpk_capi.GLP_FEAS):
+            prob.close()
+            status = 'infeasible'
+            rows.append({'fenêtre': k + 1, 'début': periods[start],
+                         'fin': periods[end - 1], 'statut': status})
+            break
+        if code == glpk_capi.GLP_FEAS:
+            status = 'feasible'
+        x = prob.col_values()
+        prob.close()
+        if y is None:
+            y = x[:n_sites].round()
+            fixed = float(mat['c'][:n_sites] @ y)
+        ix = mat['var_index']
+        stocks = (x[ix['ID'][:, :, commit - 1]], x[ix['IW'][:, :, commit - 1]])
+        cost = _window_cost(mat, x, commit)
+        rows.append({'fenêtre': k + 1, 'début': periods[start],
+                     'fin': periods[end - 1],
+                     'engagées': f"{periods[start]}-{periods[start + commit - 1]}",
+                     'type': 'MILP' if k == 0 else 'LP',
+                     'variables': mat['n_vars'], 'coût engagé': cost,
+                     'construction (s)': t1 - t0, 'résolution (s)': t2 - t1})
+        if tee:
+            print(f"   fenêtre {k + 1:>3} ({rows[-1]['type']}, mois "
+                  f"{periods[start]}-{periods[end - 1]}): {t2 - t0:.2f} s")
+
+    table = pd.DataFrame(rows)
+    return {
+        'status': status,
+        'objective': (fixed + table['coût engagé'].sum()
+                      if status != 'infeasible' else np.inf),
+        'y': y, 'fixed_cost': fixed, 'windows': table,
+        'time': time.perf_counter() - t_start,
+    }
+
+
+def print_rolling(result):
+    print(f"\n📊 HORIZON GLISSANT ({len(result['windows'])} fenêtres, "
+          f"{result['time']:.1f} s, statut {result['status']})")
+    print(f"   Coût total: {result['objective']:,.2f} MAD "
+          f"(dont fixes {result['fixed_cost']:,.2f})")
+    print(result['windows'].to_string(index=False,
+                                      float_format=lambda x: f"{x:,.2f}"))
+
+# =====================================================
+# 3. Comparaison: horizon complet contre horizon glissant
+# =====================================================
+
+
+def compare_rolling(data, repeats=(1, 2, 4), window=3, step=None,
+                    time_limit=300):
+    """Temps et coût du MILP de tout l'horizon (limité à `time_limit`) et de
+    l'horizon glissant, pour l'historique répété 1..n fois"""
+    rows = []
+    for repeat in repeats:
+        d = repeat_months(data, repeat)
+        t0 = time.perf_counter()
+        prob = glpk_capi.GLPKProblem(compile_matrices(d))
+        code = prob.solve(time_limit=time_limit)
+        full = (prob.objective()
+                if code in (glpk_capi.GLP_OPT, glpk_capi.GLP_FEAS) else np.inf)
+        prob.close()
+        t_full = time.perf_counter() - t0
+        rolling = solve_rolling(d, window, step, time_limit=time_limit)
+        rows.append({
+            'mois': d['demand']['month'].nunique(),
+            'complet (s)': t_full,
+            'complet': 'optimal' if code == glpk_capi.GLP_OPT else 'limite',
+            'glissant (s)': rolling['time'],
+            'coût complet': full, 'coût glissant': rolling['objective'],
+            'écart (%)': 100 * (rolling['objective'] - full) / full,
+        })
+
+    table = pd.DataFrame(rows)
+    print(f"\n⏱️  HORIZON COMPLET CONTRE GLISSANT (fenêtres de {window} mois, "
+          f"{step or window} engagés)")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+
+    data = subset_instance(load_and_validate_data(path="Data/"),
+                           n_clients=20, n_months=6)
+    # Fenêtres de 3 mois qui se chevauchent: 2 mois engagés, 1 d'anticipation
+    print_rolling(solve_rolling(repeat_months(data, 2), window=3, step=2,
+                                tee=True))
+    compare_rolling(data, repeats=(1, 2, 4, 8), window=3, step=2)
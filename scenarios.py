@@ -0,0 +1,189 @@
+import contextlib
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataload import read_csv_typed
+
+# =====================================================
+# 1. Génération et lecture des scénarios de demande
+# =====================================================
+
+
+def scaled_scenarios(data, factors=(0.8, 0.9, 1.0, 1.1, 1.2)):
+    """Demandes de base multipliées par chaque facteur"""
+    scenarios = {}
+    for factor in factors:
+        demand = data['demand'].copy()
+        demand['demand'] = demand['demand'] * factor
+        scenarios[f"x{factor:g}"] = demand
+    return scenarios
+
+
+def sampled_scenarios(data, n=10, cv=0.15, seed=0):
+    """Prévisions tirées autour de la demande de base: facteur normal de
+    moyenne 1 et de coefficient de variation `cv`, indépendant par produit,
+    client et mois (tronqué à 0)"""
+    rng = np.random.default_rng(seed)
+    base = data['demand']
+    scenarios = {}
+    for k in range(n):
+        demand = base.copy()
+        demand['demand'] = (base['demand']
+                            * rng.normal(1.0, cv, len(base)).clip(0))
+        scenarios[f"tirage {k}"] = demand
+    return scenarios
+
+
+def load_scenarios(folder):
+    """Scénarios enregistrés: un CSV au format de demand_pct.csv par
+    scénario, nommé d'après le fichier"""
+    return {os.path.splitext(f)[0]: read_csv_typed(os.path.join(folder, f))
+            for f in sorted(os.listdir(folder)) if f.endswith(".csv")}
+
+# =====================================================
+# 2. Résolution d'un lot de scénarios
+# =====================================================
+
+
+def _solve_chunk(data, chunk, time_limit=None, mip_gap=None):
+    """Résout une suite de scénarios avec un seul IncrementalSolver: le
+    modèle et le problème GLPK sont construits pour le premier scénario,
+    les suivants ne modifient que les seconds membres de demande et
+    repartent de la base et des sites du précédent"""
+    from improvedmodel import analyze_results
+    from incremental import IncrementalSolver
+
+    solver = IncrementalSolver()
+    rows = []
+    try:
+        for name, demand in chunk:
+            model, results, timings = solver.solve(
+                dict(data, demand=demand), time_limit=time_limit,
+                mip_gap=mip_gap)
+            with contextlib.redirect_stdout(io.StringIO()):
+                analysis = analyze_results(model, results)
+            row = {'scénario': name,
+                   'demande totale': demand['demand'].sum(),
+                   'condition': str(results.solver.termination_condition),
+                   'mise à jour': next(k for k in timings
+                                       if k.startswith('mise à jour')),
+                   'temps (s)': timings['total'],
+                   'processus': os.getpid()}
+            if analysis is not None:
+                row.update({
+                    'coût total': analysis['total_cost'],
+                    'transport': analysis['cout_transport'],
+                    'fixe': analysis['cout_fixe'],
+                    'stockage': analysis['cout_stockage'],
+                    'dépôts': ' '.join(map(str, analysis['depots_ouverts'])),
+                    'entrepôts': ' '.join(map(str,
+                                              analysis['entrepots_ouverts'])),
+                })
+            rows.append(row)
+    finally:
+        solver.close()
+    return rows
+
+
+def solve_scenarios(data, scenarios, processes=1, time_limit=None,
+                    mip_gap=None):
+    """Résout chaque scénario de demande (dictionnaire nom -> table
+    demand) et retourne un tableau d'indicateurs par scénario.
+
+    Les scénarios sont triés par demande totale puis répartis en
+    `processes` suites contiguës, une par processus: dans chaque suite, le
+    scénario précédent (le plus proche) sert de démarrage à chaud.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing as mp
+
+    items = sorted(scenarios.items(), key=lambda kv: kv[1]['demand'].sum())
+    processes = max(1, min(processes, len(items)))
+    chunks = [[items[i] for i in chunk]
+              for chunk in np.array_split(np.arange(len(items)), processes)]
+
+    if processes == 1:
+        rows = _solve_chunk(data, chunks[0], time_limit, mip_gap)
+    else:
+        # Seule la demande diffère d'un scénario à l'autre: les autres
+        # tables sont transmises une fois par processus
+        with ProcessPoolExecutor(max_workers=processes,
+                                 mp_context=mp.get_context("spawn")) as pool:
+            futures = [pool.submit(_solve_chunk, data, chunk, time_limit,
+                                   mip_gap) for chunk in chunks]
+            rows = [row for f in futures for row in f.result()]
+
+    order = {name: k for k, name in enumerate(scenarios)}
+    table = pd.DataFrame(rows)
+    return (table.sort_values('scénario', key=lambda s: s.map(order))
+            .reset_index(drop=True))
+
+
+def print_scenarios(table):
+    """Tableau comparatif des scénarios"""
+    columns = [c for c in ('scénario', 'demande totale', 'condition',
+                           'coût total', 'transport', 'fixe', 'stockage',
+                           'dépôts', 'entrepôts', 'temps (s)')
+               if c in table]
+    print("\n📊 COMPARAISON DES SCÉNARIOS")
+    print(table[columns].to_string(index=False,
+                                   float_format=lambda x: f"{x:,.2f}"))
+
+# =====================================================
+# 3. Comparaison: reconstruction par scénario contre mise à jour
+# =====================================================
+
+
+def compare_scenario_engine(data, scenarios, processes=(1, 2),
+                            time_limit=None):
+    """Temps total du lot: modèle reconstruit et résolu à froid pour chaque
+    scénario, puis moteur de scénarios (mise à jour de la demande et
+    démarrage à chaud) avec 1..n processus. Retourne les indicateurs de la
+    première exécution du moteur et le tableau des temps."""
+    from matrixmodel import build_model_matrix
+    from solver import solve_model
+
+    runs = []
+    t0 = time.perf_counter()
+    costs = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, demand in scenarios.items():
+            m = build_model_matrix(dict(data, demand=demand))
+            results, _ = solve_model(m, backend="glpk_capi",
+                                     time_limit=time_limit)
+            costs[name] = m.OBJ()
+    runs.append({'mode': 'reconstruction', 'processus': 1,
+                 'temps (s)': time.perf_counter() - t0, 'écart max coût': 0.0})
+
+    tables = {}
+    for n in processes:
+        t0 = time.perf_counter()
+        table = tables[n] = solve_scenarios(data, scenarios, processes=n,
+                                            time_limit=time_limit)
+        elapsed = time.perf_counter() - t0
+        diff = max(abs(row['coût total'] - costs[row['scénario']])
+                   for _, row in table.iterrows())
+        runs.append({'mode': 'moteur de scénarios', 'processus': n,
+                     'temps (s)': elapsed, 'écart max coût': diff})
+
+    summary = pd.DataFrame(runs)
+    summary['gain'] = summary['temps (s)'].iloc[0] / summary['temps (s)']
+    print(f"\n⏱️  LOT DE {len(scenarios)} SCÉNARIOS (s)")
+    print(summary.to_string(index=False, float_format=lambda x: f"{x:,.3f}"))
+    return tables[processes[0]], summary
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+
+    data = subset_instance(load_and_validate_data(path="Data/"),
+                           n_clients=20, n_months=3)
+    scenarios = {**scaled_scenarios(data, (0.8, 0.9, 1.0, 1.1, 1.2)),
+                 **sampled_scenarios(data, n=5)}
+    table, _ = compare_scenario_engine(data, scenarios)
+    print_scenarios(table)
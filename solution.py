@@ -0,0 +1,319 @@
+import numpy as np
+import pandas as pd
+
+from pyomo.environ import value
+
+# =====================================================
+# 1. Extraction de la solution en tableaux NumPy
+# =====================================================
+
+LANE_ENDS = {'LFD': ('F', 'D'), 'LDW': ('D', 'W'), 'LWC': ('W', 'C')}
+VAR_SETS = {'yD': ('D',), 'yW': ('W',), 'q1': ('P', 'LFD', 'T'),
+            'q2': ('P', 'LDW', 'T'), 'q3': ('P', 'LWC', 'T'),
+            'ID': ('P', 'D', 'T'), 'IW': ('P', 'W', 'T')}
+PARAMS = {'capD': ('D',), 'capW': ('W',), 'FD': ('D',), 'FW': ('W',),
+          'hD': ('P',), 'hW': ('P',), 'ssD': ('P',), 'ssW': ('P',),
+          'cFD': ('LFD',), 'cDW': ('LDW',), 'cWC': ('LWC',)}
+
+
+def _component_array(component, shape, read):
+    """Valeurs d'un composant indexé (Var ou Param), dans l'ordre de ses
+    indices, en un seul parcours"""
+    return np.fromiter((read(v) for v in component.values()), dtype=float,
+                       count=len(component)).reshape(shape)
+
+
+def extract_solution(m):
+    """Toutes les variables du modèle (et les paramètres utiles aux
+    indicateurs) en tableaux NumPy, un parcours par composant.
+
+    Les flux sont de forme (produit, liaison, période) et les stocks
+    (produit, site, période), pour build_model comme pour
+    build_model_matrix. `lanes` donne, pour chaque ensemble de liaisons, les
+    positions de ses deux extrémités dans les ensembles de sites.
+    """
+    sets = {k: list(getattr(m, k)) for k in 'PCTFDW'}
+    for lane in LANE_ENDS:
+        sets[lane] = list(getattr(m, lane))
+    lanes = {
+        lane: tuple(pd.Index(sets[end]).get_indexer([key[i] for key in sets[lane]])
+                    for i, end in enumerate(ends))
+        for lane, ends in LANE_ENDS.items()}
+    shape = lambda dims: tuple(len(sets[k]) for k in dims)
+
+    values = {name: _component_array(getattr(m, name), shape(dims),
+                                     lambda v: v.value or 0.0)
+              for name, dims in VAR_SETS.items()}
+    params = {name: _component_array(getattr(m, name), shape(dims), value)
+              for name, dims in PARAMS.items()}
+    return {'sets': sets, 'lanes': lanes, 'params': params, 'values': values}
+
+# =====================================================
+# 2. Indicateurs calculés sur les tableaux
+# =====================================================
+
+
+def solution_kpis(sol):
+    """Coûts, sites ouverts, flux par période, taux d'utilisation et stocks
+    moyens d'une solution extraite (réductions vectorisées).
+
+    Retourne les clés de analyze_results ainsi que le détail utilisé pour
+    l'affichage.
+    """
+    S, prm, x = sol['sets'], sol['params'], sol['values']
+    nT = len(S['T'])
+    open_D, open_W = x['yD'] > 0.5, x['yW'] > 0.5
+
+    transport = {
+        name: float((prm[cost][None, :, None] * x[flow]).sum())
+        for name, cost, flow in (('fd', 'cFD', 'q1'), ('dw', 'cDW', 'q2'),
+                                 ('wc', 'cWC', 'q3'))}
+    fixe = {'depots': float(prm['FD'] @ x['yD']),
+            'entrepots': float(prm['FW'] @ x['yW'])}
+    stockage = {'depots': float(prm['hD'] @ x['ID'].sum(axis=(1, 2))),
+                'entrepots': float(prm['hW'] @ x['IW'].sum(axis=(1, 2)))}
+
+    sortie_D = np.bincount(sol['lanes']['LDW'][0],
+                           x['q2'].sum(axis=(0, 2)), minlength=len(S['D']))
+    sortie_W = np.bincount(sol['lanes']['LWC'][0],
+                           x['q3'].sum(axis=(0, 2)), minlength=len(S['W']))
+
+    def util(flow, cap, mask, labels):
+        rate = np.divide(flow * 100, cap * nT, out=np.zeros_like(flow),
+                         where=cap > 0)
+        return {s: float(u) for s, u, o in zip(labels, rate, mask) if o}
+
+    def mean(a):
+        return float(a.mean()) if a.size else 0.0
+
+    return {
+        'total_cost': sum(transport.values()) + sum(fixe.values())
+        + sum(stockage.values()),
+        'depots_ouverts': [d for d, o in zip(S['D'], open_D) if o],
+        'entrepots_ouverts': [w for w, o in zip(S['W'], open_W) if o],
+        'cout_transport': sum(transport.values()),
+        'cout_fixe': sum(fixe.values()),
+        'cout_stockage': sum(stockage.values()),
+        'flux_par_periode': dict(zip(S['T'],
+                                     x['q3'].sum(axis=(0, 1)).tolist())),
+        'util_depots': util(sortie_D, prm['capD'], open_D, S['D']),
+        'util_entrepots': util(sortie_W, prm['capW'], open_W, S['W']),
+        'detail': {
+            'transport': transport, 'fixe': fixe, 'stockage': stockage,
+            'stock_moyen_depots': mean(x['ID'][:, open_D]),
+            'stock_moyen_entrepots': mean(x['IW'][:, open_W]),
+        },
+    }
+
+# =====================================================
+# 3. Export colonnaire (Parquet / Feather / CSV)
+# =====================================================
+
+TABLES = {'q1': ('product', 'factory', 'depot', 'month', 'quantity'),
+          'q2': ('product', 'depot', 'warehouse', 'month', 'quantity'),
+          'q3': ('product', 'warehouse', 'client', 'month', 'quantity'),
+          'ID': ('product', 'depot', 'month', 'stock'),
+          'IW': ('product', 'warehouse', 'month', 'stock')}
+EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+
+
+def solution_tables(sol, tol=1e-6):
+    """Tables longues (une colonne par indice, une pour la valeur) de toutes
+    les variables de flux et de stock, construites directement depuis les
+    tableaux.
+
+    Les flux nuls (<= tol) sont omis; les stocks sont exportés en entier.
+    """
+    S, lanes, x = sol['sets'], sol['lanes'], sol['values']
+    labels = {k: np.asarray(S[k]) for k in ('P', 'F', 'D', 'W', 'C', 'T')}
+    tables = {}
+    for name, dims in VAR_SETS.items():
+        if name not in TABLES:
+            continue
+        arr = x[name]
+        columns = TABLES[name]
+        if dims[1] in lanes:
+            p, l, t = np.nonzero(arr > tol)
+            ends = LANE_ENDS[dims[1]]
+            index = [labels['P'][p], labels[ends[0]][lanes[dims[1]][0][l]],
+                     labels[ends[1]][lanes[dims[1]][1][l]], labels['T'][t]]
+            val = arr[p, l, t]
+        else:
+            grid = np.indices(arr.shape).reshape(3, -1)
+            index = [labels[k][i] for k, i in zip(dims, grid)]
+            val = arr.ravel()
+        tables[name] = pd.DataFrame(dict(zip(columns, index + [val])))
+    return tables
+
+
+def _columnar_format(fmt):
+    """Format demandé, ou CSV si pyarrow (requis par Parquet et Feather)
+    n'est pas installé"""
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Format d'export inconnu: {fmt} "
+                         f"(attendu: {', '.join(EXTENSIONS)})")
+    if fmt == 'csv':
+        return fmt
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print(f"⚠️  pyarrow non installé: export {fmt} remplacé par CSV")
+        return 'csv'
+    return fmt
+
+
+def _write_frame(df, path, fmt):
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    elif fmt == 'feather':
+        df.to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+
+def write_tables(tables, output_path="results/", fmt="parquet",
+                 partition_by="month"):
+    """Écrit chaque table en bloc au format `fmt`.
+
+    Avec `partition_by` ('month' ou 'product'), chaque table devient un
+    dossier partitionné à la manière de Hive (q3/month=1/part-0.parquet...),
+    lisible directement par pyarrow.dataset, DuckDB ou Spark; sinon un
+    fichier par table. Retourne {table: chemins écrits}.
+    """
+    import os
+    import shutil
+
+    fmt = _columnar_format(fmt)
+    ext = EXTENSIONS[fmt]
+    written = {}
+    for name, df in tables.items():
+        if partition_by is None:
+            path = os.path.join(output_path, name + ext)
+            _write_frame(df, path, fmt)
+            written[name] = [path]
+            continue
+        # Partitions d'un export précédent (autres mois ou produits)
+        shutil.rmtree(os.path.join(output_path, name), ignore_errors=True)
+        written[name] = []
+        for key, part in df.groupby(partition_by, sort=True):
+            folder = os.path.join(output_path, name, f"{partition_by}={key}")
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, "part-0" + ext)
+            _write_frame(part.drop(columns=partition_by)
+                         .reset_index(drop=True), path, fmt)
+            written[name].append(path)
+    return written
+
+# =====================================================
+# 4. Comparaison avec la lecture élément par élément
+# =====================================================
+
+
+def _loop_extract(m):
+    """Lecture de référence: un appel à value() par élément indexé"""
+    return {name: {idx: value(getattr(m, name)[idx])
+                   for idx in getattr(m, name)}
+            for name in VAR_SETS}
+
+
+def compare_extraction(m, repeat=3):
+    """Temps de lecture de la solution d'un modèle résolu: boucle value()
+    contre extract_solution, et écart maximal entre les deux lectures"""
+    import time
+
+    rows = []
+    for label, read in (('boucle value()', _loop_extract),
+                        ('extract_solution', extract_solution)):
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = read(m)
+            times.append(time.perf_counter() - t0)
+        rows.append({'lecture': label, 'temps (s)': min(times)})
+        if label == 'boucle value()':
+            loop = out
+    sol = out
+    ecart = max(float(np.abs(np.fromiter(loop[name].values(), dtype=float)
+                             - sol['values'][name].ravel()).max(initial=0))
+                for name in VAR_SETS)
+
+    table = pd.DataFrame(rows)
+    table['accélération'] = table['temps (s)'].iloc[0] / table['temps (s)']
+    n_vars = sum(v.size for v in sol['values'].values())
+    print(f"\n⏱️  EXTRACTION DE LA SOLUTION ({n_vars} variables, "
+          f"écart max {ecart:.1e})")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.4f}"))
+    return table
+
+
+def _row_dict_export(m, output_path, tol=1e-6):
+    """Export de référence: une boucle par variable, une liste de
+    dictionnaires, un CSV par variable"""
+    import os
+
+    for name, columns in TABLES.items():
+        rows = []
+        for idx, v in getattr(m, name).items():
+            val = value(v)
+            if name in ('ID', 'IW') or val > tol:
+                flat = [idx[0], *idx[1], idx[2]] if isinstance(idx[1], tuple) \
+                    else list(idx)
+                rows.append(dict(zip(columns, flat + [val])))
+        pd.DataFrame(rows).to_csv(os.path.join(output_path, name + ".csv"),
+                                  index=False)
+
+
+def _folder_size(path):
+    import os
+
+    return sum(os.path.getsize(os.path.join(root, f))
+               for root, _, files in os.walk(path) for f in files)
+
+
+def compare_export(m, partition_by="month"):
+    """Temps et taille sur disque de l'export de toutes les variables:
+    boucle et dictionnaires vers CSV contre écriture en bloc par format"""
+    import tempfile
+    import time
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        _row_dict_export(m, tmp)
+        rows.append({'export': 'dictionnaires → CSV',
+                     'temps (s)': time.perf_counter() - t0,
+                     'taille (Mo)': _folder_size(tmp) / 1e6})
+    for fmt in EXTENSIONS:
+        for by in (None, partition_by):
+            with tempfile.TemporaryDirectory() as tmp:
+                t0 = time.perf_counter()
+                write_tables(solution_tables(extract_solution(m)), tmp,
+                             fmt=fmt, partition_by=by)
+                rows.append({'export': f"{_columnar_format(fmt)} / {by or '-'}",
+                             'temps (s)': time.perf_counter() - t0,
+                             'taille (Mo)': _folder_size(tmp) / 1e6})
+
+    table = pd.DataFrame(rows)
+    print(f"\n⏱️  EXPORT DES VARIABLES")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.3f}"))
+    return table
+
+
+if __name__ == "__main__":
+    from heuristic import heuristic_sites, solve_heuristic
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import build_model_matrix, subset_instance
+    from solver import solve_model
+
+    data = load_and_validate_data(path="Data/")
+
+    # Réseau complet: sites fixés par l'heuristique, seul le routage reste
+    # à résoudre (le MILP complet ne se résout pas en quelques minutes)
+    for label, d in (('instance réduite', subset_instance(data, 20, 3)),
+                     ('réseau complet', data)):
+        print(f"\n🔎 {label}")
+        m = build_model_matrix(d, fixings=heuristic_sites(
+            solve_heuristic(d), d))
+        solve_model(m, backend="glpk_capi", time_limit=300)
+        compare_extraction(m)
+        compare_export(m)
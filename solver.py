@@ -0,0 +1,340 @@
+import time
+
+import numpy as np
+from pyomo.environ import *
+from pyomo.opt import SolverResults
+
+import glpk_capi
+from benders import solve_benders
+from lagrangian import solve_lagrangian
+from tracing import record, span
+from warmstart import as_sites, branching_priority, fix_sites, site_start
+
+# =====================================================
+# 1. Résultats au format Pyomo
+# =====================================================
+
+BACKENDS = ("glpk", "glpk_capi", "appsi_highs", "benders", "lagrangian")
+
+# Backends qui travaillent sur la forme matricielle (build_model_matrix)
+MATRIX_BACKENDS = ("glpk_capi", "benders", "lagrangian")
+
+GLPK_STATUS = {
+    glpk_capi.GLP_OPT: TerminationCondition.optimal,
+    glpk_capi.GLP_FEAS: TerminationCondition.feasible,
+    glpk_capi.GLP_NOFEAS: TerminationCondition.infeasible,
+    glpk_capi.GLP_UNBND: TerminationCondition.unbounded,
+}
+
+# Solution GLP_FEAS selon le code de retour de glp_intopt / glp_simplex:
+# écart demandé (mip_gap) atteint ou limite de temps
+GLPK_FEAS_CODE = {
+    glpk_capi.GLP_EMIPGAP: TerminationCondition.optimal,
+    glpk_capi.GLP_ETMLIM: TerminationCondition.maxTimeLimit,
+}
+
+
+def glpk_termination(prob, status):
+    """Condition d'arrêt Pyomo d'une résolution GLPK en mémoire. Après un
+    arrêt demandé par le suivi (prob.stopped), la meilleure solution entière
+    est une solution réalisable (feasible), ou userInterrupt s'il n'y en a
+    pas encore. Une solution GLP_FEAS est optimale à l'écart mip_gap près
+    si glp_intopt rend GLP_EMIPGAP, maxTimeLimit avec GLP_ETMLIM."""
+    if getattr(prob, 'stopped', False):
+        return (TerminationCondition.feasible
+                if status in (glpk_capi.GLP_FEAS, glpk_capi.GLP_OPT)
+                else TerminationCondition.userInterrupt)
+    if status == glpk_capi.GLP_FEAS:
+        return GLPK_FEAS_CODE.get(getattr(prob, 'code', None),
+                                  TerminationCondition.feasible)
+    return GLPK_STATUS.get(status, TerminationCondition.other)
+
+
+def make_results(termination, solve_time):
+    """SolverResults minimal compatible avec analyze_results"""
+    results = SolverResults()
+    results.solver.status = (SolverStatus.ok
+                             if termination in (TerminationCondition.optimal,
+                                                TerminationCondition.maxTimeLimit,
+                                                TerminationCondition.feasible)
+                             else SolverStatus.warning)
+    results.solver.termination_condition = termination
+    results.solver.time = solve_time
+    return results
+
+
+def load_vector(m, x):
+    """Affecte le vecteur solution `x` (ordre des colonnes de la forme
+    matricielle) aux variables du modèle"""
+    mat = m.matrix_form
+    for name, idx in mat['var_index'].items():
+        vals = x[idx.ravel()].tolist()
+        for v, val in zip(getattr(m, name).values(), vals):
+            v.set_value(val, skip_validation=True)
+    m.matrix_solution = x
+
+# =====================================================
+# 2. Backends
+# =====================================================
+
+
+def _solve_glpk_file(m, tee, time_limit, mip_gap, start, priority,
+                     monitor=None):
+    """GLPK via fichier LP et sous-processus glpsol (comportement historique).
+    glpsol n'accepte ni solution initiale ni priorités de branchement."""
+    if start is not None or priority:
+        print("⚠️ glpsol: solution initiale et priorités ignorées "
+              "(utiliser glpk_capi ou appsi_highs)")
+    solver = SolverFactory("glpk")
+    if time_limit:
+        solver.options['tmlim'] = int(time_limit)
+    if mip_gap is not None:
+        solver.options['mipgap'] = mip_gap
+    t0 = time.perf_counter()
+    results = solver.solve(m, tee=tee)
+    total = time.perf_counter() - t0
+    solve_time = results.solver.time or 0.0
+    return results, {'ecriture + chargement': total - solve_time,
+                     'resolution': solve_time}
+
+
+def _solve_glpk_capi(m, tee, time_limit, mip_gap, start, priority,
+                     monitor=None):
+    """GLPK en mémoire via l'API C: matrice chargée directement, solution
+    relue sous forme de tableau. La solution initiale est complétée par une
+    résolution continue à sites fixés puis injectée comme incumbent; les
+    priorités font brancher sur yD avant yW."""
+    if not hasattr(m, 'matrix_form'):
+        raise ValueError("Le backend glpk_capi nécessite un modèle construit "
+                         "avec build_model_matrix")
+    t0 = time.perf_counter()
+    mat = m.matrix_form
+    with span("écriture"):
+        prob = glpk_capi.GLPKProblem(mat)
+    timings = {'ecriture': time.perf_counter() - t0}
+    x0 = None
+    if start is not None:
+        t = time.perf_counter()
+        with span("solution initiale"):
+            x0 = prob.complete_start(*site_start(mat, start))
+        if x0 is None:
+            print("⚠️ Solution initiale infaisable pour ces données, ignorée")
+        timings['solution initiale'] = time.perf_counter() - t
+    t1 = time.perf_counter()
+    with span("solveur"):
+        status = prob.solve(
+            msg=tee, time_limit=time_limit, mip_gap=mip_gap, start=x0,
+            priority=branching_priority(mat) if priority else None,
+            monitor=monitor)
+    t2 = time.perf_counter()
+    termination = glpk_termination(prob, status)
+    with span("chargement"):
+        if termination in (TerminationCondition.optimal,
+                           TerminationCondition.maxTimeLimit,
+                           TerminationCondition.feasible):
+            load_vector(m, prob.col_values())
+    t3 = time.perf_counter()
+    prob.close()
+    results = make_results(termination, t2 - t1)
+    timings.update({'resolution': t2 - t1, 'chargement': t3 - t2})
+    return results, timings
+
+
+def _solve_appsi_highs(m, tee, time_limit, mip_gap, start, priority,
+                       monitor=None):
+    """HiGHS persistant via l'interface APPSI de Pyomo (highspy). La solution
+    initiale est complétée en résolvant le modèle à sites fixés, puis passée à
+    HiGHS (setSolution). HiGHS ne gère pas les priorités de branchement."""
+    from pyomo.contrib.appsi.solvers import Highs
+    from pyomo.contrib.appsi.base import TerminationCondition as AppsiTC
+
+    solver = Highs()
+    solver.config.stream_solver = tee
+    solver.config.load_solution = False
+    if time_limit:
+        solver.config.time_limit = time_limit
+    if mip_gap is not None:
+        solver.config.mip_gap = mip_gap
+    t0 = time.perf_counter()
+    with span("écriture"):
+        solver.set_instance(m)
+    timings = {'ecriture': time.perf_counter() - t0}
+    if start is not None:
+        t = time.perf_counter()
+        with span("solution initiale"):
+            fixed = fix_sites(m, start)
+            res = solver.solve(m)
+            if res.best_feasible_objective is not None:
+                res.solution_loader.load_vars()
+                solver.config.warmstart = True
+            else:
+                print("⚠️ Solution initiale infaisable pour ces données, "
+                      "ignorée")
+            for v in fixed:
+                v.unfix()
+        timings['solution initiale'] = time.perf_counter() - t
+    t1 = time.perf_counter()
+    with span("solveur"):
+        res = solver.solve(m)
+    t2 = time.perf_counter()
+    termination = {
+        AppsiTC.optimal: TerminationCondition.optimal,
+        AppsiTC.maxTimeLimit: TerminationCondition.maxTimeLimit,
+        AppsiTC.infeasible: TerminationCondition.infeasible,
+        AppsiTC.unbounded: TerminationCondition.unbounded,
+    }.get(res.termination_condition, TerminationCondition.other)
+    with span("chargement"):
+        if res.best_feasible_objective is not None:
+            res.solution_loader.load_vars()
+    t3 = time.perf_counter()
+    results = make_results(termination, t2 - t1)
+    timings.update({'resolution': t2 - t1, 'chargement': t3 - t2})
+    return results, timings
+
+
+def _site_vector(mat, sites):
+    """Valeurs de yD puis yW; les sites absents de `sites` sont ouverts"""
+    cols, vals = site_start(mat, sites)
+    order = branching_priority(mat)
+    y = np.ones(len(order))
+    y[np.searchsorted(order, cols)] = vals
+    return y
+
+
+def _solve_benders(m, tee, time_limit, mip_gap, start, priority,
+                   monitor=None):
+    """Décomposition de Benders (maître yD/yW, sous-problème LP de flux et
+    de stocks) avec GLPK en mémoire. `mip_gap` est l'écart relatif d'arrêt
+    entre bornes; la solution initiale fournit la première borne supérieure.
+    """
+    if not hasattr(m, 'matrix_form'):
+        raise ValueError("Le backend benders nécessite un modèle construit "
+                         "avec build_model_matrix")
+    mat = m.matrix_form
+    y0 = None if start is None else _site_vector(mat, start)
+    out = solve_benders(mat, tol=mip_gap if mip_gap is not None else 1e-6,
+                        time_limit=time_limit, tee=tee, start=y0,
+                        monitor=monitor)
+    t0 = time.perf_counter()
+    if out['x'] is not None:
+        load_vector(m, out['x'])
+    t1 = time.perf_counter()
+    termination = {
+        'optimal': TerminationCondition.optimal,
+        'maxTimeLimit': TerminationCondition.maxTimeLimit,
+        'iterations': TerminationCondition.maxIterations,
+        'infeasible': TerminationCondition.infeasible,
+        'stopped': TerminationCondition.feasible,
+    }[out['status']]
+    if out['status'] == 'stopped' and out['x'] is None:
+        termination = TerminationCondition.userInterrupt
+    elif out['x'] is None and termination != TerminationCondition.infeasible:
+        termination = TerminationCondition.other
+    results = make_results(termination, sum(out['timings'].values()))
+    m.benders_history = out['history']
+    timings = dict(out['timings'])
+    timings['chargement'] = t1 - t0
+    return results, timings
+
+
+def _solve_lagrangian(m, tee, time_limit, mip_gap, start, priority,
+                      monitor=None):
+    """Flux et stocks à sites fixés (`start`) par relaxation lagrangienne
+    des capacités: un LP par produit, résolus en parallèle. L'écart entre la
+    borne lagrangienne et le plan réparé est comparé à `mip_gap`."""
+    if not hasattr(m, 'matrix_form'):
+        raise ValueError("Le backend lagrangian nécessite un modèle construit "
+                         "avec build_model_matrix")
+    if start is None:
+        raise ValueError("Le backend lagrangian résout les flux pour une "
+                         "configuration de sites donnée: fournir start")
+    mat = m.matrix_form
+    tol = mip_gap if mip_gap is not None else 1e-4
+    out = solve_lagrangian(mat, _site_vector(mat, start), tol=tol,
+                           time_limit=time_limit, tee=tee)
+    t0 = time.perf_counter()
+    if out['x'] is None:
+        termination = TerminationCondition.infeasible
+    else:
+        load_vector(m, out['x'])
+        termination = (TerminationCondition.optimal if out['gap'] <= tol
+                       else TerminationCondition.feasible)
+    t1 = time.perf_counter()
+    results = make_results(termination, out['timings']['total'])
+    m.lagrangian_history = out['history']
+    timings = {k: v for k, v in out['timings'].items() if k != 'total'}
+    timings['chargement'] = t1 - t0
+    return results, timings
+
+
+# Backends dont les étapes sont des spans de la trace (temps CPU et mémoire)
+SPANNED = ("glpk_capi", "appsi_highs")
+
+_SOLVERS = {
+    "glpk": _solve_glpk_file,
+    "glpk_capi": _solve_glpk_capi,
+    "appsi_highs": _solve_appsi_highs,
+    "benders": _solve_benders,
+    "lagrangian": _solve_lagrangian,
+}
+
+# =====================================================
+# 3. Point d'entrée
+# =====================================================
+
+
+def available_backends():
+    """Backends utilisables dans l'environnement courant"""
+    found = []
+    if SolverFactory("glpk").available(exception_flag=False):
+        found.append("glpk")
+    if glpk_capi.available():
+        found.extend(["glpk_capi", "benders", "lagrangian"])
+    if SolverFactory("appsi_highs").available(exception_flag=False):
+        found.append("appsi_highs")
+    return found
+
+
+def solve_model(m, backend="glpk", tee=False, time_limit=None, mip_gap=None,
+                start=None, priority=False, monitor=None):
+    """Résout le modèle avec le backend choisi.
+
+    `start` est une solution précédente (dictionnaire de read_sites ou
+    dossier contenant sites_depots.csv/sites_entrepots.csv) utilisée comme
+    solution initiale du MILP. `priority` fait brancher sur yD avant yW
+    (glpk_capi uniquement). Le backend "benders" interprète `mip_gap` comme
+    l'écart relatif d'arrêt entre les bornes de la décomposition.
+
+    `monitor(info)` suit la résolution (solution entière, borne, écart,
+    temps écoulé) et l'arrête en retournant True: la meilleure solution
+    trouvée est alors chargée avec la condition `feasible`. Seuls glpk_capi
+    et benders le prennent en charge; les autres backends l'ignorent.
+
+    Retourne (results, timings): `results` est un SolverResults Pyomo et
+    `timings` détaille le temps passé à transmettre le modèle, à résoudre et
+    à recharger la solution. Si une trace est active (tracing.Tracer), ces
+    étapes y sont enregistrées sous le span "résolution".
+    """
+    if backend not in _SOLVERS:
+        raise ValueError(f"Backend inconnu: {backend} (choix: {BACKENDS})")
+    if start is not None:
+        start = as_sites(start)
+    t0 = time.perf_counter()
+    with span("résolution", model=m):
+        results, timings = _SOLVERS[backend](m, tee, time_limit, mip_gap,
+                                             start, priority, monitor)
+        if backend not in SPANNED:
+            # Étapes mesurées par le backend lui-même (sans temps CPU)
+            t = t0
+            for step, seconds in timings.items():
+                record(step, seconds, start=t)
+                t += seconds
+    timings['total'] = time.perf_counter() - t0
+    return results, timings
+
+
+def print_timings(timings, backend=""):
+    """Affiche la répartition du temps de résolution"""
+    print(f"\n⏱️  RÉPARTITION DU TEMPS {backend}")
+    for step, t in timings.items():
+        print(f"   {step:<22} {t:>8.2f} s")
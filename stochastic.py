@@ -0,0 +1,378 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import glpk_capi
+from matrixmodel import compile_matrices, same_structure
+from solver import glpk_termination
+
+# =====================================================
+# 1. Scénarios et forme étendue
+# =====================================================
+
+# Sites ouverts: décision de premier niveau, commune à tous les scénarios;
+# flux et stocks: décisions de second niveau, propres à chaque scénario
+
+
+def _site_cols(mat):
+    return np.concatenate([mat['var_index']['yD'], mat['var_index']['yW']])
+
+
+def scenario_matrices(data, scenarios, probabilities=None):
+    """Formes compilées des scénarios de demande (nom -> table demand) et
+    probabilités normalisées (uniformes par défaut). Les scénarios ne
+    doivent différer que par la demande: mêmes ensembles, même matrice."""
+    names = list(scenarios)
+    mats = [compile_matrices(dict(data, demand=scenarios[s])) for s in names]
+    if not all(same_structure(mats[0], mat) for mat in mats[1:]):
+        raise ValueError("Les scénarios doivent partager les ensembles du "
+                         "modèle (seule la demande peut changer)")
+    p = (np.full(len(names), 1.0 / len(names)) if probabilities is None
+         else np.asarray([probabilities[s] for s in names], dtype=float))
+    if (p < 0).any() or p.sum() <= 0:
+        raise ValueError("Probabilités des scénarios invalides")
+    return names, mats, p / p.sum()
+
+
+def extensive_matrices(mats, p):
+    """Forme étendue (équivalent déterministe) du problème à deux niveaux:
+    les colonnes yD/yW sont partagées, les colonnes de flux et de stocks et
+    toutes les lignes sont dupliquées par scénario. Le coût de second
+    niveau du scénario s est pondéré par sa probabilité p[s].
+
+    `scenario_cols[s]` donne, pour chaque colonne d'un modèle déterministe,
+    sa colonne dans la forme étendue.
+    """
+    base = mats[0]
+    n, m_rows = base['n_vars'], base['n_cons']
+    n1 = len(_site_cols(base))
+    n2 = n - n1
+    # yD et yW sont les premières colonnes de compile_matrices
+    assert (_site_cols(base) == np.arange(n1)).all()
+
+    scenario_cols = [np.concatenate([np.arange(n1),
+                                     n1 + s * n2 + np.arange(n2)])
+                     for s in range(len(mats))]
+    return {
+        'sets': base['sets'], 'params': base['params'],
+        'var_index': {'yD': base['var_index']['yD'],
+                      'yW': base['var_index']['yW']},
+        'c': np.concatenate([base['c'][:n1]]
+                            + [ps * mat['c'][n1:]
+                               for ps, mat in zip(p, mats)]),
+        'col_lb': np.concatenate([base['col_lb'][:n1]]
+                                 + [mat['col_lb'][n1:] for mat in mats]),
+        'col_ub': np.concatenate([base['col_ub'][:n1]]
+                                 + [mat['col_ub'][n1:] for mat in mats]),
+        'integer': np.concatenate([base['integer'][:n1]]
+                                  + [mat['integer'][n1:] for mat in mats]),
+        'A_row': np.concatenate([mat['A_row'] + s * m_rows
+                                 for s, mat in enumerate(mats)]),
+        'A_col': np.concatenate([cols[mat['A_col']]
+                                 for cols, mat in zip(scenario_cols, mats)]),
+        'A_val': np.concatenate([mat['A_val'] for mat in mats]),
+        'row_lb': np.concatenate([mat['row_lb'] for mat in mats]),
+        'row_ub': np.concatenate([mat['row_ub'] for mat in mats]),
+        'n_vars': n1 + len(mats) * n2, 'n_cons': len(mats) * m_rows,
+        'scenario_cols': scenario_cols,
+    }
+
+
+def open_sites(mat, y):
+    """Listes des dépôts et entrepôts ouverts d'un vecteur (yD, yW)"""
+    S = mat['sets']
+    nD = len(S['D'])
+    return ([d for d, o in zip(S['D'], y[:nD]) if o > 0.5],
+            [w for w, o in zip(S['W'], y[nD:]) if o > 0.5])
+
+
+def solve_extensive(data, scenarios, probabilities=None, time_limit=None,
+                    mip_gap=None, tee=False):
+    """Résout la forme étendue avec GLPK en mémoire (petits cas).
+
+    Retourne un dictionnaire: statut, coût espéré, sites `y`, coût de
+    chaque scénario avec ces sites, temps par étape.
+    """
+    t0 = time.perf_counter()
+    names, mats, p = scenario_matrices(data, scenarios, probabilities)
+    ext = extensive_matrices(mats, p)
+    prob = glpk_capi.GLPKProblem(ext)
+    t1 = time.perf_counter()
+    status = prob.solve(msg=tee, time_limit=time_limit, mip_gap=mip_gap)
+    t2 = time.perf_counter()
+    result = {'status': str(glpk_termination(prob, status)),
+              'objective': np.inf, 'y': None, 'scenario_costs': None,
+              'n_vars': ext['n_vars'], 'n_cons': ext['n_cons']}
+    if status in (glpk_capi.GLP_OPT, glpk_capi.GLP_FEAS):
+        x = prob.col_values()
+        result['objective'] = prob.objective()
+        result['y'] = x[_site_cols(mats[0])].round()
+        result['scenario_costs'] = dict(zip(names, (
+            mat['c'] @ x[cols]
+            for mat, cols in zip(mats, ext['scenario_cols']))))
+    prob.close()
+    result['timings'] = {'construction': t1 - t0, 'resolution': t2 - t1,
+                         'total': time.perf_counter() - t0}
+    return result
+
+# =====================================================
+# 2. Décomposition par scénarios (L-shaped, sous-problèmes en parallèle)
+# =====================================================
+
+# Sous-problèmes conservés dans chaque processus (un par scénario)
+_SCENARIOS = []
+_SUBPROBLEMS = {}
+
+
+def _init_worker(mats):
+    global _SCENARIOS
+    _SCENARIOS = mats
+    _SUBPROBLEMS.clear()
+
+
+def _evaluate(s, y):
+    """LP de flux et de stocks du scénario s à sites `y` fixés: (réalisable,
+    valeur, sous-gradient), voir benders.Subproblem.evaluate"""
+    from benders import Subproblem
+
+    sub = _SUBPROBLEMS.get(s)
+    if sub is None:
+        sub = _SUBPROBLEMS[s] = Subproblem(_SCENARIOS[s])
+    feasible, value, grad, _ = sub.evaluate(y)
+    return feasible, value, grad
+
+
+class ScenarioSubproblems:
+    """Sous-problèmes de second niveau de tous les scénarios, avec
+    l'interface de benders.Subproblem pour solve_benders (méthode L-shaped).
+
+    Les LP des scénarios sont résolus en parallèle dans un
+    ProcessPoolExecutor dont chaque processus garde ses problèmes GLPK
+    (base du simplexe conservée d'une itération à l'autre), ou dans le
+    processus courant avec `workers=1`. `evaluate` renvoie la valeur et
+    le sous-gradient du coût espéré, ou la coupe de réalisabilité du
+    scénario le plus violé; `scenario_cuts` garde les coupes de chaque
+    scénario de la dernière évaluation (un θ par scénario dans le maître).
+    """
+
+    def __init__(self, mats, p, workers=None):
+        self.n = len(mats)
+        self.p = p
+        self.workers = workers or min(self.n, os.cpu_count() or 1)
+        self.values = {}
+        self.scenario_cuts = []
+        if self.workers == 1:
+            _init_worker(mats)
+            self.pool, self._map = None, map
+        else:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                            initializer=_init_worker,
+                                            initargs=(mats,))
+            self._map = self.pool.map
+
+    def _run(self, y):
+        out = self.scenario_cuts = list(
+            self._map(_evaluate, range(self.n), [y] * self.n))
+        self.values[tuple(y)] = np.array(
+            [value if feasible else np.inf for feasible, value, _ in out])
+        return out
+
+    def evaluate(self, y):
+        out = self._run(y)
+        infeasible = [(value, grad) for feasible, value, grad in out
+                      if not feasible]
+        if infeasible:
+            value, grad = max(infeasible, key=lambda o: o[0])
+            return False, value, grad, None
+        return (True, float(self.p @ [value for _, value, _ in out]),
+                self.p @ np.array([grad for _, _, grad in out]), None)
+
+    def recourse(self, y):
+        """Coût de second niveau de chaque scénario à sites `y` (infini si
+        la demande d'un scénario ne peut pas être servie)"""
+        key = tuple(y)
+        if key not in self.values:
+            self._run(y)
+        return self.values[key]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        for sub in _SUBPROBLEMS.values():
+            sub.close()
+        _SUBPROBLEMS.clear()
+
+
+def solve_lshaped(data, scenarios, probabilities=None, workers=None,
+                  time_limit=None, tol=1e-6, tee=False, mip_gap=None):
+    """Problème stochastique par décomposition de Benders sur les scénarios
+    (L-shaped à coupes multiples): le maître de benders.py choisit les
+    sites et minore le coût de second niveau de chaque scénario; chaque
+    itération évalue les LP des scénarios en parallèle. Les couvertures de
+    capacité de tous les scénarios sont ajoutées au maître. `mip_gap` est
+    accepté pour l'interface commune (l'arrêt se fait sur `tol`, écart
+    relatif entre bornes).
+
+    Retourne un dictionnaire: statut, coût espéré, borne inférieure, sites
+    `y`, coût de chaque scénario avec ces sites, historique et temps.
+    """
+    from benders import capacity_cover, solve_benders
+
+    t0 = time.perf_counter()
+    names, mats, p = scenario_matrices(data, scenarios, probabilities)
+    cols = _site_cols(mats[0])
+    sub = ScenarioSubproblems(mats, p, workers)
+    workers = sub.workers
+    try:
+        result = solve_benders(
+            mats[0], tol=tol if mip_gap is None else mip_gap,
+            time_limit=time_limit, tee=tee, sub=sub,
+            cuts=[cut for mat in mats[1:] for cut in capacity_cover(mat)])
+    finally:
+        sub.close()
+    y = result['y']
+    costs = (mats[0]['c'][cols] @ y + sub.values[tuple(y)]
+             if y is not None else np.full(len(names), np.inf))
+    result.update({
+        'scenario_costs': dict(zip(names, costs)), 'workers': workers,
+    })
+    result['timings']['total'] = time.perf_counter() - t0
+    return result
+
+# =====================================================
+# 3. Valeur de la solution stochastique
+# =====================================================
+
+METHODS = {'extensive': solve_extensive, 'lshaped': solve_lshaped}
+
+
+def _deterministic_sites(mat, time_limit=None, mip_gap=None):
+    """Sites et coût optimaux du modèle déterministe `mat` (GLPK en
+    mémoire)"""
+    prob = glpk_capi.GLPKProblem(mat)
+    status = prob.solve(time_limit=time_limit, mip_gap=mip_gap)
+    if status not in (glpk_capi.GLP_OPT, glpk_capi.GLP_FEAS):
+        prob.close()
+        return None, np.inf
+    y = prob.col_values()[_site_cols(mat)].round()
+    cost = prob.objective()
+    prob.close()
+    return y, cost
+
+
+def stochastic_value(data, scenarios, probabilities=None, method="lshaped",
+                     result=None, time_limit=None, mip_gap=None, **options):
+    """Compare la solution stochastique au modèle déterministe actuel
+    (demande de `data`):
+
+    - RP: coût espéré de la solution stochastique (`method`: "extensive"
+      ou "lshaped", ou `result` déjà calculé);
+    - EEV: coût espéré des sites du modèle déterministe, flux et stocks
+      réoptimisés dans chaque scénario (infini si ces sites ne peuvent pas
+      servir la demande d'un scénario);
+    - VSS = EEV - RP;
+    - WS: chaque scénario résolu avec information parfaite, EVPI = RP - WS.
+    """
+    if result is None:
+        result = METHODS[method](data, scenarios, probabilities,
+                                 time_limit=time_limit, mip_gap=mip_gap,
+                                 **options)
+
+    names, mats, p = scenario_matrices(data, scenarios, probabilities)
+    cols = _site_cols(mats[0])
+    det = compile_matrices(data)
+    y_det, _ = _deterministic_sites(det, time_limit, mip_gap)
+    sub = ScenarioSubproblems(mats, p, workers=1)
+    try:
+        eev_costs = mats[0]['c'][cols] @ y_det + sub.recourse(y_det)
+    finally:
+        sub.close()
+    eev = float(p @ eev_costs) if np.isfinite(eev_costs).all() else np.inf
+    ws = float(p @ [_deterministic_sites(mat, time_limit, mip_gap)[1]
+                    for mat in mats])
+    rp = result['objective']
+
+    table = pd.DataFrame({
+        'scénario': names, 'probabilité': p,
+        'coût sites déterministes': eev_costs,
+        'coût sites stochastiques': [result['scenario_costs'][s]
+                                     for s in names],
+    })
+    return {
+        'RP': rp, 'EEV': eev, 'VSS': eev - rp, 'WS': ws, 'EVPI': rp - ws,
+        'sites déterministes': open_sites(det, y_det),
+        'sites stochastiques': open_sites(det, result['y']),
+        'scenarios': table, 'method': method,
+        'time': result['timings']['total'],
+        'result': result,
+    }
+
+
+def print_stochastic_value(v):
+    print(f"\n📊 VALEUR DE LA SOLUTION STOCHASTIQUE ({v['method']}, "
+          f"{v['time']:.1f} s)")
+    for label, sites in (('déterministes', v['sites déterministes']),
+                         ('stochastiques', v['sites stochastiques'])):
+        print(f"   Sites {label:<14} dépôts {sites[0]}, entrepôts {sites[1]}")
+    for key in ('RP', 'EEV', 'VSS', 'WS', 'EVPI'):
+        print(f"   {key:<5} {v[key]:>16,.2f} MAD")
+    if not np.isfinite(v['EEV']):
+        short = v['scenarios'].loc[
+            ~np.isfinite(v['scenarios']['coût sites déterministes']),
+            'scénario'].tolist()
+        print(f"⚠️  Sites déterministes insuffisants pour: {short}")
+    print(v['scenarios'].to_string(index=False,
+                                   float_format=lambda x: f"{x:,.2f}"))
+
+# =====================================================
+# 4. Comparaison: forme étendue contre décomposition
+# =====================================================
+
+
+def compare_stochastic(data, scenarios, workers=(1, None), time_limit=600):
+    """Temps et coût espéré de la forme étendue et de la décomposition
+    L-shaped (1 processus, puis un par scénario dans la limite des CPU).
+    Retourne le tableau et le résultat de la dernière décomposition."""
+    n_auto = min(len(scenarios), os.cpu_count() or 1)
+    runs = [('forme étendue', lambda: solve_extensive(
+        data, scenarios, time_limit=time_limit))]
+    for n in dict.fromkeys(n or n_auto for n in workers):
+        runs.append((f"L-shaped ({n} proc.)", lambda n=n: solve_lshaped(
+            data, scenarios, workers=n, time_limit=time_limit)))
+    det = compile_matrices(data)
+    rows = []
+    for label, run in runs:
+        t0 = time.perf_counter()
+        result = run()
+        depots, warehouses = (open_sites(det, result['y'])
+                              if result['y'] is not None else ([], []))
+        rows.append({'méthode': label, 'statut': result['status'],
+                     'temps (s)': time.perf_counter() - t0,
+                     'coût espéré': result['objective'],
+                     'borne inf': result.get('lower_bound', np.nan),
+                     'dépôts': ' '.join(map(str, depots)),
+                     'entrepôts': ' '.join(map(str, warehouses))})
+
+    table = pd.DataFrame(rows)
+    print(f"\n⏱️  PROBLÈME STOCHASTIQUE ({len(scenarios)} scénarios)")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+    return table, result
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+    from scenarios import scaled_scenarios
+
+    data = subset_instance(load_and_validate_data(path="Data/"),
+                           n_clients=20, n_months=3)
+    # Demande de base, triplée et x5,8: à x5,8 l'entrepôt retenu par le
+    # modèle déterministe ne suffit plus
+    scenarios = scaled_scenarios(data, (1.0, 3.0, 5.8))
+    _, result = compare_stochastic(data, scenarios, time_limit=300)
+    print_stochastic_value(stochastic_value(data, scenarios, result=result,
+                                            time_limit=300))
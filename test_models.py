@@ -0,0 +1,158 @@
+"""Vérifications de cohérence des constructeurs et des méthodes de
+résolution sur de petites instances (python -m pytest -q).
+
+- build_model et build_model_matrix ont le même optimum (HiGHS), que
+  GLPK en mémoire retrouve;
+- Benders et la relaxation lagrangienne (à sites optimaux) retrouvent
+  l'optimum du MILP monolithique;
+- le presolve ne change pas l'optimum;
+- le regroupement des clients encadre l'optimum, même à liaisons
+  entrepôt -> client creuses.
+"""
+import contextlib
+import io
+import os
+
+import pytest
+from pyomo.environ import value
+
+import glpk_capi
+from improvedmodel import build_model, load_and_validate_data
+from matrixmodel import build_model_matrix, subset_instance
+from solver import available_backends, solve_model
+from warmstart import model_sites
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REL = 1e-6
+
+HIGHS = "appsi_highs" in available_backends()
+needs_glpk = pytest.mark.skipif(not glpk_capi.available(),
+                                reason="libglpk introuvable")
+needs_highs = pytest.mark.skipif(not HIGHS, reason="highspy non installé")
+
+
+def quiet(f, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return f(*args, **kwargs)
+
+
+def optimum(m, backend="glpk_capi", **options):
+    results, _ = quiet(solve_model, m, backend=backend, **options)
+    assert str(results.solver.termination_condition) == "optimal"
+    return value(m.OBJ)
+
+
+@pytest.fixture(scope="module")
+def small():
+    """20 premiers clients, 3 premiers mois de Data/"""
+    data = quiet(load_and_validate_data, os.path.join(HERE, "Data"),
+                 cache=False)
+    return subset_instance(data, n_clients=20, n_months=3)
+
+
+@pytest.fixture(scope="module")
+def reference(small):
+    """Optimum et sites du MILP monolithique (forme matricielle), par HiGHS
+    s'il est installé, sinon par GLPK"""
+    if not HIGHS and not glpk_capi.available():
+        pytest.skip("ni highspy ni libglpk")
+    m = quiet(build_model_matrix, small)
+    return optimum(m, "appsi_highs" if HIGHS else "glpk_capi"), model_sites(m)
+
+# =====================================================
+# 1. Constructeurs
+# =====================================================
+
+
+@needs_highs
+def test_build_model_matches_matrix(small, reference):
+    m = quiet(build_model, small)
+    assert optimum(m, "appsi_highs") == pytest.approx(reference[0], rel=REL)
+
+
+@needs_glpk
+def test_glpk_capi_matches_reference(small, reference):
+    m = quiet(build_model_matrix, small)
+    assert optimum(m) == pytest.approx(reference[0], rel=REL)
+
+# =====================================================
+# 2. Décompositions
+# =====================================================
+
+
+@needs_glpk
+def test_benders_reaches_optimum(small, reference):
+    m = quiet(build_model_matrix, small)
+    assert optimum(m, "benders", mip_gap=1e-6) == pytest.approx(
+        reference[0], rel=1e-5)
+
+
+@needs_glpk
+def test_lagrangian_at_optimal_sites(small, reference):
+    m = quiet(build_model_matrix, small)
+    results, _ = quiet(solve_model, m, backend="lagrangian",
+                       start=reference[1], mip_gap=1e-4)
+    assert value(m.OBJ) == pytest.approx(reference[0], rel=1e-4)
+
+# =====================================================
+# 3. Presolve
+# =====================================================
+
+
+@needs_glpk
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_presolve_keeps_optimum(tmp_path, seed):
+    from generator import generate_instance
+    from presolve import presolve
+
+    generate_instance(tmp_path, n_clients=15, n_warehouses=8, n_periods=3,
+                      seed=seed)
+    data = quiet(load_and_validate_data, str(tmp_path), cache=False)
+    full = optimum(quiet(build_model_matrix, data))
+    reduced, fixings, _ = quiet(presolve, data, tee=False)
+    m = quiet(build_model_matrix, reduced, fixings=fixings)
+    assert optimum(m) == pytest.approx(full, rel=REL)
+
+
+@needs_glpk
+def test_presolve_stock_below_safety(tmp_path):
+    """Stock initial des dépôts sous le stock de sécurité: un dépôt fixé
+    fermé doit rester approvisionné"""
+    from generator import generate_instance
+    from presolve import presolve
+
+    generate_instance(tmp_path, n_clients=15, n_warehouses=8, n_periods=3,
+                      seed=0)
+    data = quiet(load_and_validate_data, str(tmp_path), cache=False)
+    stock = data['iD'].merge(data['ssD'], on='product')
+    data['iD'] = stock.assign(
+        initial_stock=stock['safety_stock'] - 10)[data['iD'].columns]
+    full = optimum(quiet(build_model_matrix, data))
+    reduced, fixings, _ = quiet(presolve, data, tee=False)
+    assert 0 in fixings['yD'].values()
+    m = quiet(build_model_matrix, reduced, fixings=fixings)
+    assert optimum(m) == pytest.approx(full, rel=REL)
+
+# =====================================================
+# 4. Regroupement des clients
+# =====================================================
+
+
+@needs_glpk
+def test_clustered_bounds_sparse_lanes(tmp_path):
+    """Deux liaisons entrepôt -> client par client: le transport de la
+    désagrégation échoue, le LP à sites fixés donne la borne supérieure"""
+    from clusters import solve_clustered
+    from generator import generate_instance
+
+    generate_instance(tmp_path, n_clients=15, n_warehouses=8, n_periods=3,
+                      density=0.3, seed=0)
+    data = quiet(load_and_validate_data, str(tmp_path), cache=False)
+    full = optimum(quiet(build_model_matrix, data))
+    r = solve_clustered(data, k=3)
+    assert r['status'] == 'optimal'
+    assert r['disaggregation'] == 'sites fixés'
+    assert r['lower_bound'] <= full * (1 + REL)
+    assert r['objective'] >= full * (1 - REL)
+    assert r['flows']['flow'].sum() == pytest.approx(
+        data['demand']['demand'].sum())
@@ -0,0 +1,298 @@
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+# =====================================================
+# 1. Mesures: mémoire résidente et taille du modèle
+# =====================================================
+
+
+def rss_mb():
+    """Mémoire résidente du processus (Mo): /proc/self/statm sous Linux,
+    sinon le pic getrusage"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def model_size(m, counted=None):
+    """(variables, contraintes, non-nuls) d'un modèle.
+
+    Lus dans la forme matricielle si le modèle en a une (build_model_matrix),
+    sinon comptés sur les composants Pyomo actifs: les non-nuls d'une
+    contrainte sont les variables de son expression. `counted` garde les
+    non-nuls des blocs de contraintes déjà comptés, pour ne parcourir
+    chaque bloc qu'une fois pendant la construction.
+    """
+    mat = getattr(m, 'matrix_form', None)
+    if mat is not None:
+        return mat['n_vars'], mat['n_cons'], len(mat['A_val'])
+    from pyomo.core.expr.visitor import identify_variables
+    from pyomo.environ import Constraint, Var
+
+    counted = {} if counted is None else counted
+    n_vars = sum(len(v) for v in m.component_objects(Var, active=True))
+    n_cons = nnz = 0
+    for block in m.component_objects(Constraint, active=True):
+        n_cons += len(block)
+        key = (id(m), block.name, len(block))
+        if key not in counted:
+            counted[key] = sum(
+                sum(1 for _ in identify_variables(c.body, include_fixed=False))
+                for c in block.values())
+        nnz += counted[key]
+    return n_vars, n_cons, nnz
+
+# =====================================================
+# 2. Traces: spans imbriqués
+# =====================================================
+
+
+_local = threading.local()
+
+
+class Span:
+    """Étape mesurée d'une trace: temps réel, temps CPU du processus,
+    mémoire résidente au début, à la fin et pic (échantillonné par le
+    thread du Tracer), et taille de `model` à la fin si elle est connue.
+    `model` peut être affecté dans le bloc `with` (modèle construit par
+    l'étape)."""
+
+    def __init__(self, tracer, name, model=None):
+        self.tracer = tracer
+        self.name = name
+        self.model = model
+        self.overhead = [0.0, 0.0]
+
+    def __enter__(self):
+        tracer = self.tracer
+        self.record = tracer._open_record(self.name)
+        self.rss = self.peak = rss_mb()
+        tracer._open.append(self)
+        self.cpu = time.process_time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.t0
+        cpu = time.process_time() - self.cpu
+        tracer = self.tracer
+        tracer._open.remove(self)
+        rss = rss_mb()
+        self.record.update({
+            'temps (s)': wall - self.overhead[0],
+            'cpu (s)': cpu - self.overhead[1],
+            'mémoire fin (Mo)': rss,
+            'mémoire pic (Mo)': max(self.peak, rss),
+            'mémoire ajoutée (Mo)': max(self.peak, rss) - self.rss,
+        })
+        if self.model is not None:
+            # Comptage exclu des temps des étapes englobantes
+            t0, c0 = time.perf_counter(), time.process_time()
+            self.record.update(zip(('variables', 'contraintes', 'non-nuls'),
+                                   model_size(self.model, tracer._counted)))
+            self.model = None
+            cost = (time.perf_counter() - t0, time.process_time() - c0)
+            for span in tracer._open:
+                span.overhead[0] += cost[0]
+                span.overhead[1] += cost[1]
+        return False
+
+
+class _NoSpan:
+    """Span inactif (aucune trace en cours): ne mesure rien"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """Trace d'une exécution: liste ordonnée des spans (étape, parent,
+    début, temps réel et CPU, mémoire, taille du modèle).
+
+    `with tracer:` active la trace pour le thread courant; les appels à
+    `span()` et `record()` du code instrumenté y sont alors enregistrés, et
+    ne coûtent rien sinon. Le temps CPU est celui du processus (tous
+    threads): avec plusieurs résolutions simultanées dans le même
+    processus, il compte aussi les autres.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.spans = []
+        self.origin = time.time()
+        self._t0 = time.perf_counter()
+        self._open = []
+        self._counted = {}
+        self._active = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._previous = []
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = rss_mb()
+            for span in list(self._open):
+                span.peak = max(span.peak, rss)
+
+    def __enter__(self):
+        self._previous.append(getattr(_local, 'tracer', None))
+        _local.tracer = self
+        self._active += 1
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, daemon=True,
+                                            name="tracer")
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        _local.tracer = self._previous.pop()
+        self._active -= 1
+        if self._active == 0 and self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return False
+
+    # ------------------------------------------------------------------
+    def _open_record(self, name):
+        parent = self._open[-1].record if self._open else None
+        record = {'étape': name,
+                  'parent': None if parent is None else parent['id'],
+                  'profondeur': len(self._open), 'id': len(self.spans),
+                  'début (s)': time.perf_counter() - self._t0}
+        self.spans.append(record)
+        return record
+
+    def span(self, name, model=None):
+        return Span(self, name, model)
+
+    def record(self, name, seconds, start=None, model=None):
+        """Étape mesurée ailleurs (temps réel seulement), enfant du span
+        ouvert: ex. temps d'écriture et de résolution rapportés par glpsol.
+        `start` est l'instant de début (perf_counter), par défaut
+        `seconds` avant l'appel."""
+        record = self._open_record(name)
+        if start is not None:
+            record['début (s)'] = start - self._t0
+        else:
+            record['début (s)'] -= seconds
+        record['temps (s)'] = seconds
+        if model is not None:
+            record.update(zip(('variables', 'contraintes', 'non-nuls'),
+                              model_size(model, self._counted)))
+        return record
+
+    def extend(self, trace, parent=None):
+        """Ajoute les spans d'une autre trace (`to_dict`, ex. calculée dans
+        un worker), sous le span `parent` (id) ou au niveau supérieur; les
+        débuts sont recalés sur l'origine de cette trace"""
+        shift = trace['origine'] - self.origin
+        offset = len(self.spans)
+        depth = 0 if parent is None else self.spans[parent]['profondeur'] + 1
+        for record in trace['spans']:
+            record = dict(record, id=record['id'] + offset,
+                          profondeur=record['profondeur'] + depth,
+                          **{'début (s)': record['début (s)'] + shift})
+            record['parent'] = (parent if record['parent'] is None
+                                else record['parent'] + offset)
+            self.spans.append(record)
+
+    def to_dict(self, **meta):
+        return {'date': datetime.fromtimestamp(self.origin)
+                .isoformat(timespec="seconds"),
+                'origine': self.origin, 'python': platform.python_version(),
+                'platform': platform.platform(), **meta,
+                'spans': [dict(s) for s in self.spans]}
+
+    def save(self, path="results/trace.json", **meta):
+        """Écrit la trace en JSON (spans et contexte d'exécution); retourne
+        le chemin"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(**meta), f, indent=1, ensure_ascii=False,
+                      default=float)
+        return path
+
+
+def current():
+    """Trace active dans ce thread (ou None)"""
+    return getattr(_local, 'tracer', None)
+
+
+def span(name, model=None):
+    """Span de la trace active, ou span inactif s'il n'y en a pas"""
+    tracer = current()
+    return _NO_SPAN if tracer is None else Span(tracer, name, model)
+
+
+def record(name, seconds, start=None, model=None):
+    tracer = current()
+    if tracer is not None:
+        tracer.record(name, seconds, start, model)
+
+# =====================================================
+# 3. Lecture et affichage
+# =====================================================
+
+
+COLUMNS = ['étape', 'temps (s)', 'cpu (s)', 'mémoire pic (Mo)',
+           'mémoire ajoutée (Mo)', 'variables', 'contraintes', 'non-nuls']
+
+
+def load_trace(path="results/trace.json"):
+    with open(path) as f:
+        return json.load(f)
+
+
+def trace_table(trace):
+    """Tableau des spans d'une trace (Tracer ou dictionnaire to_dict), les
+    noms indentés selon la profondeur"""
+    spans = trace.spans if isinstance(trace, Tracer) else trace['spans']
+    table = pd.DataFrame(spans).reindex(
+        columns=COLUMNS + ['id', 'parent', 'profondeur', 'début (s)'])
+    table['étape'] = [("  " * int(d)) + name for name, d
+                      in zip(table['étape'], table['profondeur'])]
+    sizes = ['variables', 'contraintes', 'non-nuls']
+    table[sizes] = table[sizes].astype("Int64")
+    return table
+
+
+def print_trace(trace):
+    table = trace_table(trace)[COLUMNS]
+    formats = {c: "{:,.3f}" for c in COLUMNS[1:5]}
+    formats.update({c: "{:,}" for c in COLUMNS[5:]})
+    for column, fmt in formats.items():
+        table[column] = [fmt.format(x) if pd.notna(x) else ""
+                         for x in table[column]]
+    print("\n⏱️  TRACE DE L'EXÉCUTION")
+    print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    # Affiche une trace écrite par main(trace=True) ou l'application
+    # (python tracing.py [results/trace.json])
+    trace = load_trace(sys.argv[1] if len(sys.argv) > 1
+                       else "results/trace.json")
+    print(f"Trace du {trace['date']}")
+    print_trace(trace)
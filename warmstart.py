@@ -0,0 +1,147 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from pyomo.environ import value
+
+# =====================================================
+# 1. Solution précédente (sites ouverts)
+# =====================================================
+
+
+def read_sites(path="results/"):
+    """Lit les sites ouverts écrits par export_results
+    (sites_depots.csv et sites_entrepots.csv)"""
+    depots = pd.read_csv(os.path.join(path, "sites_depots.csv"))
+    warehouses = pd.read_csv(os.path.join(path, "sites_entrepots.csv"))
+    return {
+        'yD': dict(zip(depots['depot'].tolist(),
+                       depots['ouvert'].round().tolist())),
+        'yW': dict(zip(warehouses['warehouse'].tolist(),
+                       warehouses['ouvert'].round().tolist())),
+    }
+
+
+def model_sites(m):
+    """Sites ouverts d'un modèle résolu, au même format que read_sites"""
+    return {
+        'yD': {d: round(value(m.yD[d])) for d in m.D},
+        'yW': {w: round(value(m.yW[w])) for w in m.W},
+    }
+
+
+def as_sites(start):
+    """Accepte un dictionnaire de sites ou le dossier de export_results"""
+    return read_sites(start) if isinstance(start, str) else start
+
+# =====================================================
+# 2. Solution initiale et priorités de branchement
+# =====================================================
+
+
+def site_start(mat, sites):
+    """Colonnes et valeurs des variables yD/yW connues dans `sites`.
+
+    Les sites absents de la solution précédente (nouveaux sites) restent
+    libres.
+    """
+    cols, vals = [], []
+    for name, letter in (('yD', 'D'), ('yW', 'W')):
+        idx = mat['var_index'][name]
+        for k, site in enumerate(mat['sets'][letter]):
+            if site in sites[name]:
+                cols.append(idx[k])
+                vals.append(sites[name][site])
+    return np.array(cols, dtype=np.int64), np.array(vals, dtype=float)
+
+
+def branching_priority(mat):
+    """Ordre de branchement: dépôts (yD) avant entrepôts (yW)"""
+    return np.concatenate([mat['var_index']['yD'], mat['var_index']['yW']])
+
+
+def fix_sites(m, sites):
+    """Fixe yD/yW du modèle Pyomo aux valeurs de `sites` et retourne la liste
+    des variables fixées (à libérer avec unfix après usage)"""
+    fixed = []
+    for name in ('yD', 'yW'):
+        var = getattr(m, name)
+        for site, val in sites[name].items():
+            if site in var:
+                var[site].fix(val)
+                fixed.append(var[site])
+    return fixed
+
+# =====================================================
+# 3. Banc d'essai sur demande perturbée
+# =====================================================
+
+
+def perturb_demand(data, noise=0.1, seed=0):
+    """Copie des données avec une demande multipliée par un facteur
+    uniforme dans [1 - noise, 1 + noise]"""
+    rng = np.random.default_rng(seed)
+    perturbed = dict(data)
+    demand = data['demand'].copy()
+    demand['demand'] = demand['demand'] * rng.uniform(1 - noise, 1 + noise,
+                                                      len(demand))
+    perturbed['demand'] = demand
+    return perturbed
+
+
+def benchmark_warm_start(data, backend="glpk_capi", n_runs=3, noise=0.1,
+                         time_limit=None, mip_gap=None):
+    """Compare le temps de résolution à froid et avec solution initiale.
+
+    Le réseau de base est résolu une fois; ses sites ouverts servent de
+    solution initiale pour `n_runs` instances à demande perturbée, résolues
+    à froid, avec solution initiale, puis avec solution initiale et
+    priorités de branchement (yD avant yW).
+    """
+    from matrixmodel import build_model_matrix
+    from solver import solve_model
+
+    base = build_model_matrix(data)
+    solve_model(base, backend=backend, time_limit=time_limit, mip_gap=mip_gap)
+    sites = model_sites(base)
+
+    variants = {
+        'à froid': {},
+        'solution initiale': {'start': sites},
+        'solution initiale + priorités': {'start': sites, 'priority': True},
+    }
+    rows = []
+    for run in range(n_runs):
+        scenario = perturb_demand(data, noise=noise, seed=run)
+        for label, options in variants.items():
+            m = build_model_matrix(scenario)
+            t0 = time.perf_counter()
+            results, _ = solve_model(m, backend=backend,
+                                     time_limit=time_limit,
+                                     mip_gap=mip_gap, **options)
+            rows.append({'scenario': run, 'mode': label,
+                         'temps (s)': time.perf_counter() - t0,
+                         'statut': str(results.solver.termination_condition),
+                         'objectif': value(m.OBJ)})
+
+    table = pd.DataFrame(rows)
+    summary = table.groupby('mode', sort=False)['temps (s)'].mean()
+    print(f"\n⏱️  SOLUTION INITIALE ({backend}, bruit ±{noise:.0%})")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    print("\n   Temps moyen:")
+    for label, t in summary.items():
+        print(f"   {label:<32} {t:>8.2f} s "
+              f"(x{summary.iloc[0] / t:.2f})")
+    return table
+
+
+if __name__ == "__main__":
+    from improvedmodel import load_and_validate_data
+    from matrixmodel import subset_instance
+
+    # Instance réduite: le réseau complet ne se résout pas en quelques minutes
+    data = subset_instance(load_and_validate_data(path="Data/"),
+                           n_clients=20, n_months=3)
+    benchmark_warm_start(data, time_limit=300)